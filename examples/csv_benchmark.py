@@ -0,0 +1,101 @@
+"""
+Example: CSV → TOON without the JSON round trip
+Times streaming a CSV file into a TOON table (process_csv) against the
+usual CSV → JSON → TOON pipeline, and checks both give the same output
+
+Usage: python examples/csv_benchmark.py [rows]
+"""
+
+import csv
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def create_csv(path: Path, rows: int):
+    """Write a CSV file of orders"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "customer", "country", "amount", "paid", "created"])
+        for i in range(rows):
+            writer.writerow([
+                i, f"customer {i % 5000}", ["US", "UK", "DE", "FR", "JP"][i % 5],
+                round((i * 3.14) % 1000, 2), i % 3 != 0, f"2025-01-{(i % 28) + 1:02d}"
+            ])
+
+
+def via_json(csv_path: Path, output_dir: Path):
+    """CSV → JSON (csv.DictReader, typed like process_csv) → TOON"""
+    from json2toon import process_json_file
+    from json2toon.csv_processor import _CONVERTERS, _infer_column_types
+
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    fields = list(rows[0])
+    types = _infer_column_types([list(row.values()) for row in rows[:1000]], len(fields))
+    for row in rows:
+        for field, kind in zip(fields, types):
+            if kind != 'string':
+                row[field] = _CONVERTERS[kind](row[field])
+    json_path = output_dir / f"{csv_path.stem}.json"
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(rows, f, ensure_ascii=False)
+    del rows
+    return process_json_file(
+        str(json_path), str(output_dir), format_choice='toon', force_format=True
+    )
+
+
+def direct(csv_path: Path, output_dir: Path):
+    from json2toon import process_csv
+    return process_csv(str(csv_path), output_dir=str(output_dir), quiet=True)
+
+
+def run(mode: str, csv_path: Path, output_dir: Path):
+    """Run one pipeline in this process and print seconds, peak RSS and output path"""
+    import contextlib
+    import io
+
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = (direct if mode == 'direct' else via_json)(csv_path, output_dir)
+    seconds = time.time() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'seconds': seconds, 'peak_mb': peak_mb, 'output': result['output_file']}))
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        csv_path = tmp / "orders.csv"
+        create_csv(csv_path, rows)
+        size_mb = csv_path.stat().st_size / 1024 / 1024
+        print(f"CSV: {rows:,} rows, {size_mb:.1f} MB\n")
+
+        outputs = {}
+        for mode, label in (('json', 'CSV → JSON → TOON'), ('direct', 'CSV → TOON (process_csv)')):
+            output_dir = tmp / mode
+            output_dir.mkdir()
+            # Each pipeline in its own process, so peak RSS is its own
+            line = subprocess.run(
+                [sys.executable, __file__, '--run', mode, str(csv_path), str(output_dir)],
+                check=True, capture_output=True, text=True
+            ).stdout.strip().splitlines()[-1]
+            stats = json.loads(line)
+            outputs[mode] = Path(stats['output']).read_text(encoding='utf-8')
+            print(f"{label:28} {stats['seconds']:7.2f}s  {rows / stats['seconds']:10,.0f} rows/s  "
+                  f"peak RSS {stats['peak_mb']:8.1f} MB")
+
+        print(f"\nSame output: {outputs['json'] == outputs['direct']}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--run':
+        run(sys.argv[2], Path(sys.argv[3]), Path(sys.argv[4]))
+    else:
+        main()
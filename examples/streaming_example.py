@@ -207,6 +207,42 @@ def example_best_practices():
     """)
 
 
+# Example 7: Parallel chunk encoding benchmark
+def example_parallel_scaling(worker_counts=(1, 2, 4, 8)):
+    """Time streaming of the same file with an increasing number of workers"""
+    if not STREAMING_AVAILABLE:
+        return
+    
+    import os
+    
+    print("\n" + "="*60)
+    print("EXAMPLE 6: Parallel Streaming Benchmark")
+    print("="*60)
+    
+    input_file = create_large_json_array()
+    output_dir = Path("streaming_parallel")
+    output_dir.mkdir(exist_ok=True)
+    
+    print(f"\nCPUs available: {os.cpu_count()}")
+    print(f"{'Workers':>8}  {'Time (s)':>9}  {'Speedup':>8}")
+    
+    baseline = None
+    for workers in worker_counts:
+        result = process_stream(
+            str(input_file),
+            output_dir=str(output_dir),
+            chunk_size=1000,
+            quiet=True,
+            workers=workers
+        )
+        elapsed = result['processing_time']
+        baseline = baseline or elapsed
+        print(f"{workers:>8}  {elapsed:>9.2f}  {baseline / elapsed:>7.2f}x")
+    
+    print("\nOne reader thread parses chunks; workers encode them and count")
+    print("tokens. Scaling stops once parsing on the reader thread is the bottleneck.")
+
+
 if __name__ == "__main__":
     print("🚀 Streaming Examples for json2toon-optimizer")
     print("="*60)
@@ -222,6 +258,7 @@ if __name__ == "__main__":
         example_streaming_options()
         example_cli_streaming()
         example_best_practices()
+        example_parallel_scaling()
         
         print("\n" + "="*60)
         print("✨ All streaming examples completed!")
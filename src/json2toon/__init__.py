@@ -6,8 +6,10 @@ from .toon_converter import (
     CompactTOONEncoder,
     process_json_file,
 )
-from .batch_processor import process_batch
-from .stream_processor import process_stream
+from .batch_processor import process_batch, iter_batch, merge_batch_stats
+from .stream_processor import process_stream, process_ndjson
+from .csv_processor import process_csv
+from .output_sinks import open_sink, read_sink_entry
 
 __version__ = "2.0.0"
 
@@ -17,5 +19,11 @@ __all__ = [
     "CompactTOONEncoder",
     "process_json_file",
     "process_batch",
+    "iter_batch",
+    "merge_batch_stats",
     "process_stream",
+    "process_ndjson",
+    "process_csv",
+    "open_sink",
+    "read_sink_entry",
 ]
@@ -0,0 +1,175 @@
+"""JSON inputs read directly from zip and tar archives"""
+
+import tarfile
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, Iterator, Optional, Pattern, Set, Tuple, Union
+
+# Separates the archive path from the member name in reported input paths
+MEMBER_SEPARATOR = '!/'
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+
+def is_archive(path: Path) -> bool:
+    """True if path names a supported archive (by suffix)"""
+    return path.name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+class ArchiveMember:
+    """A JSON file inside an archive, passed through the batch like a path
+
+    Tar members are read by the process iterating the archive, since
+    compressed tars can only be decompressed front to back, and carry their
+    bytes to the worker. Zip members are read by the worker itself from the
+    archive's central directory, so the parent does no I/O for them.
+    """
+
+    __slots__ = ('archive', 'name', 'size', 'data')
+
+    def __init__(self, archive: Path, name: str, size: int, data: Optional[bytes] = None):
+        self.archive = archive
+        self.name = name
+        self.size = size
+        self.data = data
+
+    def __str__(self) -> str:
+        return f"{self.archive}{MEMBER_SEPARATOR}{self.name}"
+
+    def __repr__(self) -> str:
+        return f"ArchiveMember({str(self)!r})"
+
+    @property
+    def suffix(self) -> str:
+        return PurePosixPath(self.name).suffix
+
+    def read_bytes(self) -> bytes:
+        if self.data is not None:
+            return self.data
+        with zipfile.ZipFile(self.archive) as archive:
+            return archive.read(self.name)
+
+    def read_text(self) -> str:
+        return self.read_bytes().decode('utf-8')
+
+
+def archive_stem(archive: Path) -> str:
+    """Archive name without its archive suffix ("day1.tar.gz" -> "day1")"""
+    lowered = archive.name.lower()
+    for suffix in ARCHIVE_SUFFIXES:
+        if lowered.endswith(suffix):
+            return archive.name[:-len(suffix)]
+    return archive.stem
+
+
+def archive_output_root(archive: Path, output_dir: Optional[str] = None) -> Path:
+    """Directory receiving the outputs of an archive's members (output_dir/<archive stem>)"""
+    return (Path(output_dir) if output_dir else archive.parent) / archive_stem(archive)
+
+
+def member_output_dir(member: 'ArchiveMember', output_dir: Optional[str] = None) -> Path:
+    """Directory receiving a member's output: its archive's root plus the member's directory
+
+    "day1.zip!/data/users.json" is converted to "day1/data/users-min.toon",
+    so members of the same name in different archives or directories do not
+    overwrite each other. Parts that could leave the root ("..", absolute
+    names) are dropped.
+    """
+    parts = [
+        part for part in PurePosixPath(member.name).parent.parts
+        if part not in ('/', '.', '..')
+    ]
+    return archive_output_root(member.archive, output_dir).joinpath(*parts)
+
+
+def split_member_key(key: str) -> Optional[Tuple[Path, str]]:
+    """(archive, member name) of a reported member path, or None for a plain path"""
+    archive, separator, name = key.partition(MEMBER_SEPARATOR)
+    if not separator or not is_archive(Path(archive)):
+        return None
+    return Path(archive), name
+
+
+def resolve_inputs(keys: Iterable[str]) -> Iterator[Union[Path, ArchiveMember]]:
+    """Turn reported input paths back into paths and archive members
+
+    Used for input paths that went through a file (e.g. work queue units).
+    Zip members are looked up in the central directory; tar members are
+    collected and read in one pass over each tar once the other inputs are
+    yielded, in archive order. A member that can no longer be found is
+    yielded as a plain Path, so its conversion reports it as missing.
+    """
+    zips: Dict[Path, zipfile.ZipFile] = {}
+    tar_names: Dict[Path, Set[str]] = {}
+    try:
+        for key in keys:
+            member = split_member_key(key)
+            if member is None:
+                yield Path(key)
+                continue
+            archive, name = member
+            if not archive.name.lower().endswith('.zip'):
+                tar_names.setdefault(archive, set()).add(name)
+                continue
+            try:
+                if archive not in zips:
+                    zips[archive] = zipfile.ZipFile(archive)
+                info = zips[archive].getinfo(name)
+            except (OSError, KeyError, zipfile.BadZipFile):
+                yield Path(key)
+                continue
+            yield ArchiveMember(archive, name, info.file_size)
+    finally:
+        for zf in zips.values():
+            zf.close()
+
+    for archive, names in tar_names.items():
+        try:
+            with tarfile.open(archive, 'r|*') as tf:
+                for info in tf:
+                    if info.isfile() and info.name in names:
+                        names.discard(info.name)
+                        data = tf.extractfile(info).read()
+                        yield ArchiveMember(archive, info.name, info.size, data)
+        except (OSError, tarfile.TarError):
+            pass
+        for name in names:
+            yield Path(f"{archive}{MEMBER_SEPARATOR}{name}")
+
+
+def iter_archive_members(
+    archive: Path,
+    name_regex: Optional[Pattern] = None,
+    excludes=None
+) -> Iterator[ArchiveMember]:
+    """Yield the JSON members of a zip or tar archive in archive order
+
+    Members are filtered by file name (name_regex) and by the exclude
+    patterns, which are matched against the member name (e.g. "tmp_*" or
+    "drafts/*.json") as well as the full reported path.
+    """
+    def wanted(name: str) -> bool:
+        if PurePosixPath(name).suffix != '.json':
+            return False
+        if name_regex is not None and not name_regex.match(PurePosixPath(name).name):
+            return False
+        if excludes and (excludes.matches(PurePosixPath(name))
+                         or excludes.matches(f"{archive}{MEMBER_SEPARATOR}{name}")):
+            return False
+        return True
+
+    if archive.name.lower().endswith('.zip'):
+        with zipfile.ZipFile(archive) as zf:
+            infos = zf.infolist()
+        for info in infos:
+            if not info.is_dir() and wanted(info.filename):
+                yield ArchiveMember(archive, info.filename, info.file_size)
+        return
+
+    # Stream mode: members are decompressed in order without seeking
+    with tarfile.open(archive, 'r|*') as tf:
+        for info in tf:
+            if not info.isfile() or not wanted(info.name):
+                continue
+            data = tf.extractfile(info).read()
+            yield ArchiveMember(archive, info.name, info.size, data)
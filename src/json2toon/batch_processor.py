@@ -1,13 +1,36 @@
 """Batch processing for multiple JSON files"""
 
+import json
+import shutil
+import sys
+import tempfile
 import time
+from collections import deque
 from pathlib import Path
-from typing import List, Dict, Optional
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Iterable, Iterator, Sized, Tuple
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from .archive_inputs import ArchiveMember, archive_output_root, member_output_dir
+from .compression import open_input, uncompressed_size
+
+
+# Default ratio between the peak memory of an in-memory conversion and the
+# input file size (decoded str + parsed objects + three encoded outputs).
+# Replaced by the largest ratio actually measured once files complete.
+DEFAULT_EXPANSION_FACTOR = 8.0
+
+# Files smaller than this give noisy measurements and are not used to
+# update the expansion factor
+_MIN_MEASURED_SIZE = 1024 * 1024
+
+# Memory reserved for a file converted through the streaming engine
+STREAM_RESERVATION = 64 * 1024 * 1024
+
+_UTF8_BOM = b'\xef\xbb\xbf'
 
 
 def process_batch(
-    input_paths: List[Path],
+    input_paths: Iterable[Path],
     output_dir: Optional[str] = None,
     delimiter: str = "comma",
     indent: int = 2,
@@ -15,13 +38,27 @@ def process_batch(
     force_format: bool = False,
     parallel_workers: int = 1,
     quiet: bool = False,
-    verbose: bool = False
+    verbose: bool = False,
+    max_memory: Optional[int] = None,
+    chunk_size: int = 1000,
+    stream_threshold: Optional[int] = None,
+    report_file: Optional[str] = None,
+    journal: Optional[str] = None,
+    manifest: Optional[str] = None,
+    clean: bool = False,
+    queue_dir: Optional[str] = None,
+    lease_seconds: float = 300.0,
+    unit_size: int = 100,
+    output_sink: Optional[str] = None,
+    compress: Optional[str] = None,
+    compress_level: Optional[int] = None,
+    max_tokens_per_file: Optional[int] = None
 ) -> Dict:
     """
     Process multiple JSON files in batch mode
     
     Args:
-        input_paths: List of input file paths
+        input_paths: Input file paths (any iterable)
         output_dir: Output directory for converted files
         delimiter: Delimiter for arrays (comma/tab/pipe)
         indent: Indentation spaces
@@ -30,33 +67,208 @@ def process_batch(
         parallel_workers: Number of parallel workers
         quiet: Suppress output
         verbose: Show detailed progress
+        max_memory: Memory budget in bytes shared by all in-flight files.
+            Files whose estimated working set can never fit are converted
+            with the streaming engine instead.
+        chunk_size: Items per chunk for files routed to streaming
+        stream_threshold: Files of at least this many bytes whose top-level
+            value is an array are converted with the streaming engine, in
+            format_choice ("auto" samples the first chunks). None (the
+            default) converts every file in memory unless max_memory routes it
+        report_file: Append per-file records to this JSONL file instead of
+            collecting them in the returned 'files' and 'errors' lists
+        journal: Checkpoint journal path; files completed by an earlier,
+            interrupted run with the same journal are skipped
+        manifest: Build manifest path; inputs unchanged since the last run
+            with the same options are skipped in O(stat) time
+        clean: With a manifest, delete outputs whose input was removed
+        queue_dir: Shared work queue directory; nodes pointed at the same
+            directory split the inputs dynamically (see iter_batch)
+        lease_seconds: Lease duration for claimed work units
+        unit_size: Files per work unit
+        output_sink: Write every output into this single container instead
+            of one file per input (.tar, .tar.gz, .zip, .jsonl or
+            .db/.sqlite, see output_sinks), keyed by input path
+        compress: Compress every output file ('gzip', 'zstd' or 'xz') on a
+            background thread; compressed inputs are always detected and
+            decompressed on the fly
+        compress_level: Compression level (default: per format)
+        max_tokens_per_file: Split outputs of more tokens than this into
+            TOON parts, each with its own array header, listed with their
+            exact token counts in a manifest (see token_parts). Only
+            top-level arrays can be split; other documents over the limit
+            are reported as errors
         
     Returns:
         Dictionary with batch processing statistics
     """
-    from .toon_converter import process_json_file
-    
-    start_time = time.time()
-    
-    results = {
-        'total_files': len(input_paths),
-        'successful': 0,
-        'failed': 0,
-        'toon_count': 0,
-        'json_count': 0,
-        'compact_count': 0,
-        'total_tokens_saved': 0,
-        'total_json_tokens': 0,
-        'total_output_tokens': 0,
-        'files': [],
-        'errors': []
-    }
+    total = len(input_paths) if isinstance(input_paths, Sized) else None
+    results = {}
     
     if not quiet:
-        print(f"\n🔄 Processing {len(input_paths)} files...")
+        print(f"\n🔄 Processing {total if total is not None else 'all'} files...")
         if verbose:
             print(f"   Workers: {parallel_workers}")
             print(f"   Output: {output_dir or 'same as input'}")
+            if max_memory:
+                print(f"   Memory budget: {_format_bytes(max_memory)}")
+
+    files = []
+    errors = []
+    records = iter_batch(
+        input_paths,
+        output_dir=output_dir,
+        delimiter=delimiter,
+        indent=indent,
+        format_choice=format_choice,
+        force_format=force_format,
+        parallel_workers=parallel_workers,
+        max_memory=max_memory,
+        chunk_size=chunk_size,
+        stream_threshold=stream_threshold,
+        summary=results,
+        report_file=report_file,
+        journal=journal,
+        manifest=manifest,
+        clean=clean,
+        queue_dir=queue_dir,
+        lease_seconds=lease_seconds,
+        unit_size=unit_size,
+        output_sink=output_sink,
+        compress=compress,
+        compress_level=compress_level,
+        max_tokens_per_file=max_tokens_per_file,
+        quiet=quiet
+    )
+    for i, record in enumerate(records, 1):
+        name = Path(record['input']).name
+        progress = f"{i}/{total}" if total is not None else str(i)
+        if record['status'] == 'skipped':
+            if report_file is None:
+                files.append(record)
+
+            if verbose and not quiet:
+                print(f"   [{progress}] ⏭️  {name} (unchanged, already converted)")
+        elif record['status'] == 'ok':
+            if report_file is None:
+                files.append(record)
+
+            if verbose and not quiet:
+                suffix = (
+                    f" (streamed: {record['route_reason']})" if record['route'] == 'stream' else ""
+                )
+                print(f"   [{progress}] ✅ {name}{suffix}")
+        else:
+            if report_file is None:
+                errors.append({'file': record['input'], 'error': record['error']})
+
+            if verbose and not quiet:
+                print(f"   [{progress}] ❌ {name}: {record['error']}")
+
+    results['files'] = files
+    results['errors'] = errors
+    results['output_directory'] = output_dir or "same as input files"
+    if report_file:
+        results['report_file'] = report_file
+
+    if not quiet:
+        print("\n✅ Batch processing complete!")
+        print(f"   Successful: {results['successful']}/{results['total_files']}")
+        if results['skipped'] > 0:
+            print(
+                f"   Converted: {results['converted']}, "
+                f"skipped (up to date): {results['skipped']}"
+            )
+        if results.get('cleaned'):
+            print(f"   Removed stale outputs: {results['cleaned']}")
+        if results['failed'] > 0:
+            print(f"   ⚠️  Failed: {results['failed']}")
+    
+    return results
+
+
+def iter_batch(
+    input_paths: Iterable[Path],
+    output_dir: Optional[str] = None,
+    delimiter: str = "comma",
+    indent: int = 2,
+    format_choice: str = "auto",
+    force_format: bool = False,
+    parallel_workers: int = 1,
+    max_memory: Optional[int] = None,
+    chunk_size: int = 1000,
+    stream_threshold: Optional[int] = None,
+    summary: Optional[Dict] = None,
+    report_file: Optional[str] = None,
+    journal: Optional[str] = None,
+    manifest: Optional[str] = None,
+    clean: bool = False,
+    queue_dir: Optional[str] = None,
+    lease_seconds: float = 300.0,
+    unit_size: int = 100,
+    output_sink: Optional[str] = None,
+    compress: Optional[str] = None,
+    compress_level: Optional[int] = None,
+    max_tokens_per_file: Optional[int] = None,
+    quiet: bool = True
+) -> Iterator[Dict]:
+    """
+    Convert files in batch mode, yielding one record per file as it completes
+
+    Input paths are consumed lazily and nothing is retained per file, so
+    memory use does not grow with the number of inputs.
+
+    Args:
+        input_paths: Input file paths (any iterable, including generators)
+        summary: Dictionary updated in place with running aggregates
+            (counts, token totals, processing time)
+        report_file: Append every record to this JSONL file as it completes
+        journal: Checkpoint journal path. Completed inputs are appended to it,
+            and inputs whose content is unchanged since they were journaled
+            with the same encoder options are skipped (reported with status
+            'skipped').
+        manifest: Build manifest path for incremental runs. Inputs whose
+            size, modification time and encoder options match the manifest
+            and whose output exists are skipped without being read.
+        clean: With a manifest, delete outputs whose input no longer exists
+        queue_dir: Shared work queue directory for distributed runs. The
+            first node to arrive splits input_paths into units of unit_size
+            files; every node (including it) then claims units until none
+            are left, reclaiming units whose lease of lease_seconds expired.
+        output_sink: Container receiving all outputs; workers return the
+            converted text and only this process writes the container. It
+            is only published once every input has been processed: an
+            error, an interrupt or closing the generator early discards it.
+            Cannot be combined with a journal or manifest, which track
+            outputs as individual files.
+        compress: Output compression; cannot be combined with an output
+            sink, which stores text (use a .tar.gz or .zip sink instead)
+        max_tokens_per_file: Token budget per output file; cannot be
+            combined with an output sink, which stores one entry per input
+        quiet: Suppress warnings (e.g. parallel fallback)
+
+    The remaining arguments are the same as for process_batch.
+
+    Yields:
+        Dictionaries with 'input', 'status' ('ok', 'skipped' or 'error') and
+        either the output statistics or an 'error' message
+    """
+    start_time = time.time()
+
+    if output_sink and (journal or manifest):
+        raise ValueError("An output sink cannot be combined with a journal or manifest")
+    if output_sink and compress:
+        raise ValueError("An output sink cannot be combined with output compression")
+    if output_sink and max_tokens_per_file is not None:
+        raise ValueError("An output sink cannot be combined with max_tokens_per_file")
+
+    if summary is None:
+        summary = {}
+    summary.update(_new_summary())
+
+    budget = _MemoryBudget(max_memory) if max_memory else None
+    if budget:
+        summary['memory_budget'] = budget.limit
     
     # Convert delimiter name to character
     delimiter_map = {
@@ -66,105 +278,433 @@ def process_batch(
     }
     delimiter_char = delimiter_map.get(delimiter, ',')
     
+    options = (
+        output_dir, delimiter_char, indent, format_choice, force_format, chunk_size,
+        journal is not None or manifest is not None, output_sink is not None,
+        (compress, compress_level), max_tokens_per_file
+    )
+
+    # Outputs built with other options than these are converted again
+    encoder_options = {
+        'output_dir': output_dir,
+        'delimiter': delimiter_char,
+        'indent': indent,
+        'format': format_choice,
+        'force': force_format,
+        # Only recorded when set, so existing manifests stay valid
+        **({'compress': [compress, compress_level]} if compress else {}),
+        **({'max_tokens_per_file': max_tokens_per_file}
+           if max_tokens_per_file is not None else {})
+    }
+
+    batch_journal = None
+    build_manifest = None
+    work_queue = None
+    sink = None
+    report = None
+    completed = False
+    try:
+        if journal:
+            from .journal import BatchJournal
+            batch_journal = BatchJournal(journal, encoder_options)
+        if manifest:
+            from .manifest import BuildManifest
+            build_manifest = BuildManifest(manifest, encoder_options)
+        if report_file:
+            report = open(report_file, 'a', encoding='utf-8')
+        if output_sink:
+            from .output_sinks import open_sink
+            sink = open_sink(output_sink)
+            summary['sink'] = str(sink.path)
+
+        if queue_dir:
+            from .work_queue import LeaseQueue
+            work_queue = LeaseQueue(queue_dir, lease_seconds=lease_seconds)
+            work_queue.populate(input_paths, unit_size)
+
+        def input_rounds():
+            if work_queue is None:
+                yield input_paths
+                return
+            # Claim units until none are pending, drain the files in flight,
+            # then wait for reclaimed or newly populated units
+            while True:
+                yield work_queue.claim_paths()
+                if not work_queue.wait_for_work():
+                    return
+
+        # Inputs already completed by an earlier run are reported from the
+        # manifest or journal without being scheduled
+        resumed = deque()
+        # Output root of each archive with members in this run, and the
+        # archive writing there (one entry per archive, not per member)
+        archive_roots: Dict[str, str] = {}
+
+        def pending_inputs(paths):
+            for path in paths:
+                if not isinstance(path, ArchiveMember):
+                    path = Path(path)
+                elif sink is None:
+                    root = str(archive_output_root(path.archive, output_dir))
+                    owner = archive_roots.setdefault(root, str(path.archive))
+                    if owner != str(path.archive):
+                        # e.g. day1.zip and day1.tar.gz: report instead of overwriting
+                        resumed.append(_make_record(path, 'memory', None, None, ValueError(
+                            f"Outputs would overwrite those of {owner} in {root}"
+                        )))
+                        continue
+                entry = None
+                if build_manifest is not None:
+                    entry = build_manifest.lookup(path)
+                if entry is None and batch_journal is not None:
+                    entry = batch_journal.lookup(path)
+                if entry is not None:
+                    entry['status'] = 'skipped'
+                    resumed.append(entry)
+                else:
+                    yield path
+
+        def finish(record):
+            _update_summary(summary, record)
+            summary['processing_time'] = time.time() - start_time
+            if budget:
+                summary['expansion_factor'] = budget.expansion_factor
+            if report:
+                report.write(json.dumps(record, ensure_ascii=False) + '\n')
+                report.flush()
+            if work_queue is not None:
+                work_queue.file_done(record['input'])
+                summary['units_completed'] = work_queue.units_completed
+            return record
+
+        for round_paths in input_rounds():
+            file_results = _iter_file_results(
+                pending_inputs(round_paths), options, parallel_workers, budget,
+                stream_threshold, quiet
+            )
+            for path, (route, reason), result, error in file_results:
+                while resumed:
+                    yield finish(resumed.popleft())
+
+                if error is None and sink is not None:
+                    _store_in_sink(sink, path, result)
+                record = _make_record(path, route, reason, result, error)
+                if error is None:
+                    if batch_journal is not None:
+                        batch_journal.record(record, result['input_size'], result['input_sha256'])
+                    if build_manifest is not None:
+                        build_manifest.update(
+                            record, result['input_size'], result['input_mtime_ns'],
+                            result['input_sha256']
+                        )
+                yield finish(record)
+
+            while resumed:
+                yield finish(resumed.popleft())
+
+        if build_manifest is not None and clean:
+            summary['cleaned'] = len(build_manifest.remove_stale())
+        completed = True
+    finally:
+        if report:
+            report.close()
+        if batch_journal is not None:
+            batch_journal.close()
+        if build_manifest is not None:
+            build_manifest.save()
+        if work_queue is not None:
+            work_queue.close()
+        if sink is not None:
+            if completed:
+                sink.close()
+                summary['sink_entries'] = sink.entries_written
+            else:
+                # Failed, interrupted or closed early: publish nothing
+                sink.abort()
+        summary['processing_time'] = time.time() - start_time
+
+
+def _new_summary() -> Dict:
+    """Empty running aggregates for a batch"""
+    return {
+        'total_files': 0,
+        'successful': 0,
+        'failed': 0,
+        'converted': 0,
+        'skipped': 0,
+        'toon_count': 0,
+        'json_count': 0,
+        'compact_count': 0,
+        'streamed_count': 0,
+        'stream_reasons': {},
+        'total_tokens_saved': 0,
+        'total_json_tokens': 0,
+        'total_output_tokens': 0,
+        'average_savings': 0.0,
+        'processing_time': 0.0
+    }
+
+
+def merge_batch_stats(stats_list: List[Dict]) -> Dict:
+    """
+    Merge batch statistics from several runs (e.g. one per shard) into a global summary
+
+    Counters and token totals are summed, per-file records are concatenated,
+    average savings is recomputed from the totals, and processing time is
+    the longest run since shards run concurrently.
+    """
+    merged = _new_summary()
+    merged['cleaned'] = 0
+    merged['files'] = []
+    merged['errors'] = []
+    merged['shards'] = []
+
+    for stats in stats_list:
+        for key, value in stats.items():
+            if key == 'stream_reasons':
+                for reason, count in value.items():
+                    merged[key][reason] = merged[key].get(reason, 0) + count
+            elif key in ('files', 'errors'):
+                merged[key].extend(value)
+            elif key == 'processing_time':
+                merged[key] = max(merged[key], value)
+            elif key == 'shard':
+                merged['shards'].append(value)
+            elif key in merged and key != 'average_savings' and isinstance(value, int):
+                merged[key] += value
+
+    if merged['total_json_tokens'] > 0:
+        merged['average_savings'] = (
+            merged['total_tokens_saved'] / merged['total_json_tokens'] * 100
+        )
+    merged['output_directory'] = ', '.join(
+        sorted({s['output_directory'] for s in stats_list if 'output_directory' in s})
+    )
+    return merged
+
+
+class _MemoryBudget:
+    """Admission control for in-flight files under a shared memory budget"""
+
+    def __init__(self, limit: int, expansion_factor: float = DEFAULT_EXPANSION_FACTOR):
+        self.limit = limit
+        self.expansion_factor = expansion_factor
+        self.reserved = 0
+        self._measured = False
+
+    def estimate(self, size: int) -> int:
+        """Estimated peak working set of an in-memory conversion of size bytes"""
+        return int(size * self.expansion_factor)
+
+    def can_ever_fit(self, estimate: int) -> bool:
+        return estimate <= self.limit
+
+    def fits(self, estimate: int) -> bool:
+        return self.reserved + estimate <= self.limit
+
+    def reserve(self, estimate: int):
+        self.reserved += estimate
+
+    def release(self, estimate: int):
+        self.reserved -= estimate
+
+    def observe(self, path: Path, peak_growth: int):
+        """Update the expansion factor from a measured peak memory growth
+
+        RSS growth is only visible when a worker exceeds its previous peak, so
+        the factor tracks the largest ratio seen rather than an average.
+        """
+        try:
+            size = _input_size(path)
+        except OSError:
+            return
+        if size < _MIN_MEASURED_SIZE or peak_growth <= 0:
+            return
+        ratio = peak_growth / size
+        if not self._measured or ratio > self.expansion_factor:
+            self.expansion_factor = ratio
+            self._measured = True
+
+
+def _iter_file_results(
+    input_paths: Iterable[Path],
+    options: Tuple,
+    parallel_workers: int,
+    budget: Optional[_MemoryBudget],
+    stream_threshold: Optional[int],
+    quiet: bool
+) -> Iterator[Tuple[Path, Tuple[str, Optional[str]], Optional[Dict], Optional[Exception]]]:
+    """Yield (path, (route, reason), result, error) for each file as it completes"""
+    paths = iter(input_paths)
+
     if parallel_workers > 1:
-        # Parallel processing
+        # With a budget every queued task holds a reservation, so only keep
+        # as many tasks in flight as there are workers
+        max_in_flight = parallel_workers if budget else parallel_workers * 2
+        pending = {}
+        next_path = None
         try:
             with ProcessPoolExecutor(max_workers=parallel_workers) as executor:
-                futures = {
-                    executor.submit(
-                        _process_single_file,
-                        path,
-                        output_dir,
-                        delimiter_char,
-                        indent,
-                        format_choice,
-                        force_format
-                    ): path for path in input_paths
-                }
-                
-                for i, future in enumerate(as_completed(futures), 1):
-                    path = futures[future]
-                    try:
-                        result = future.result()
-                        _update_results(results, result, path)
-                        
-                        if verbose and not quiet:
-                            print(f"   [{i}/{len(input_paths)}] ✅ {path.name}")
-                            
-                    except Exception as e:
-                        results['failed'] += 1
-                        results['errors'].append({'file': str(path), 'error': str(e)})
-                        
-                        if verbose and not quiet:
-                            print(f"   [{i}/{len(input_paths)}] ❌ {path.name}: {e}")
+                while True:
+                    while len(pending) < max_in_flight:
+                        if next_path is None:
+                            next_path = next(paths, None)
+                            if next_path is None:
+                                break
+                        route, reason, reservation = _plan_task(
+                            next_path, budget, stream_threshold
+                        )
+                        if budget:
+                            if not budget.fits(reservation) and pending:
+                                # Wait for running files to release memory
+                                break
+                            budget.reserve(reservation)
+                        future = executor.submit(_run_task, next_path, route, options)
+                        pending[future] = (next_path, route, reason, reservation)
+                        next_path = None
+
+                    if not pending:
+                        break
+
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        path, route, reason, reservation = pending.pop(future)
+                        if budget:
+                            budget.release(reservation)
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            yield path, (route, reason), None, e
+                            continue
+                        if budget and route == 'memory':
+                            budget.observe(path, result.get('peak_rss_growth', 0))
+                        yield path, (route, reason), result, None
+            return
         except Exception as pool_error:
-            # Fallback to sequential if parallel fails
+            # Fallback to sequential for files not yet reported
             if not quiet:
                 print(f"   ⚠️  Parallel processing failed, falling back to sequential: {pool_error}")
-            # Execute sequential processing as fallback
-            for i, path in enumerate(input_paths, 1):
-                try:
-                    result = _process_single_file(
-                        path,
-                        output_dir,
-                        delimiter_char,
-                        indent,
-                        format_choice,
-                        force_format
-                    )
-                    _update_results(results, result, path)
-                    
-                    if verbose and not quiet:
-                        print(f"   [{i}/{len(input_paths)}] ✅ {path.name}")
-                        
-                except Exception as e:
-                    results['failed'] += 1
-                    results['errors'].append({'file': str(path), 'error': str(e)})
-                    
-                    if verbose and not quiet:
-                        print(f"   [{i}/{len(input_paths)}] ❌ {path.name}: {e}")
-    elif parallel_workers == 1:
-        # Sequential processing
-        for i, path in enumerate(input_paths, 1):
-            try:
-                result = _process_single_file(
-                    path,
-                    output_dir,
-                    delimiter_char,
-                    indent,
-                    format_choice,
-                    force_format
-                )
-                _update_results(results, result, path)
-                
-                if verbose and not quiet:
-                    print(f"   [{i}/{len(input_paths)}] ✅ {path.name}")
-                    
-            except Exception as e:
-                results['failed'] += 1
-                results['errors'].append({'file': str(path), 'error': str(e)})
-                
-                if verbose and not quiet:
-                    print(f"   [{i}/{len(input_paths)}] ❌ {path.name}: {e}")
-    
-    # Calculate final statistics
-    results['processing_time'] = time.time() - start_time
-    results['output_directory'] = output_dir or "same as input files"
-    
-    if results['total_json_tokens'] > 0:
-        results['average_savings'] = (
-            results['total_tokens_saved'] / results['total_json_tokens'] * 100
+            remaining = [path for path, _, _, _ in pending.values()]
+            if next_path is not None:
+                remaining.append(next_path)
+            remaining.extend(paths)
+            paths = iter(remaining)
+            if budget:
+                budget.reserved = 0
+
+    # Sequential processing
+    for path in paths:
+        route, reason, _ = _plan_task(path, budget, stream_threshold)
+        try:
+            result = _run_task(path, route, options)
+        except Exception as e:
+            yield path, (route, reason), None, e
+            continue
+        if budget and route == 'memory':
+            budget.observe(path, result.get('peak_rss_growth', 0))
+        yield path, (route, reason), result, None
+
+
+def _plan_task(
+    path: Path,
+    budget: Optional[_MemoryBudget],
+    stream_threshold: Optional[int]
+) -> Tuple[str, Optional[str], int]:
+    """Choose the route for a file, the reason for streaming it and the memory to reserve"""
+    if isinstance(path, ArchiveMember):
+        # Members are converted from memory; one that can never fit the
+        # budget reserves all of it and runs alone
+        if budget is None:
+            return 'memory', None, 0
+        return 'memory', None, min(budget.estimate(path.size), budget.limit)
+
+    try:
+        size = uncompressed_size(path, path.stat().st_size)
+    except OSError:
+        # Let the conversion itself report the missing file
+        return 'memory', None, 0
+
+    stream_reservation = min(STREAM_RESERVATION, budget.limit) if budget else 0
+
+    if stream_threshold is not None and size >= stream_threshold:
+        try:
+            first_byte = _peek_first_byte(path)
+        except Exception:
+            # Unreadable or corrupt (e.g. a bad gzip header): let the
+            # conversion itself report it as a failure of this file
+            return 'memory', None, 0
+        if first_byte == b'[':
+            return 'stream', 'large array', stream_reservation
+
+    if budget is None:
+        return 'memory', None, 0
+    estimate = budget.estimate(size)
+    if budget.can_ever_fit(estimate):
+        return 'memory', None, estimate
+    return 'stream', 'memory budget', stream_reservation
+
+
+def _input_size(path) -> int:
+    """Size in bytes of an input file or archive member (decompressed)"""
+    if isinstance(path, ArchiveMember):
+        return path.size
+    return uncompressed_size(path, path.stat().st_size)
+
+
+def _peek_first_byte(path: Path) -> bytes:
+    """First non-whitespace byte of a file (skipping a UTF-8 BOM)"""
+    with open_input(path) as f:
+        block = f.read(4096)
+        if block.startswith(_UTF8_BOM):
+            block = block[len(_UTF8_BOM):]
+        while block:
+            stripped = block.lstrip(b' \t\r\n')
+            if stripped:
+                return stripped[:1]
+            block = f.read(4096)
+        return b''
+
+
+def _run_task(path: Path, route: str, options: Tuple) -> Dict:
+    """Run a single file through the chosen route (used for parallel execution)"""
+    (output_dir, delimiter, indent, format_choice, force_format, chunk_size,
+     hash_input, to_sink, compression, max_tokens) = options
+
+    if hash_input:
+        # Hash before converting so the journal never vouches for content
+        # newer than what was converted
+        from .journal import input_digest, input_stat
+        size, mtime_ns = input_stat(path)
+        digest = input_digest(path)
+
+    if route == 'stream' and to_sink:
+        # Streamed outputs can be larger than memory: stage them on disk
+        # for the sink instead of returning the text
+        stage_dir = tempfile.mkdtemp(prefix='json2toon-')
+        try:
+            result = _stream_single_file(
+                path, stage_dir, delimiter, indent, chunk_size, compression, max_tokens,
+                format_choice
+            )
+        except BaseException:
+            shutil.rmtree(stage_dir, ignore_errors=True)
+            raise
+    elif route == 'stream':
+        result = _stream_single_file(
+            path, output_dir, delimiter, indent, chunk_size, compression, max_tokens,
+            format_choice
         )
     else:
-        results['average_savings'] = 0.0
-    
-    if not quiet:
-        print(f"\n✅ Batch processing complete!")
-        print(f"   Successful: {results['successful']}/{results['total_files']}")
-        if results['failed'] > 0:
-            print(f"   ⚠️  Failed: {results['failed']}")
-    
-    return results
+        result = _process_single_file(
+            path, output_dir, delimiter, indent, format_choice, force_format,
+            keep_content=to_sink, compression=compression, max_tokens_per_file=max_tokens
+        )
+
+    if hash_input:
+        result['input_size'] = size
+        result['input_mtime_ns'] = mtime_ns
+        result['input_sha256'] = digest
+    return result
 
 
 def _process_single_file(
@@ -173,41 +713,195 @@ def _process_single_file(
     delimiter: str,
     indent: int,
     format_choice: str,
-    force_format: bool
+    force_format: bool,
+    keep_content: bool = False,
+    compression: Tuple[Optional[str], Optional[int]] = (None, None),
+    max_tokens_per_file: Optional[int] = None
 ) -> Dict:
-    """Process a single file (used for parallel execution)"""
+    """Process a single file (used for parallel execution)
+
+    With keep_content, nothing is written and the chosen output is returned
+    as 'output_content' for an output sink.
+    """
     from .toon_converter import process_json_file
     
-    return process_json_file(
+    json_content = None
+    if isinstance(path, ArchiveMember):
+        json_content = path.read_text()
+        output_dir = str(member_output_dir(path, output_dir))
+
+    peak_before = _peak_rss_bytes()
+    result = process_json_file(
         str(path),
         output_dir,
+        json_content=json_content,
         delimiter=delimiter,
         indent=indent,
         format_choice=format_choice,
-        force_format=force_format
+        force_format=force_format,
+        write_output=not keep_content,
+        compress=compression[0],
+        compress_level=compression[1],
+        max_tokens_per_file=max_tokens_per_file
+    )
+
+    # The batch only needs statistics; don't ship converted documents back
+    # to the parent process
+    for key in ('json_content', 'toon_content', 'toon_compact'):
+        result.pop(key, None)
+    if not keep_content:
+        result.pop('output_content', None)
+    result['peak_rss_growth'] = _peak_rss_bytes() - peak_before
+    return result
+
+
+def _stream_single_file(
+    path: Path,
+    output_dir: Optional[str],
+    delimiter: str,
+    indent: int,
+    chunk_size: int,
+    compression: Tuple[Optional[str], Optional[int]] = (None, None),
+    max_tokens_per_file: Optional[int] = None,
+    format_choice: str = "toon"
+) -> Dict:
+    """Convert a single file with the streaming engine
+
+    With format_choice "auto" the format is chosen from the first chunks
+    of a top-level array (see process_stream).
+    """
+    from .stream_processor import process_stream
+
+    delimiter_names = {',': 'comma', '\t': 'tab', '|': 'pipe'}
+    stream_result = process_stream(
+        str(path),
+        output_dir=output_dir,
+        chunk_size=chunk_size,
+        delimiter=delimiter_names.get(delimiter, 'comma'),
+        indent=indent,
+        quiet=True,
+        compress=compression[0],
+        compress_level=compression[1],
+        max_tokens_per_file=max_tokens_per_file,
+        format_choice=format_choice
     )
 
+    result = {
+        'input_file': stream_result['input_file'],
+        'output_file': stream_result['output_file'],
+        'json_tokens': stream_result['estimated_json_tokens'],
+        'chosen_tokens': stream_result['estimated_toon_tokens'],
+        'savings_tokens': stream_result['estimated_tokens_saved'],
+        'savings_percentage': stream_result['estimated_savings_percent'],
+        'chosen_format': stream_result['format']
+    }
+    if 'parts' in stream_result:
+        result['parts'] = stream_result['parts']
+    return result
+
+
+def _store_in_sink(sink, path: Path, result: Dict):
+    """Move a converted output into the sink and point the result at it"""
+    content = result.pop('output_content', None)
+    if content is not None:
+        sink.add(str(path), content, result['chosen_format'])
+    else:
+        staged = Path(result['output_file'])
+        try:
+            sink.add_file(str(path), staged, result['chosen_format'])
+        finally:
+            shutil.rmtree(staged.parent, ignore_errors=True)
+    result['output_file'] = str(sink.path)
+
+
+def _peak_rss_bytes() -> int:
+    """Peak resident set size of the current process (0 if unavailable)"""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _format_bytes(size: int) -> str:
+    """Human readable byte size"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def _make_record(
+    path: Path,
+    route: str,
+    route_reason: Optional[str],
+    file_result: Optional[Dict],
+    error: Optional[Exception]
+) -> Dict:
+    """Build the per-file record reported by iter_batch"""
+    if error is not None:
+        return {
+            'input': str(path),
+            'status': 'error',
+            'error': str(error),
+            'route': route,
+            'route_reason': route_reason
+        }
 
-def _update_results(results: Dict, file_result: Dict, path: Path):
-    """Update batch results with single file result"""
-    results['successful'] += 1
-    results['files'].append({
+    return {
         'input': str(path),
+        'status': 'ok',
         'output': file_result['output_file'],
         'format': file_result['chosen_format'],
-        'savings': file_result['savings_percentage']
-    })
+        'savings': file_result['savings_percentage'],
+        'route': route,
+        'route_reason': route_reason,
+        'json_tokens': file_result['json_tokens'],
+        'output_tokens': file_result['chosen_tokens'],
+        'tokens_saved': file_result['savings_tokens'],
+        # Outputs split into several parts name their parts manifest
+        **({'parts': len(file_result['parts'])} if len(file_result.get('parts', ())) > 1 else {})
+    }
+
+
+def _update_summary(summary: Dict, record: Dict):
+    """Update running batch aggregates with a single file record"""
+    summary['total_files'] += 1
+
+    if record['status'] == 'error':
+        summary['failed'] += 1
+        return
+
+    summary['successful'] += 1
+    if record['status'] == 'skipped':
+        summary['skipped'] += 1
+    else:
+        summary['converted'] += 1
+
+    if record['route'] == 'stream':
+        summary['streamed_count'] += 1
+        reasons = summary['stream_reasons']
+        reasons[record['route_reason']] = reasons.get(record['route_reason'], 0) + 1
     
     # Update format counts
-    format_name = file_result['chosen_format'].lower()
+    format_name = record['format'].lower()
     if 'toon' in format_name and 'compact' not in format_name:
-        results['toon_count'] += 1
+        summary['toon_count'] += 1
     elif 'compact' in format_name:
-        results['compact_count'] += 1
+        summary['compact_count'] += 1
     else:
-        results['json_count'] += 1
+        summary['json_count'] += 1
     
-    # Update token statistics
-    results['total_json_tokens'] += file_result['json_tokens']
-    results['total_output_tokens'] += file_result['chosen_tokens']
-    results['total_tokens_saved'] += file_result['savings_tokens']
+    # Update token statistics; files with no JSON baseline have no savings
+    summary['total_output_tokens'] += record['output_tokens']
+    if record['tokens_saved'] is not None:
+        summary['total_json_tokens'] += record['json_tokens']
+        summary['total_tokens_saved'] += record['tokens_saved']
+
+    if summary['total_json_tokens'] > 0:
+        summary['average_savings'] = (
+            summary['total_tokens_saved'] / summary['total_json_tokens'] * 100
+        )
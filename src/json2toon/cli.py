@@ -1,14 +1,30 @@
 """Configuration module and CLI for json2toon-optimizer"""
 
+import os
 import sys
+import json
 import argparse
-import glob
+from itertools import chain, islice
 from pathlib import Path
-from typing import List
+from typing import Iterator, List, Optional, Tuple
 
+from .archive_inputs import ArchiveMember
+from .csv_processor import DEFAULT_INFER_ROWS, is_csv_name, process_csv
+from .input_discovery import iter_input_paths, iter_listing_shard
 
-def main():
+
+def main(argv: Optional[List[str]] = None):
     """CLI entry point"""
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == "merge-stats":
+        # The console script exits with main's return value, so none is returned
+        _merge_stats_main(argv[1:])
+        return
+    if argv and argv[0] == "sink-get":
+        _sink_get_main(argv[1:])
+        return
+
     parser = argparse.ArgumentParser(
         description="json2toon-optimizer - Converts JSON to TOON with token optimization",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -25,19 +41,35 @@ Examples:
   # Custom format options
   json2toon data.json --delimiter tab --indent 4
   json2toon data.json --format toon --force
+  json2toon data.json.gz --compress xz --compress-level 9
+  json2toon data.json --max-tokens-per-file 100000
   
   # Streaming large files
   json2toon huge_data.json --stream --chunk-size 10000
+  json2toon export.json --stream --stream-path data.results
+  json2toon huge_data.json --stream --resume
+  json2toon huge_data.json --stream --progress-file status.json
+  json2toon events.ndjson --ndjson --parallel 8
+  json2toon orders.csv metrics.tsv.gz
   
   # Analysis
   json2toon data.json --stats
+
+  # Sharded batch across nodes, then merge the per-node stats
+  json2toon data/ -r --batch --shard 1/4 --stats-file stats-1.json
+  json2toon merge-stats stats-*.json
+
+  # All outputs in one container, then fetch a single entry
+  json2toon data/ -r --batch --sink outputs.db
+  json2toon sink-get outputs.db data/users.json
         """,
     )
 
     parser.add_argument(
         "input",
-        nargs="+",
-        help="Input JSON file(s) or directory. Supports glob patterns (*.json)",
+        nargs="*",
+        help="Input JSON file(s), directory or .zip/.tar(.gz) archive. "
+             "Supports glob patterns (*.json)",
     )
 
     parser.add_argument(
@@ -77,6 +109,31 @@ Examples:
         help="Force the specified format even if not optimal",
     )
 
+    format_group.add_argument(
+        "--compress",
+        choices=["gzip", "zstd", "xz"],
+        default=None,
+        help="Compress outputs on a background thread (.gz/.zst/.xz appended). "
+             "Compressed inputs (.json.gz, .zst, .xz, .bz2) are always read transparently",
+    )
+
+    format_group.add_argument(
+        "--compress-level",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Compression level (default: gzip 6, zstd 3, xz 6)",
+    )
+
+    format_group.add_argument(
+        "--max-tokens-per-file",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Split outputs of top-level arrays into TOON parts of at most N tokens, "
+             "each with its own header, listed with exact token counts in a .parts.json manifest",
+    )
+
     # Batch processing options
     batch_group = parser.add_argument_group("batch processing")
     
@@ -102,7 +159,8 @@ Examples:
     batch_group.add_argument(
         "--exclude",
         action="append",
-        help="Exclude files matching pattern (can be used multiple times)",
+        help="Exclude files or directories matching pattern (can be used multiple times). "
+             "Excluded directories are not descended into",
     )
 
     batch_group.add_argument(
@@ -110,7 +168,108 @@ Examples:
         type=int,
         default=1,
         metavar="N",
-        help="Number of parallel workers for batch processing (default: 1)",
+        help="Number of parallel workers for batch processing, for encoding "
+             "--stream chunks and for --ndjson ranges (default: 1, 0: one per CPU)",
+    )
+
+    batch_group.add_argument(
+        "--max-memory",
+        type=_parse_size,
+        default=None,
+        metavar="SIZE",
+        help="Memory budget shared by parallel workers, e.g. 512M or 12G. "
+             "Files that cannot fit are streamed (default: unlimited)",
+    )
+
+    batch_group.add_argument(
+        "--stream-threshold",
+        type=_parse_size,
+        default=None,
+        metavar="SIZE",
+        help="Stream batch files of at least SIZE whose top level is an array, e.g. 256M "
+             "(default: off)",
+    )
+
+    batch_group.add_argument(
+        "--report",
+        default=None,
+        metavar="FILE",
+        help="Append one JSON line per processed file to FILE instead of keeping results in memory",
+    )
+
+    batch_group.add_argument(
+        "--journal",
+        default=None,
+        metavar="FILE",
+        help="Checkpoint journal; rerunning with the same journal skips files already converted",
+    )
+
+    batch_group.add_argument(
+        "--manifest",
+        default=None,
+        metavar="FILE",
+        help="Incremental mode: skip inputs unchanged since the last run recorded in FILE",
+    )
+
+    batch_group.add_argument(
+        "--clean",
+        action="store_true",
+        help="With --manifest, delete outputs whose input file was removed",
+    )
+
+    batch_group.add_argument(
+        "--shard",
+        type=_parse_shard,
+        default=None,
+        metavar="K/N",
+        help="Only process shard K of N (1-based), assigned by a stable hash of each relative path",
+    )
+
+    batch_group.add_argument(
+        "--shard-listing",
+        default=None,
+        metavar="FILE",
+        help="With --shard, take inputs from FILE (lines of 'size<TAB>path') "
+             "and balance shards by total size",
+    )
+
+    batch_group.add_argument(
+        "--queue",
+        default=None,
+        metavar="DIR",
+        help="Distributed mode: nodes pointed at the same shared DIR claim work units "
+             "dynamically and reclaim units of nodes that died",
+    )
+
+    batch_group.add_argument(
+        "--lease",
+        type=float,
+        default=300.0,
+        metavar="SECONDS",
+        help="Lease duration for claimed work units in --queue mode (default: 300)",
+    )
+
+    batch_group.add_argument(
+        "--unit-size",
+        type=int,
+        default=100,
+        metavar="N",
+        help="Files per work unit in --queue mode (default: 100)",
+    )
+
+    batch_group.add_argument(
+        "--sink",
+        default=None,
+        metavar="PATH",
+        help="Write all outputs into one container instead of one file per input "
+             "(.tar, .tar.gz, .zip, .jsonl or .db/.sqlite); read entries with 'json2toon sink-get'",
+    )
+
+    batch_group.add_argument(
+        "--stats-file",
+        default=None,
+        metavar="FILE",
+        help="Write batch statistics as JSON to FILE (combine nodes with 'json2toon merge-stats')",
     )
 
     # Streaming options
@@ -122,6 +281,102 @@ Examples:
         help="Enable streaming mode for very large files",
     )
 
+    stream_group.add_argument(
+        "--stream-path",
+        default=None,
+        metavar="PATH",
+        help="Dotted path of a nested array to stream item by item (e.g. data.results). "
+             "Without it, every array too large to buffer is streamed in place",
+    )
+
+    stream_group.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Trace Python allocations with tracemalloc while streaming "
+             "(slow; by default only RSS is sampled)",
+    )
+
+    stream_group.add_argument(
+        "--json-baseline",
+        choices=["raw", "sample", "off"],
+        default="raw",
+        help="How streaming measures the JSON tokens savings are reported against: "
+             "tokenize the minified input (raw, default), tokenize a sample of it "
+             "(sample), or skip the measurement (off)",
+    )
+
+    stream_group.add_argument(
+        "--format-sample-chunks",
+        type=int,
+        default=3,
+        metavar="K",
+        help="With --format auto, chunks of a streamed array encoded in every format "
+             "to choose one (default: 3)",
+    )
+
+    stream_group.add_argument(
+        "--format-recheck-every",
+        type=int,
+        default=50,
+        metavar="M",
+        help="With --format auto, compare formats again every M chunks and report drifts; "
+             "with --max-tokens-per-file the next part switches format (default: 50, 0: never)",
+    )
+
+    stream_group.add_argument(
+        "--resume",
+        action="store_true",
+        help="Checkpoint streaming progress next to the partial output and, after "
+             "an interruption, continue from the last checkpoint (top-level arrays)",
+    )
+
+    stream_group.add_argument(
+        "--checkpoint-interval",
+        type=float,
+        default=30.0,
+        metavar="SECONDS",
+        help="Seconds between checkpoints with --resume (default: 30)",
+    )
+
+    stream_group.add_argument(
+        "--progress-file",
+        metavar="PATH",
+        help="Keep streaming progress (bytes read, items, tokens, rates, ETA) in "
+             "this JSON file for dashboards",
+    )
+
+    stream_group.add_argument(
+        "--progress-interval",
+        type=float,
+        default=1.0,
+        metavar="SECONDS",
+        help="Seconds between progress updates of --progress-file and --verbose "
+             "(default: 1)",
+    )
+
+    stream_group.add_argument(
+        "--ndjson",
+        action="store_true",
+        help="Treat inputs as JSON Lines and convert byte ranges in parallel "
+             "(--parallel N workers) into one TOON array",
+    )
+
+    stream_group.add_argument(
+        "--csv",
+        action="store_true",
+        help="Treat inputs as CSV (TSV for .tsv files) and stream their rows into one "
+             "TOON table; implied when every input is a .csv or .tsv file",
+    )
+
+    stream_group.add_argument(
+        "--csv-infer-rows",
+        type=int,
+        default=DEFAULT_INFER_ROWS,
+        metavar="N",
+        help="Rows sampled to type CSV columns as numbers or booleans; 0 keeps "
+             f"every cell a string (default: {DEFAULT_INFER_ROWS})",
+    )
+
     stream_group.add_argument(
         "--chunk-size",
         type=int,
@@ -159,37 +414,120 @@ Examples:
         version="%(prog)s 2.0.0",
     )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+
+    if not args.input and not args.shard_listing:
+        parser.error("the following arguments are required: input")
+    if args.shard_listing and not args.shard:
+        parser.error("--shard-listing requires --shard")
+    if args.compress and (args.sink or args.ndjson):
+        parser.error("--compress cannot be combined with --sink or --ndjson")
+    if args.resume and args.compress:
+        parser.error("--resume cannot be combined with --compress")
+    if args.csv and args.ndjson:
+        parser.error("--csv cannot be combined with --ndjson")
+    if args.csv_infer_rows < 0:
+        parser.error("--csv-infer-rows cannot be negative")
+    if args.parallel < 0:
+        parser.error("--parallel cannot be negative")
+    if args.parallel == 0:
+        args.parallel = os.cpu_count() or 1
+    if args.max_tokens_per_file is not None:
+        if args.max_tokens_per_file < 1:
+            parser.error("--max-tokens-per-file must be positive")
+        if args.sink or args.ndjson or args.resume:
+            parser.error(
+                "--max-tokens-per-file cannot be combined with --sink, --ndjson or --resume"
+            )
 
     # Import here to avoid circular import
     from .toon_converter import process_json_file
     from .batch_processor import process_batch
-    from .stream_processor import process_stream
+    from .stream_processor import process_stream, process_ndjson
 
     try:
+        if args.csv or (args.input and all(is_csv_name(path) for path in args.input)):
+            # CSV inputs are named explicitly, like JSON Lines ones
+            for input_file in args.input:
+                result = process_csv(
+                    input_file,
+                    output_dir=args.output,
+                    delimiter=args.delimiter,
+                    indent=args.indent,
+                    quiet=args.quiet,
+                    verbose=args.verbose,
+                    infer_rows=args.csv_infer_rows,
+                    compress=args.compress,
+                    compress_level=args.compress_level
+                )
+                if args.stats and not args.quiet:
+                    _print_stream_stats(result)
+            return
+
+        if args.ndjson:
+            # JSON Lines inputs are named explicitly (.jsonl/.ndjson are not
+            # picked up by JSON file discovery)
+            for input_file in args.input:
+                result = process_ndjson(
+                    input_file,
+                    output_dir=args.output,
+                    workers=args.parallel,
+                    chunk_size=args.chunk_size,
+                    delimiter=args.delimiter,
+                    indent=args.indent,
+                    quiet=args.quiet,
+                    verbose=args.verbose
+                )
+                if args.stats and not args.quiet:
+                    _print_stream_stats(result)
+            return
+
         # Determine processing mode
-        input_paths = _resolve_input_paths(args.input, args.recursive, args.pattern, args.exclude)
+        if args.shard_listing:
+            first_paths, input_paths = _peek_paths(
+                iter_listing_shard(args.shard_listing, args.shard)
+            )
+        else:
+            first_paths, input_paths = _peek_input_paths(
+                args.input, args.recursive, args.pattern, args.exclude, args.shard
+            )
+        # Archive members are always converted through the batch engine
+        from_archive = any(isinstance(path, ArchiveMember) for path in first_paths)
         
-        if args.stream:
+        if args.stream and not from_archive:
             # Streaming mode for large files
-            if len(input_paths) > 1:
+            if len(first_paths) > 1:
                 print("⚠️  Warning: Streaming mode only supports single file. Processing first file only.", file=sys.stderr)
-                input_paths = [input_paths[0]]
             
             result = process_stream(
-                input_paths[0],
+                first_paths[0],
                 output_dir=args.output,
                 chunk_size=args.chunk_size,
                 delimiter=args.delimiter,
                 indent=args.indent,
                 quiet=args.quiet,
-                verbose=args.verbose
+                verbose=args.verbose,
+                stream_path=args.stream_path,
+                workers=args.parallel,
+                trace_memory=args.trace_memory,
+                json_baseline=args.json_baseline,
+                compress=args.compress,
+                compress_level=args.compress_level,
+                resume=args.resume,
+                checkpoint_interval=args.checkpoint_interval,
+                max_tokens_per_file=args.max_tokens_per_file,
+                format_choice=args.format,
+                format_sample_chunks=args.format_sample_chunks,
+                format_recheck_every=args.format_recheck_every,
+                progress_file=args.progress_file,
+                progress_interval=args.progress_interval
             )
             
             if args.stats and not args.quiet:
                 _print_stream_stats(result)
         
-        elif args.batch or len(input_paths) > 1:
+        elif (args.batch or args.shard or args.queue or args.sink or from_archive
+              or len(first_paths) > 1):
             # Batch processing mode
             results = process_batch(
                 input_paths,
@@ -200,21 +538,42 @@ Examples:
                 force_format=args.force,
                 parallel_workers=args.parallel,
                 quiet=args.quiet,
-                verbose=args.verbose
+                verbose=args.verbose,
+                max_memory=args.max_memory,
+                chunk_size=args.chunk_size,
+                stream_threshold=args.stream_threshold,
+                report_file=args.report,
+                journal=args.journal,
+                manifest=args.manifest,
+                clean=args.clean,
+                queue_dir=args.queue,
+                lease_seconds=args.lease,
+                unit_size=args.unit_size,
+                output_sink=args.sink,
+                compress=args.compress,
+                compress_level=args.compress_level,
+                max_tokens_per_file=args.max_tokens_per_file
             )
             
+            if args.shard:
+                results['shard'] = f"{args.shard[0]}/{args.shard[1]}"
+            if args.stats_file:
+                _write_stats_file(args.stats_file, results)
             if args.stats and not args.quiet:
                 _print_batch_stats(results)
         
         else:
             # Single file processing (original mode)
             result = process_json_file(
-                input_paths[0],
+                first_paths[0],
                 args.output,
                 delimiter=args.delimiter,
                 indent=args.indent,
                 format_choice=args.format,
-                force_format=args.force
+                force_format=args.force,
+                compress=args.compress,
+                compress_level=args.compress_level,
+                max_tokens_per_file=args.max_tokens_per_file
             )
 
             if not args.quiet:
@@ -237,42 +596,119 @@ Examples:
         sys.exit(1)
 
 
+def _parse_size(value: str) -> int:
+    """Parse a byte size such as 512M, 12G or 1048576"""
+    units = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    text = value.strip().upper()
+    if text.endswith('B'):
+        text = text[:-1]
+    unit = text[-1:] if text[-1:] in units else ''
+    number = text[:len(text) - len(unit)]
+    try:
+        size = float(number) * units[unit]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {value!r}")
+    if size <= 0:
+        raise argparse.ArgumentTypeError(f"size must be positive: {value!r}")
+    return int(size)
+
+
 def _resolve_input_paths(inputs: List[str], recursive: bool, pattern: str, exclude: List[str]) -> List[Path]:
     """Resolve input paths with glob patterns and directory traversal"""
-    paths = []
-    exclude = exclude or []
-    
-    for input_str in inputs:
-        input_path = Path(input_str)
-        
-        if input_path.is_file():
-            paths.append(input_path)
-        elif input_path.is_dir():
-            if recursive:
-                found = list(input_path.rglob(pattern))
-            else:
-                found = list(input_path.glob(pattern))
-            paths.extend(found)
-        else:
-            # Try glob pattern
-            found = glob.glob(input_str, recursive=recursive)
-            paths.extend([Path(p) for p in found])
-    
-    # Filter out excluded patterns
-    filtered_paths = []
-    for path in paths:
-        excluded = False
-        for exclude_pattern in exclude:
-            if path.match(exclude_pattern):
-                excluded = True
-                break
-        if not excluded and path.suffix == '.json':
-            filtered_paths.append(path)
-    
-    if not filtered_paths:
+    paths = list(iter_input_paths(inputs, recursive, pattern, exclude))
+    if not paths:
         raise FileNotFoundError(f"No JSON files found matching the input pattern")
-    
-    return filtered_paths
+    return paths
+
+
+def _peek_input_paths(
+    inputs: List[str],
+    recursive: bool,
+    pattern: str,
+    exclude: List[str],
+    shard: Optional[Tuple[int, int]] = None
+):
+    """Start lazy input discovery; returns (first paths found, iterator over all paths)
+
+    At most two paths are read ahead, which is enough to choose between
+    single-file and batch mode without walking the whole tree.
+    """
+    return _peek_paths(iter_input_paths(inputs, recursive, pattern, exclude, shard))
+
+
+def _peek_paths(paths: Iterator[Path]):
+    """Read up to two paths ahead of a lazy iterator"""
+    first = list(islice(paths, 2))
+    if not first:
+        raise FileNotFoundError("No JSON files found matching the input pattern")
+    return first, chain(first, paths)
+
+
+def _parse_shard(value: str) -> Tuple[int, int]:
+    """Parse a shard specification such as 2/8"""
+    index, sep, count = value.partition('/')
+    try:
+        shard = (int(index), int(count))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid shard: {value!r} (expected K/N)")
+    if not sep or not 1 <= shard[0] <= shard[1]:
+        raise argparse.ArgumentTypeError(f"invalid shard: {value!r} (expected 1 <= K <= N)")
+    return shard
+
+
+def _write_stats_file(path: str, results: dict):
+    """Write batch statistics as JSON"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+def _merge_stats_main(argv: List[str]):
+    """Entry point for 'json2toon merge-stats'"""
+    from .batch_processor import merge_batch_stats
+
+    parser = argparse.ArgumentParser(
+        prog="json2toon merge-stats",
+        description="Merge batch statistics written with --stats-file into a global summary",
+    )
+    parser.add_argument("stats_files", nargs="+", metavar="FILE", help="Per-node statistics files")
+    parser.add_argument("-o", "--output", default=None, help="Write the merged statistics as JSON")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Do not print the summary")
+    args = parser.parse_args(argv)
+
+    stats_list = []
+    for stats_file in args.stats_files:
+        with open(stats_file, 'r', encoding='utf-8') as f:
+            stats_list.append(json.load(f))
+
+    merged = merge_batch_stats(stats_list)
+    if args.output:
+        _write_stats_file(args.output, merged)
+    if not args.quiet:
+        _print_batch_stats(merged)
+    return merged
+
+
+def _sink_get_main(argv: List[str]):
+    """Entry point for 'json2toon sink-get'"""
+    from .output_sinks import SINK_KINDS, read_sink_entry
+
+    parser = argparse.ArgumentParser(
+        prog="json2toon sink-get",
+        description="Print the output stored for one input in a --sink container",
+    )
+    parser.add_argument("container", help="Container written with --sink")
+    parser.add_argument("key", help="Input path the output was converted from")
+    parser.add_argument("--kind", choices=sorted(SINK_KINDS), default=None,
+                        help="Container kind (default: inferred from the suffix)")
+    args = parser.parse_args(argv)
+
+    try:
+        format_name, content = read_sink_entry(args.container, args.key, args.kind)
+    except KeyError:
+        print(f"❌ No entry for {args.key} in {args.container}", file=sys.stderr)
+        sys.exit(1)
+    print(content)
+    return format_name, content
 
 
 def _print_single_stats(result: dict):
@@ -299,15 +735,30 @@ def _print_batch_stats(results: dict):
     print(f"Total files processed: {results['total_files']}")
     print(f"Successful:            {results['successful']}")
     print(f"Failed:                {results['failed']}")
+    if results.get('skipped'):
+        print(f"Converted:             {results['converted']}")
+        print(f"Skipped (unchanged):   {results['skipped']}")
+    if results.get('cleaned'):
+        print(f"Stale outputs removed: {results['cleaned']}")
     print(f"\nFormat Distribution:")
     print(f"  TOON format:         {results['toon_count']} files")
     print(f"  JSON format:         {results['json_count']} files")
     print(f"  Compact format:      {results['compact_count']} files")
+    if results.get('streamed_count'):
+        print(f"  Streamed:            {results['streamed_count']} files")
+        for reason, count in results['stream_reasons'].items():
+            print(f"    {reason + ':':<19}{count} files")
     print(f"\n💰 Total Savings:")
     print(f"  Tokens saved:        {results['total_tokens_saved']:,}")
     print(f"  Average savings:     {results['average_savings']:.1f}%")
     print(f"\n⏱️  Processing time:    {results['processing_time']:.2f}s")
     print(f"📁 Output directory:   {results['output_directory']}")
+    if results.get('shards'):
+        print(f"🧩 Shards merged:      {', '.join(results['shards'])}")
+    if 'sink' in results:
+        print(f"📦 Output container:   {results['sink']} ({results.get('sink_entries', 0)} entries)")
+    if 'units_completed' in results:
+        print(f"🧩 Work units done:    {results['units_completed']}")
     print("="*60)
 
 
@@ -320,11 +771,54 @@ def _print_stream_stats(result: dict):
     print(f"Output file:          {result['output_file']}")
     print(f"Chunks processed:     {result['chunks_processed']}")
     print(f"Items processed:      {result['items_processed']:,}")
-    print(f"\n💰 Estimated Savings:")
-    print(f"  Tokens saved:       ~{result['estimated_tokens_saved']:,}")
-    print(f"  Average savings:    ~{result['estimated_savings_percent']:.1f}%")
+    selection = result.get('format_selection')
+    if selection:
+        others = ', '.join(
+            f"{fmt} +{margin:.1f}%" for fmt, margin in selection['margins_percent'].items()
+            if fmt != selection['format']
+        )
+        print(f"Format:               {selection['format']} (auto, over "
+              f"{selection['sampled_items']:,} sampled items: {others})")
+        for drift in selection['drifts']:
+            action = "switched from" if drift['switched'] else "kept"
+            print(f"  Drift at item {drift['item']:,}: {drift['to']} "
+                  f"{drift['margin_percent']:.1f}% smaller ({action} {drift['from']})")
+    elif 'format' in result:
+        print(f"Format:               {result['format']}")
+    if result.get('resumed_items'):
+        print(f"Resumed after:        {result['resumed_items']:,} items")
+    if len(result.get('parts', ())) > 1:
+        print(f"Parts:                {len(result['parts'])} "
+              f"(largest {max(part['tokens'] for part in result['parts']):,} tokens)")
+    if 'largest_array_path' in result:
+        print(f"Largest array:        {result['largest_array_path'] or '(top level)'} "
+              f"({result['largest_array_items']:,} items)")
+    if result.get('json_baseline') == 'off':
+        print("\n💰 Estimated Savings:  not measured (--json-baseline off)")
+    else:
+        print("\n💰 Estimated Savings:")
+        print(f"  Tokens saved:       ~{result['estimated_tokens_saved']:,}")
+        print(f"  Average savings:    ~{result['estimated_savings_percent']:.1f}%")
     print(f"\n⏱️  Processing time:   {result['processing_time']:.2f}s")
-    print(f"💾 Peak memory:        {result['peak_memory_mb']:.1f} MB")
+    if 'items_per_second' in result:
+        print(f"  Throughput:         {result['items_per_second']:,.0f} items/s, "
+              f"{result['input_mb_per_second']:.1f} MB/s")
+    start = (
+        f", {result['start_memory_mb']:.1f} MB at start" if 'start_memory_mb' in result else ""
+    )
+    print(f"💾 Peak memory:        {result['peak_memory_mb']:.1f} MB (RSS{start})")
+    if 'traced_peak_mb' in result:
+        print(f"  Traced peak:        {result['traced_peak_mb']:.1f} MB (tracemalloc)")
+    timeline = result.get('memory_timeline') or []
+    if len(timeline) > 1:
+        # At most 8 evenly spaced samples, always including the last
+        step = max(1, (len(timeline) - 1) // 7)
+        points = timeline[::step]
+        if points[-1] != timeline[-1]:
+            points.append(timeline[-1])
+        print("  Memory timeline:    " + " → ".join(
+            f"{seconds:.1f}s {rss_mb:.0f} MB" for seconds, rss_mb in points
+        ))
     print("="*60)
 
 
@@ -0,0 +1,250 @@
+"""Transparently decompressed inputs and compressed outputs"""
+
+import bz2
+import gzip
+import io
+import lzma
+import mmap
+import queue
+import threading
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+# Leading bytes of each supported compressed input
+_MAGIC = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'BZh', 'bz2'),
+)
+
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst', 'xz': '.xz', 'bz2': '.bz2'}
+
+# Formats outputs can be written in, with their default levels
+OUTPUT_COMPRESSIONS = {'gzip': 6, 'zstd': 3, 'xz': 6}
+
+# Text handed to the compression thread at a time
+_WRITE_BLOCK_SIZE = 256 * 1024
+
+# Assumed expansion of compressed JSON whose decompressed size is not
+# recorded in the file
+_ASSUMED_RATIO = 10
+
+
+def detect_compression(path) -> Optional[str]:
+    """Compression of a file from its magic bytes ('gzip', 'zstd', 'xz', 'bz2' or None)"""
+    with open(path, 'rb') as f:
+        head = f.read(6)
+    for magic, kind in _MAGIC:
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+def strip_compression_suffix(name: str) -> str:
+    """File name without a compression suffix ("data.json.gz" -> "data.json")"""
+    lowered = name.lower()
+    for suffix in COMPRESSION_SUFFIXES.values():
+        if lowered.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def uncompressed_size(path, size: int) -> int:
+    """Decompressed size of a file of size bytes, judged by its name
+
+    Only names with a compression suffix are opened: gzip records the size
+    (modulo 4 GiB) in its trailer, other formats are assumed to expand by
+    _ASSUMED_RATIO.
+    """
+    name = Path(path).name.lower()
+    if strip_compression_suffix(name) == name:
+        return size
+    if name.endswith(COMPRESSION_SUFFIXES['gzip']) and size >= 18:
+        with open(path, 'rb') as f:
+            f.seek(-4, 2)
+            recorded = int.from_bytes(f.read(4), 'little')
+        while recorded < size:
+            recorded += 1 << 32
+        return recorded
+    return size * _ASSUMED_RATIO
+
+
+def input_stem(path) -> str:
+    """Stem of an input path, ignoring a compression suffix ("data.json.gz" -> "data")"""
+    return Path(strip_compression_suffix(Path(path).name)).stem
+
+
+def open_input(path) -> BinaryIO:
+    """Open an input for binary reading, decompressing it on the fly if needed"""
+    kind = detect_compression(path)
+    if kind is None:
+        return open(path, 'rb')
+    if kind == 'gzip':
+        return gzip.open(path, 'rb')
+    if kind == 'xz':
+        return lzma.open(path, 'rb')
+    if kind == 'bz2':
+        return bz2.open(path, 'rb')
+    zstandard = _import_zstandard()
+    raw = open(path, 'rb')
+    try:
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    except BaseException:
+        raw.close()
+        raise
+    return io.BufferedReader(reader)
+
+
+def map_input(path) -> Optional[mmap.mmap]:
+    """Read-only memory map of an uncompressed input (None if it is compressed or cannot be mapped)
+
+    Empty files and files that are not regular (pipes, devices) cannot be
+    mapped. The map stays valid once the file is closed; close the map.
+    """
+    if detect_compression(path) is not None:
+        return None
+    with open(path, 'rb') as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+
+def read_input_text(path) -> str:
+    """Whole text of a (possibly compressed) UTF-8 input
+
+    Uncompressed inputs are decoded straight from a memory map of the page
+    cache, so the file is never held twice (as bytes and as text) in the
+    process's own memory.
+    """
+    mapped = map_input(path)
+    if mapped is not None:
+        with mapped:
+            return str(mapped, 'utf-8')
+    with open_input(path) as f:
+        return f.read().decode('utf-8')
+
+
+def compressed_name(path: Path, compression: Optional[str]) -> Path:
+    """Output path with the suffix of compression appended"""
+    if compression is None:
+        return path
+    return path.with_name(path.name + COMPRESSION_SUFFIXES[compression])
+
+
+def open_output(path, compression: Optional[str] = None, level: Optional[int] = None):
+    """Open a UTF-8 text output, compressed on a background thread if requested"""
+    if compression is None:
+        return open(path, 'w', encoding='utf-8')
+    if compression not in OUTPUT_COMPRESSIONS:
+        raise ValueError(f"Unknown output compression: {compression}")
+    return CompressingWriter(path, compression, level)
+
+
+class CompressingWriter:
+    """Text writer whose compression runs on a background thread
+
+    write() only gathers text; blocks of it are encoded and queued for the
+    thread, which compresses and writes them. zlib, lzma and zstd release
+    the GIL while compressing, so compression overlaps with encoding. At
+    most max_pending blocks wait in the queue, which bounds memory.
+    """
+
+    def __init__(
+        self,
+        path,
+        compression: str,
+        level: Optional[int] = None,
+        max_pending: int = 8
+    ):
+        if level is None:
+            level = OUTPUT_COMPRESSIONS[compression]
+        self._file = _open_compressor(path, compression, level)
+        self._pieces = []
+        self._size = 0
+        self._error: Optional[BaseException] = None
+        self._queue: queue.Queue = queue.Queue(max_pending)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.closed = False
+
+    def write(self, text: str) -> int:
+        self._pieces.append(text)
+        self._size += len(text)
+        if self._size >= _WRITE_BLOCK_SIZE:
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        """Hand the gathered text to the compression thread"""
+        if self._error is not None:
+            raise self._error
+        if self._pieces:
+            self._queue.put(''.join(self._pieces).encode('utf-8'))
+            self._pieces = []
+            self._size = 0
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self.closed = True
+            self._queue.put(None)
+            self._thread.join()
+            self._file.close()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Stop the thread without masking the original error
+            self._pieces = []
+            try:
+                self.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        while True:
+            data = self._queue.get()
+            if data is None:
+                return
+            if self._error is not None:
+                # Keep draining so the writer never blocks on a full queue
+                continue
+            try:
+                self._file.write(data)
+            except BaseException as e:
+                self._error = e
+
+
+def _open_compressor(path, compression: str, level: int) -> BinaryIO:
+    if compression == 'gzip':
+        return gzip.open(path, 'wb', compresslevel=level)
+    if compression == 'xz':
+        return lzma.open(path, 'wb', preset=level)
+    zstandard = _import_zstandard()
+    raw = open(path, 'wb')
+    try:
+        return zstandard.ZstdCompressor(level=level).stream_writer(raw, closefd=True)
+    except BaseException:
+        raw.close()
+        raise
+
+
+def _import_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(
+            "zstandard is required for .zst files. Install with: pip install zstandard"
+        )
+    return zstandard
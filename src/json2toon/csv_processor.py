@@ -0,0 +1,228 @@
+"""Streaming CSV/TSV → TOON tabular converter"""
+
+import csv
+import io
+import itertools
+import os
+import re
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .compression import (
+    compressed_name, input_stem, open_input, open_output, strip_compression_suffix
+)
+
+# Column delimiter of each input suffix
+CSV_SUFFIXES = {'.csv': ',', '.tsv': '\t'}
+
+# Rows whose cells decide the type of each column
+DEFAULT_INFER_ROWS = 1000
+
+# Numbers as JSON writes them; other spellings ("007", "1_000", "nan")
+# stay strings so nothing is lost
+_INT = re.compile(r'-?(?:0|[1-9]\d*)')
+_NUMBER = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?')
+
+
+def is_csv_name(path) -> bool:
+    """Whether a path names a CSV or TSV file (possibly compressed)"""
+    return Path(strip_compression_suffix(Path(path).name)).suffix.lower() in CSV_SUFFIXES
+
+
+def process_csv(
+    input_file: str,
+    output_dir: Optional[str] = None,
+    delimiter: str = "comma",
+    indent: int = 2,
+    quiet: bool = False,
+    verbose: bool = False,
+    csv_delimiter: Optional[str] = None,
+    infer_rows: int = DEFAULT_INFER_ROWS,
+    compress: Optional[str] = None,
+    compress_level: Optional[int] = None
+) -> Dict:
+    """
+    Convert a CSV or TSV file to one TOON table, streaming its rows
+
+    The first row names the fields. Rows are read with csv.reader and
+    written one at a time with TOONEncoder.encode_table, as the lists the
+    reader returns (no dict per row), so memory does not grow with the
+    file. The output is what TOONEncoder.encode gives for the rows as a
+    list of objects, i.e. for the JSON a CSV-to-JSON conversion would make.
+
+    Args:
+        input_file: Input CSV/TSV file path (may be compressed)
+        output_dir: Output directory
+        delimiter: Delimiter for the TOON table (comma/tab/pipe)
+        indent: Indentation spaces
+        quiet: Suppress output
+        verbose: Show detailed progress
+        csv_delimiter: Column delimiter of the input (default: tab for
+            .tsv files, comma otherwise)
+        infer_rows: Rows sampled to type each column: a column whose
+            non-empty cells all read as JSON numbers (or all as true/false)
+            is converted, with empty cells as null; cells of it that do not
+            read as such later on stay strings. 0 keeps every cell a string
+        compress: Compress the output ('gzip', 'zstd' or 'xz')
+        compress_level: Compression level (default: per format)
+
+    Returns:
+        Dictionary with the statistics of process_stream (the JSON
+        baseline is not measured) plus 'fields' and 'column_types'
+    """
+    from .stream_processor import _MemorySampler, _TokenTally
+    from .toon_converter import TOONEncoder
+
+    start_time = time.time()
+
+    input_path = Path(input_file)
+    if not input_path.exists():
+        raise FileNotFoundError(f"Input file not found: {input_file}")
+    if csv_delimiter is None:
+        suffix = Path(strip_compression_suffix(input_path.name)).suffix.lower()
+        csv_delimiter = CSV_SUFFIXES.get(suffix, ',')
+
+    output_path = Path(output_dir) if output_dir else input_path.parent
+    output_path.mkdir(parents=True, exist_ok=True)
+    output_file = compressed_name(output_path / f"{input_stem(input_path)}-min.toon", compress)
+
+    delimiter_map = {
+        'comma': ',',
+        'tab': '\t',
+        'pipe': '|'
+    }
+    encoder = TOONEncoder(delimiter=delimiter_map.get(delimiter, ','), indent=indent)
+
+    if not quiet:
+        print(f"\n🔄 Streaming CSV: {input_path.name}")
+        if verbose:
+            print(f"   Output: {output_file}")
+
+    partial_file = output_file.with_name(output_file.name + '.partial')
+    toon_tokens = _TokenTally()
+
+    sampler = _MemorySampler().start()
+    try:
+        with open_input(input_path) as raw, \
+                open_output(partial_file, compress, compress_level) as f_out:
+            reader = csv.reader(
+                io.TextIOWrapper(raw, encoding='utf-8-sig', newline=''), delimiter=csv_delimiter
+            )
+            fields = next(reader, [])
+            # Blank lines are skipped, as csv.DictReader does
+            rows = (row for row in reader if row)
+            sample = list(itertools.islice(rows, infer_rows))
+            column_types = _infer_column_types(sample, len(fields)) if fields else []
+            if verbose and not quiet:
+                print("   Columns: " + ', '.join(
+                    f"{field} ({kind})" for field, kind in zip(fields, column_types)
+                ))
+            rows = itertools.chain(sample, rows)
+            converters = [
+                (index, _CONVERTERS[kind]) for index, kind in enumerate(column_types)
+                if kind != 'string'
+            ]
+            if converters:
+                rows = _converted(rows, converters)
+            items_processed = encoder.encode_table(
+                rows, fields, out=_TallyWriter(f_out, toon_tokens)
+            )
+        os.replace(partial_file, output_file)
+    finally:
+        sampler.stop()
+        if partial_file.exists():
+            partial_file.unlink()
+
+    toon_tokens.flush()
+    processing_time = time.time() - start_time
+    input_mb = input_path.stat().st_size / 1024 / 1024
+
+    result = {
+        'input_file': str(input_path),
+        'output_file': str(output_file),
+        'chunks_processed': toon_tokens.chunks,
+        'items_processed': items_processed,
+        'estimated_json_tokens': 0,
+        'estimated_toon_tokens': toon_tokens.total,
+        'estimated_tokens_saved': None,
+        'estimated_savings_percent': None,
+        'json_baseline': 'off',
+        'processing_time': processing_time,
+        'items_per_second': items_processed / processing_time if processing_time > 0 else 0.0,
+        'input_mb_per_second': input_mb / processing_time if processing_time > 0 else 0.0,
+        'start_memory_mb': sampler.start_bytes / 1024 / 1024,
+        'peak_memory_mb': sampler.peak_bytes / 1024 / 1024,
+        'memory_timeline': sampler.timeline_mb(),
+        'format': 'TOON',
+        'fields': fields,
+        'column_types': dict(zip(fields, column_types)),
+    }
+
+    if not quiet:
+        print("\n✅ Streaming complete!")
+        print(f"   Processed: {items_processed:,} rows of {len(fields)} fields")
+        print(f"   Throughput: {result['items_per_second']:,.0f} rows/s, "
+              f"{result['input_mb_per_second']:.1f} MB/s")
+
+    return result
+
+
+def _infer_column_types(sample: List[List[str]], width: int) -> List[str]:
+    """'number', 'boolean' or 'string' for each column, from the sampled rows"""
+    types = []
+    for index in range(width):
+        cells = [row[index] for row in sample if index < len(row) and row[index] != '']
+        if cells and all(_NUMBER.fullmatch(cell) for cell in cells):
+            types.append('number')
+        elif cells and all(cell.lower() in ('true', 'false') for cell in cells):
+            types.append('boolean')
+        else:
+            types.append('string')
+    return types
+
+
+def _to_number(cell: str):
+    if cell == '':
+        return None
+    if _INT.fullmatch(cell):
+        return int(cell)
+    if _NUMBER.fullmatch(cell):
+        return float(cell)
+    return cell
+
+
+def _to_boolean(cell: str):
+    if cell == '':
+        return None
+    lowered = cell.lower()
+    if lowered == 'true':
+        return True
+    if lowered == 'false':
+        return False
+    return cell
+
+
+_CONVERTERS: Dict[str, Callable[[str], object]] = {'number': _to_number, 'boolean': _to_boolean}
+
+
+class _TallyWriter:
+    """Text writer counting the tokens of everything written through it"""
+
+    def __init__(self, f, tally):
+        self._f = f
+        self._tally = tally
+
+    def write(self, text: str) -> int:
+        self._f.write(text)
+        self._tally.add(text)
+        return len(text)
+
+
+def _converted(rows, converters: List[tuple]):
+    """Rows with the typed columns converted in place"""
+    for row in rows:
+        for index, convert in converters:
+            if index < len(row):
+                row[index] = convert(row[index])
+        yield row
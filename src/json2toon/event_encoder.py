@@ -0,0 +1,335 @@
+"""TOON encoder driven by ijson parse events, for documents larger than memory"""
+
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from .toon_converter import TOONEncoder
+
+# Arrays spanning more parse events than this are streamed item by item;
+# smaller ones are built in memory and encoded with TOONEncoder
+DEFAULT_MAX_BUFFERED_EVENTS = 10000
+
+Event = Tuple[str, Any]
+
+
+class EventTOONEncoder:
+    """Encodes a document from ijson.basic_parse events with bounded memory
+
+    TOON puts an array's length (and, for tables, its fields) in a header
+    before the items, which a single pass over events cannot know. A first
+    pass (scan) therefore records the length and layout of every array too
+    large to buffer, keyed by its position among all arrays of the document.
+    The second pass (encode) streams objects field by field and those large
+    arrays item by item; smaller arrays are buffered whole. Memory is bounded
+    by the nesting depth, max_buffered_events and one table row, and the
+    output is identical to TOONEncoder.encode of the whole document.
+
+    Arrays are addressed by dotted paths in ijson's notation: "data.results"
+    for {"data": {"results": [...]}}, with "item" standing for the items of
+    an array and "" for a top-level array. Arrays at stream_paths are always
+    streamed, whatever their size. After a scan, largest_array holds the
+    (path, item count) of the array spanning the most events.
+    """
+
+    def __init__(
+        self,
+        encoder: Optional[TOONEncoder] = None,
+        max_buffered_events: int = DEFAULT_MAX_BUFFERED_EVENTS,
+        stream_paths: Optional[Iterable[str]] = None
+    ):
+        self.encoder = encoder or TOONEncoder()
+        self.max_buffered_events = max_buffered_events
+        self.stream_paths = set(stream_paths or ())
+        self.largest_array: Optional[Tuple[str, int]] = None
+        self._ordinal = 0
+
+    def scan(self, events: Iterable[Event]) -> Dict[int, Tuple[int, tuple]]:
+        """First pass: (count, layout) of each array too large to buffer
+
+        Raises:
+            ValueError: If one of stream_paths is not an array of the document
+        """
+        large = {}
+        stack = []
+        ordinal = 0
+        largest_span = -1
+        found_paths = set()
+
+        for position, (event, value) in enumerate(events):
+            if event == 'start_map' or event == 'start_array':
+                parent = stack[-1] if stack else None
+                if parent is None:
+                    path = ''
+                else:
+                    component = 'item' if parent['array'] else parent['key']
+                    path = f"{parent['path']}.{component}" if parent['path'] else component
+                if parent is not None and parent['array']:
+                    # An item of the parent array
+                    parent['count'] += 1
+                    parent['all_primitive'] = False
+                    if event != 'start_map':
+                        parent['uniform'] = False
+                elif parent is not None and parent['owner'] is not None:
+                    # A container inside a table candidate's row
+                    parent['owner']['uniform'] = False
+
+                if event == 'start_array':
+                    stack.append({
+                        'array': True, 'path': path, 'start': position, 'ordinal': ordinal,
+                        'count': 0, 'all_primitive': True, 'uniform': True,
+                        'first_keys': None
+                    })
+                    ordinal += 1
+                else:
+                    owner = parent if parent is not None and parent['array'] else None
+                    stack.append({
+                        'array': False, 'path': path, 'key': None, 'owner': owner, 'keys': []
+                    })
+
+            elif event == 'end_map' or event == 'end_array':
+                frame = stack.pop()
+                if frame['array']:
+                    span = position - frame['start']
+                    if span > largest_span:
+                        largest_span = span
+                        self.largest_array = (frame['path'], frame['count'])
+                    forced = frame['path'] in self.stream_paths
+                    if forced:
+                        found_paths.add(frame['path'])
+                    if forced or span > self.max_buffered_events:
+                        large[frame['ordinal']] = (frame['count'], _scanned_layout(frame))
+                    continue
+                owner = frame['owner']
+                if owner is not None and owner['uniform']:
+                    keys = tuple(dict.fromkeys(frame['keys']))
+                    if owner['first_keys'] is None:
+                        owner['first_keys'] = keys
+                    elif set(keys) != set(owner['first_keys']):
+                        owner['uniform'] = False
+
+            elif event == 'map_key':
+                frame = stack[-1]
+                frame['key'] = value
+                if frame['owner'] is not None and frame['owner']['uniform']:
+                    frame['keys'].append(value)
+
+            elif stack and stack[-1]['array']:
+                # Primitive item
+                stack[-1]['count'] += 1
+                stack[-1]['uniform'] = False
+
+        missing = self.stream_paths - found_paths
+        if missing:
+            raise ValueError(f"No array at stream path: {', '.join(sorted(missing))}")
+        return large
+
+    def encode(
+        self,
+        events: Iterable[Event],
+        large_arrays: Dict[int, Tuple[int, tuple]],
+        write: Callable[[str], Any]
+    ):
+        """Second pass: write the TOON text of the document through write"""
+        self._ordinal = 0
+        self._large = large_arrays
+        events = _Lookahead(events)
+        out = _LineWriter(write)
+
+        event, value = events.next()
+        if event == 'start_map':
+            self._object(events, out, 0)
+        elif event == 'start_array':
+            self._array(events, out, 0)
+        else:
+            out.line(self.encoder._encode_primitive(value))
+
+    def _object(self, events: '_Lookahead', out: '_LineWriter', depth: int):
+        """Fields of an object whose start_map was consumed (see _encode_object)"""
+        indent = ' ' * self.encoder.indent
+        while True:
+            event, key = events.next()
+            if event == 'end_map':
+                return
+            formatted_key = self.encoder._format_key(key)
+
+            event, value = events.next()
+            if event == 'start_map':
+                out.line(f'{formatted_key}:')
+                if events.peek()[0] == 'end_map':
+                    events.next()
+                    continue
+                out.push(indent, indent, drop_empty_first=True, drop_empty_rest=True)
+                self._object(events, out, depth + 1)
+                out.pop()
+            elif event == 'start_array':
+                out.push(formatted_key, indent, drop_empty_first=False, drop_empty_rest=True)
+                self._array(events, out, depth + 1)
+                out.pop()
+            else:
+                out.line(f'{formatted_key}: {self.encoder._encode_primitive(value)}')
+
+    def _array(self, events: '_Lookahead', out: '_LineWriter', depth: int):
+        """An array whose start_array was consumed (see _encode_array)"""
+        info = self._large.get(self._ordinal)
+        self._ordinal += 1
+        encoder = self.encoder
+
+        if info is None:
+            encoded = encoder._encode_array(self._build(events, 'start_array'), depth)
+            for line in encoded.split('\n'):
+                out.line(line)
+            return
+
+        count, layout = info
+        kind = layout[0]
+
+        if kind == 'primitive':
+            out.begin_line(f'[{count}]: ')
+            separator = ''
+            for event, value in _until_end(events, 'end_array'):
+                out.append(separator + encoder._encode_primitive(value))
+                separator = encoder.delimiter
+            return
+
+        if kind == 'tabular':
+            keys = list(layout[1])
+            delimiter_in_header = encoder.delimiter if encoder.delimiter != ',' else ''
+            out.line(f'[{count}{delimiter_in_header}]{{{encoder.delimiter.join(keys)}}}')
+            indent_str = ' ' * (depth * encoder.indent)
+            for event, value in _until_end(events, 'end_array'):
+                row = self._build(events, event)
+                if set(row) != set(keys):
+                    raise ValueError("Document changed between scan and encode")
+                out.line(indent_str + encoder.encode_table_row(row, keys))
+            return
+
+        out.line(f'[{count}]:')
+        indent_str = ' ' * ((depth + 1) * encoder.indent)
+        for event, value in _until_end(events, 'end_array'):
+            if event == 'start_map':
+                if events.peek()[0] == 'end_map':
+                    events.next()
+                    out.line(f'{indent_str}- ')
+                    continue
+                out.push(
+                    f'{indent_str}- ', indent_str, drop_empty_first=False, drop_empty_rest=True
+                )
+                self._object(events, out, depth + 1)
+                out.pop()
+            elif event == 'start_array':
+                out.push(f'{indent_str}- ', '', drop_empty_first=False, drop_empty_rest=False)
+                self._array(events, out, depth + 2)
+                out.pop()
+            else:
+                out.line(f'{indent_str}- {encoder._encode_primitive(value)}')
+
+    def _build(self, events: '_Lookahead', event: str) -> Any:
+        """Build the container whose start event was consumed"""
+        root = {} if event == 'start_map' else []
+        stack = [root]
+        keys = [None]
+        while stack:
+            event, value = events.next()
+            if event == 'map_key':
+                keys[-1] = value
+                continue
+            if event == 'end_map' or event == 'end_array':
+                stack.pop()
+                keys.pop()
+                continue
+            if event == 'start_map':
+                item = {}
+            elif event == 'start_array':
+                # Keep array positions in step with the scan
+                self._ordinal += 1
+                item = []
+            else:
+                item = value
+            parent = stack[-1]
+            if isinstance(parent, list):
+                parent.append(item)
+            else:
+                parent[keys[-1]] = item
+            if event == 'start_map' or event == 'start_array':
+                stack.append(item)
+                keys.append(None)
+        return root
+
+
+def _scanned_layout(frame: Dict) -> tuple:
+    if frame['count'] == 0:
+        return ('empty',)
+    if frame['all_primitive']:
+        return ('primitive',)
+    if frame['uniform']:
+        return ('tabular', frame['first_keys'])
+    return ('list',)
+
+
+def _until_end(events: '_Lookahead', end_event: str) -> Iterator[Event]:
+    """Yield the first event of each item until the container ends"""
+    while True:
+        event = events.next()
+        if event[0] == end_event:
+            return
+        yield event
+
+
+class _Lookahead:
+    """Event iterator with one event of lookahead"""
+
+    def __init__(self, events: Iterable[Event]):
+        self._events = iter(events)
+        self._peeked = None
+
+    def next(self) -> Event:
+        if self._peeked is not None:
+            event, self._peeked = self._peeked, None
+            return event
+        return next(self._events)
+
+    def peek(self) -> Event:
+        if self._peeked is None:
+            self._peeked = next(self._events)
+        return self._peeked
+
+
+class _LineWriter:
+    """Writes lines through the re-indentation TOONEncoder applies to nested values
+
+    TOONEncoder encodes a nested value to a string and then prefixes its
+    lines (the first line and the rest differently), dropping empty ones in
+    some contexts. Each open context is a frame applying the same rule to
+    the lines emitted inside it, innermost first.
+    """
+
+    def __init__(self, write: Callable[[str], Any]):
+        self._write = write
+        self._frames = []
+        self._started = False
+
+    def push(
+        self, first_prefix: str, rest_prefix: str, drop_empty_first: bool, drop_empty_rest: bool
+    ):
+        self._frames.append([first_prefix, rest_prefix, drop_empty_first, drop_empty_rest, True])
+
+    def pop(self):
+        self._frames.pop()
+
+    def line(self, text: str):
+        self.begin_line(text)
+
+    def begin_line(self, text: str):
+        """Start a line; append() may add to it until the next line starts"""
+        for frame in reversed(self._frames):
+            first_prefix, rest_prefix, drop_empty_first, drop_empty_rest, is_first = frame
+            frame[4] = False
+            if not text and (drop_empty_first if is_first else drop_empty_rest):
+                return
+            text = (first_prefix if is_first else rest_prefix) + text
+        if self._started:
+            self._write('\n')
+        self._write(text)
+        self._started = True
+
+    def append(self, text: str):
+        self._write(text)
@@ -0,0 +1,187 @@
+"""Lazy discovery of batch input files"""
+
+import fnmatch
+import glob
+import hashlib
+import heapq
+import os
+import re
+from pathlib import Path, PurePath
+from typing import Iterable, Iterator, List, Optional, Pattern, Tuple
+
+from .archive_inputs import is_archive, iter_archive_members
+from .compression import strip_compression_suffix
+
+
+class ExcludeMatcher:
+    """Exclude patterns compiled once, with the semantics of Path.match
+
+    Relative patterns match the trailing components of a path
+    ("tmp_*", "cache/*.json"); absolute patterns must match the whole path.
+    """
+
+    def __init__(self, patterns: Optional[Iterable[str]]):
+        self._patterns: List[Tuple[str, List[Pattern]]] = []
+        for pattern in patterns or []:
+            pure = PurePath(pattern)
+            parts = pure.parts[1:] if pure.anchor else pure.parts
+            compiled = [_compile_glob(part) for part in parts]
+            if compiled:
+                self._patterns.append((pure.anchor, compiled))
+
+    def __bool__(self) -> bool:
+        return bool(self._patterns)
+
+    def matches(self, path) -> bool:
+        pure = PurePath(path)
+        parts = pure.parts
+        for anchor, compiled in self._patterns:
+            if anchor:
+                if pure.anchor != anchor or len(parts) - 1 != len(compiled):
+                    continue
+                candidate = parts[1:]
+            else:
+                if len(parts) < len(compiled):
+                    continue
+                candidate = parts[len(parts) - len(compiled):]
+            if all(regex.match(part) for regex, part in zip(compiled, candidate)):
+                return True
+        return False
+
+
+def _compile_glob(pattern: str) -> Pattern:
+    flags = re.IGNORECASE if os.name == 'nt' else 0
+    return re.compile(fnmatch.translate(pattern), flags)
+
+
+def iter_input_paths(
+    inputs: Iterable[str],
+    recursive: bool = False,
+    pattern: str = "*.json",
+    exclude: Optional[Iterable[str]] = None,
+    shard: Optional[Tuple[int, int]] = None
+) -> Iterator[Path]:
+    """Yield JSON input files as they are found
+
+    Directories are walked with os.scandir; excluded directories are pruned
+    without being listed, and nothing is accumulated, so the first paths are
+    available immediately even on very large trees. Archives (.zip, .tar,
+    .tar.gz, ...) given as inputs or matched by a glob are expanded into
+    ArchiveMember entries for their JSON members, without extracting them.
+    Compressed files (data.json.gz, .zst, .xz, .bz2) count as JSON files
+    and match the pattern by their name without the compression suffix.
+
+    Args:
+        inputs: Files, directories or glob patterns
+        recursive: Descend into subdirectories (and allow ** in globs)
+        pattern: File name pattern used inside directories
+        exclude: Patterns for files, directories and archive members to skip
+        shard: (K, N) to only yield the files of shard K out of N (1-based),
+            assigned by a stable hash of each file's path relative to the
+            input it was found under
+    """
+    excludes = ExcludeMatcher(exclude)
+    name_regex = _compile_glob(pattern) if '/' not in pattern else None
+
+    for input_str in inputs:
+        input_path = Path(input_str)
+
+        root = None
+        if input_path.is_file():
+            candidates = iter([input_path])
+        elif input_path.is_dir():
+            root = input_path
+            candidates = _walk(input_path, recursive, pattern, name_regex, excludes)
+        else:
+            # Try glob pattern
+            candidates = (Path(p) for p in glob.iglob(input_str, recursive=recursive))
+
+        for path in candidates:
+            if root is None and is_archive(path) and path.is_file():
+                for member in iter_archive_members(path, name_regex, excludes):
+                    key = f"{path.name}/{member.name}"
+                    if shard is None or shard_of(key, shard[1]) == shard[0]:
+                        yield member
+                continue
+            if (PurePath(strip_compression_suffix(path.name)).suffix != '.json'
+                    or (excludes and excludes.matches(path))):
+                continue
+            if shard is not None:
+                relative = path.relative_to(root) if root is not None else path
+                if shard_of(relative.as_posix(), shard[1]) != shard[0]:
+                    continue
+            yield path
+
+
+def shard_of(key: str, shard_count: int) -> int:
+    """Stable 1-based shard for a relative path, identical on every node"""
+    digest = hashlib.md5(key.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shard_count + 1
+
+
+def iter_listing_shard(listing_file: str, shard: Tuple[int, int]) -> Iterator[Path]:
+    """Yield the files of one shard from a precomputed listing, balanced by size
+
+    The listing has one file per line, either "size<TAB>path" or just a path
+    (which is then stat'ed). Files are assigned largest first to the shard
+    with the smallest total (ties broken by shard number), so every node
+    reading the same listing computes the same assignment.
+    """
+    entries = []
+    with open(listing_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line:
+                continue
+            size_text, sep, path_text = line.partition('\t')
+            if sep and size_text.isdigit():
+                entries.append((int(size_text), path_text))
+            else:
+                entries.append((os.stat(line).st_size, line))
+
+    shard_index, shard_count = shard
+    entries.sort(key=lambda entry: (-entry[0], entry[1]))
+    loads = [(0, k) for k in range(1, shard_count + 1)]
+    for size, path_text in entries:
+        load, k = heapq.heappop(loads)
+        if k == shard_index:
+            yield Path(path_text)
+        heapq.heappush(loads, (load + size, k))
+
+
+def _walk(
+    root: Path,
+    recursive: bool,
+    pattern: str,
+    name_regex: Optional[Pattern],
+    excludes: ExcludeMatcher
+) -> Iterator[Path]:
+    """Depth-first scandir walk yielding files whose name matches the pattern"""
+    stack = [str(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                subdirs = []
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if is_dir:
+                        if recursive and not (excludes and excludes.matches(entry.path)):
+                            subdirs.append(entry.path)
+                        continue
+                    if name_regex is not None:
+                        if ((name_regex.match(entry.name)
+                             or name_regex.match(strip_compression_suffix(entry.name)))
+                                and entry.is_file()):
+                            yield Path(entry.path)
+                    elif entry.is_file():
+                        path = Path(entry.path)
+                        if path.relative_to(root).match(pattern):
+                            yield path
+        except OSError:
+            continue
+        # Visit subdirectories in listing order
+        stack.extend(reversed(subdirs))
@@ -0,0 +1,149 @@
+"""Append-only checkpoint journal for resumable batch processing"""
+
+import hashlib
+import json
+import os
+import zipfile
+from pathlib import Path
+from typing import Dict, Optional
+
+from .archive_inputs import ArchiveMember
+
+
+def file_digest(path: Path, block_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a file's content, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def input_digest(path) -> str:
+    """SHA-256 of an input file or archive member"""
+    if isinstance(path, ArchiveMember):
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    return file_digest(path)
+
+
+def input_stat(path) -> tuple:
+    """(size, mtime_ns) of an input; members have their own size and their archive's mtime"""
+    if isinstance(path, ArchiveMember):
+        return path.size, path.archive.stat().st_mtime_ns
+    stat = path.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def sync_output(output: Path):
+    """Flush an output (and the parts a parts manifest lists) and its directory to disk"""
+    paths = [output]
+    if output.name.endswith('.parts.json'):
+        with open(output, 'r', encoding='utf-8') as f:
+            paths.extend(output.with_name(part['file']) for part in json.load(f).get('parts', []))
+    for path in paths:
+        with open(path, 'rb') as f:
+            os.fsync(f.fileno())
+    try:
+        fd = os.open(output.parent, os.O_RDONLY)
+    except OSError:
+        # Directories cannot be opened on every platform (e.g. Windows)
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class BatchJournal:
+    """Records completed batch inputs so an interrupted run can resume
+
+    Each completed file is appended as one JSON line holding the batch record
+    plus the input size and content hash. An entry is only written after its
+    output has been renamed into place and flushed to disk, and a torn last
+    line (from a crash mid-append) is ignored on load, so every journaled
+    output is complete.
+
+    The encoder options of a run are appended as a header line whenever they
+    differ from those of the previous run; entries journaled under other
+    options than the current ones do not count as done.
+    """
+
+    def __init__(self, path: str, options: Optional[Dict] = None):
+        self.path = Path(path)
+        # Compared with headers read back from JSON
+        self.options = json.loads(json.dumps(options or {}))
+        # Raw lines keyed by input path; parsed on lookup to keep memory low
+        self._entries: Dict[str, str] = {}
+        torn_tail = False
+        # Journals written before options were recorded have no header
+        journaled_options = None
+
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    torn_tail = not line.endswith('\n')
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if not isinstance(entry, dict):
+                        continue
+                    if 'input' in entry:
+                        if journaled_options == self.options:
+                            self._entries[entry['input']] = line
+                        else:
+                            # Converted again with other options since
+                            self._entries.pop(entry['input'], None)
+                    elif 'options' in entry:
+                        journaled_options = entry['options']
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._file = open(self.path, 'a', encoding='utf-8')
+        if torn_tail:
+            # Terminate the partial line so the next entry starts cleanly
+            self._file.write('\n')
+        if journaled_options != self.options:
+            self._append(json.dumps({'options': self.options}, ensure_ascii=False) + '\n')
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, path) -> Optional[Dict]:
+        """Journaled record for path (or archive member) if its input and output are unchanged"""
+        line = self._entries.get(str(path))
+        if line is None:
+            return None
+
+        entry = json.loads(line)
+        try:
+            if input_stat(path)[0] != entry['size']:
+                return None
+            if not Path(entry['output']).exists():
+                return None
+            if input_digest(path) != entry['sha256']:
+                return None
+        except (OSError, KeyError, zipfile.BadZipFile):
+            # Including members gone from their archive, or an archive gone bad
+            return None
+
+        record = {k: v for k, v in entry.items() if k not in ('size', 'sha256')}
+        return record
+
+    def record(self, record: Dict, size: int, sha256: str):
+        """Durably append a completed record, once its output is on disk"""
+        sync_output(Path(record['output']))
+        entry = dict(record, size=size, sha256=sha256)
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        self._append(line)
+        self._entries[entry['input']] = line
+
+    def _append(self, line: str):
+        self._file.write(line)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
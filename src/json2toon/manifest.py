@@ -0,0 +1,113 @@
+"""Build manifest for incremental batch conversion"""
+
+import json
+import os
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .archive_inputs import split_member_key
+from .journal import input_digest, input_stat
+from .token_parts import remove_parts
+
+
+MANIFEST_VERSION = 1
+
+
+class BuildManifest:
+    """Maps each input to the output built from it and the state it was built from
+
+    An input is up to date when its size and modification time match the
+    manifest, it was converted with the same encoder options and its output
+    still exists, which only costs two stat calls. When only the modification
+    time changed (e.g. a sync touched the file), the content hash decides.
+    Archive members are judged by their own size and their archive's
+    modification time, so only members of a changed archive are hashed.
+    """
+
+    def __init__(self, path: str, options: Dict):
+        self.path = Path(path)
+        self.options = options
+        self._entries: Dict[str, Dict] = {}
+        self._seen = set()
+
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                self._entries = data.get('entries', {})
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, path) -> Optional[Dict]:
+        """Stored record for path (or archive member) if its output is up to date, else None"""
+        key = str(path)
+        self._seen.add(key)
+        entry = self._entries.get(key)
+        if entry is None or entry['options'] != self.options:
+            return None
+
+        try:
+            size, mtime_ns = input_stat(path)
+        except OSError:
+            return None
+        if size != entry['size'] or not Path(entry['record']['output']).exists():
+            return None
+
+        if mtime_ns != entry['mtime_ns']:
+            # Same size, new timestamp: only rebuild if the content changed
+            try:
+                if input_digest(path) != entry['sha256']:
+                    return None
+            except (OSError, KeyError, zipfile.BadZipFile):
+                return None
+            entry['mtime_ns'] = mtime_ns
+
+        return dict(entry['record'])
+
+    def update(self, record: Dict, size: int, mtime_ns: int, sha256: str):
+        """Record a freshly converted input"""
+        self._seen.add(record['input'])
+        self._entries[record['input']] = {
+            'size': size,
+            'mtime_ns': mtime_ns,
+            'sha256': sha256,
+            'options': self.options,
+            'record': record
+        }
+
+    def remove_stale(self) -> List[str]:
+        """Delete outputs whose input no longer exists; returns the removed outputs"""
+        removed = []
+        for key in list(self._entries):
+            if key in self._seen or _input_exists(key):
+                continue
+            output = Path(self._entries.pop(key)['record']['output'])
+            if output.exists():
+                if output.name.endswith('.parts.json'):
+                    remove_parts(output)
+                else:
+                    output.unlink()
+                removed.append(str(output))
+        return removed
+
+    def save(self):
+        """Atomically write the manifest"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(
+                {'version': MANIFEST_VERSION, 'entries': self._entries}, f, ensure_ascii=False
+            )
+        os.replace(tmp_path, self.path)
+
+
+def _input_exists(key: str) -> bool:
+    """Whether the input of a manifest key still exists
+
+    Members count as existing as long as their archive does: telling
+    whether a tar still holds one would mean reading the whole archive.
+    """
+    member = split_member_key(key)
+    return (member[0] if member is not None else Path(key)).exists()
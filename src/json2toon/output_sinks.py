@@ -0,0 +1,341 @@
+"""Output sinks that store every converted file in a single container"""
+
+import abc
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tarfile
+import time
+import zipfile
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .work_queue import path_key
+
+
+# Text copied into a container at a time when storing an output file
+_COPY_BLOCK_SIZE = 1024 * 1024
+
+# Format names accepted for the kind argument, with the suffixes they are
+# inferred from
+SINK_KINDS = {
+    'tar': ('.tar',),
+    'tar.gz': ('.tar.gz', '.tgz'),
+    'zip': ('.zip',),
+    'jsonl': ('.jsonl',),
+    'sqlite': ('.db', '.sqlite', '.sqlite3'),
+}
+
+_FORMAT_HEADER = 'JSON2TOON.format'
+
+
+def sink_kind(path: str, kind: Optional[str] = None) -> str:
+    """Container kind for path, from kind or the file suffix"""
+    if kind:
+        if kind not in SINK_KINDS:
+            raise ValueError(f"Unknown sink kind: {kind}")
+        return kind
+    name = Path(path).name.lower()
+    for candidate, suffixes in SINK_KINDS.items():
+        if name.endswith(suffixes):
+            return candidate
+    raise ValueError(
+        f"Cannot infer sink kind from {path}; use one of "
+        + ", ".join(s for suffixes in SINK_KINDS.values() for s in suffixes)
+    )
+
+
+def open_sink(path: str, kind: Optional[str] = None, commit_every: int = 1000) -> 'OutputSink':
+    """Open a sink for writing; the kind is inferred from the suffix by default"""
+    kind = sink_kind(path, kind)
+    if kind == 'sqlite':
+        return SqliteSink(path, commit_every)
+    if kind == 'zip':
+        return ZipSink(path, commit_every)
+    if kind == 'jsonl':
+        return JsonlSink(path, commit_every)
+    return TarSink(path, commit_every, compress=(kind == 'tar.gz'))
+
+
+def read_sink_entry(path: str, key: str, kind: Optional[str] = None) -> Tuple[str, str]:
+    """Fetch the (format, content) stored for one input path
+
+    The key is normalized as when it was stored, so "./data/x.json" finds
+    the entry of "data/x.json" in every kind of container.
+
+    Raises:
+        KeyError: If the container holds no entry for key
+    """
+    kind = sink_kind(path, kind)
+    key = path_key(key)
+    if kind == 'sqlite':
+        connection = sqlite3.connect(path)
+        try:
+            row = connection.execute(
+                "SELECT format, content FROM outputs WHERE input = ?", (key,)
+            ).fetchone()
+        finally:
+            connection.close()
+        if row is None:
+            raise KeyError(key)
+        # Outputs stored from files are UTF-8 blobs (see SqliteSink)
+        content = row[1].decode('utf-8') if isinstance(row[1], bytes) else row[1]
+        return row[0], content
+
+    if kind == 'zip':
+        with zipfile.ZipFile(path) as archive:
+            info = archive.getinfo(_member_name(key))
+            return info.comment.decode('utf-8'), archive.read(info).decode('utf-8')
+
+    if kind == 'jsonl':
+        found = None
+        needle = json.dumps(key, ensure_ascii=False)
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                # Cheap substring test before parsing; the last entry wins
+                if needle not in line:
+                    continue
+                entry = json.loads(line)
+                if entry['input'] == key:
+                    found = entry
+        if found is None:
+            raise KeyError(key)
+        return found['format'], found['content']
+
+    with tarfile.open(path, 'r:*') as archive:
+        member_name = _member_name(key)
+        for member in archive:
+            if member.name == member_name:
+                content = archive.extractfile(member).read().decode('utf-8')
+                return member.pax_headers.get(_FORMAT_HEADER, ''), content
+    raise KeyError(key)
+
+
+def _member_name(key: str) -> str:
+    """Archive member name for an input path (archives store relative names)"""
+    return Path(key).as_posix().lstrip('/')
+
+
+class OutputSink(abc.ABC):
+    """Collects converted outputs keyed by input path and writes them in bulk
+
+    Entries are buffered and handed to the container commit_every at a time;
+    outputs already written to a file (streamed conversions, which can be
+    larger than memory) are copied into the container block by block.
+    Archive and JSONL containers are built next to their destination and
+    renamed into place on close, so a crashed run never leaves a truncated
+    container behind; SQLite writes the bulks in one transaction committed
+    on close, so abort() rolls all of them back.
+    """
+
+    def __init__(self, path: str, commit_every: int = 1000):
+        self.path = Path(path)
+        self.commit_every = max(1, commit_every)
+        self.entries_written = 0
+        self._buffer: List[Tuple[str, str, str]] = []
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def add(self, key: str, content: str, format_name: str):
+        """Store content converted from input path key"""
+        self._buffer.append((path_key(key), format_name, content))
+        if len(self._buffer) >= self.commit_every:
+            self.commit()
+
+    def add_file(self, key: str, path: Path, format_name: str):
+        """Store the content of an already written output file, without reading it whole"""
+        # Keep the entries in the order they were added
+        self.commit()
+        self._write_file(path_key(key), format_name, Path(path))
+        self.entries_written += 1
+
+    def commit(self):
+        """Write all buffered entries to the container"""
+        if self._buffer:
+            self._write_entries(self._buffer)
+            self.entries_written += len(self._buffer)
+            self._buffer = []
+
+    def close(self):
+        self.commit()
+        self._finish()
+
+    def abort(self):
+        """Discard the container being built"""
+        self._buffer = []
+        self._finish(keep=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    @abc.abstractmethod
+    def _write_entries(self, entries: List[Tuple[str, str, str]]):
+        """Write (key, format, content) entries to the container"""
+
+    @abc.abstractmethod
+    def _write_file(self, key: str, format_name: str, path: Path):
+        """Copy an output file into the container as one entry"""
+
+    @abc.abstractmethod
+    def _finish(self, keep: bool = True):
+        """Publish the container (keep) or discard what this run wrote"""
+
+
+class _ReplacingSink(OutputSink):
+    """Sink written to a temporary sibling and renamed into place on close"""
+
+    def __init__(self, path: str, commit_every: int = 1000):
+        super().__init__(path, commit_every)
+        self._tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+
+    def _finish(self, keep: bool = True):
+        self._close_container()
+        if keep:
+            os.replace(self._tmp_path, self.path)
+        elif self._tmp_path.exists():
+            self._tmp_path.unlink()
+
+    @abc.abstractmethod
+    def _close_container(self):
+        """Close the temporary container file"""
+
+
+class TarSink(_ReplacingSink):
+    """Tar archive (optionally gzip-compressed); the format is kept in a pax header"""
+
+    def __init__(self, path: str, commit_every: int = 1000, compress: bool = False):
+        super().__init__(path, commit_every)
+        self._archive = tarfile.open(
+            self._tmp_path, 'w:gz' if compress else 'w', format=tarfile.PAX_FORMAT
+        )
+
+    def _write_entries(self, entries):
+        now = time.time()
+        for key, format_name, content in entries:
+            data = content.encode('utf-8')
+            info = tarfile.TarInfo(_member_name(key))
+            info.size = len(data)
+            info.mtime = now
+            info.pax_headers = {_FORMAT_HEADER: format_name}
+            self._archive.addfile(info, io.BytesIO(data))
+
+    def _write_file(self, key, format_name, path):
+        info = tarfile.TarInfo(_member_name(key))
+        info.size = path.stat().st_size
+        info.mtime = time.time()
+        info.pax_headers = {_FORMAT_HEADER: format_name}
+        with open(path, 'rb') as f:
+            self._archive.addfile(info, f)
+
+    def _close_container(self):
+        self._archive.close()
+
+
+class ZipSink(_ReplacingSink):
+    """Zip archive with deflated members; the format is kept as the member comment"""
+
+    def __init__(self, path: str, commit_every: int = 1000):
+        super().__init__(path, commit_every)
+        self._archive = zipfile.ZipFile(self._tmp_path, 'w', zipfile.ZIP_DEFLATED)
+
+    def _write_entries(self, entries):
+        date_time = time.localtime()[:6]
+        for key, format_name, content in entries:
+            info = zipfile.ZipInfo(_member_name(key), date_time=date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.comment = format_name.encode('utf-8')
+            self._archive.writestr(info, content.encode('utf-8'))
+
+    def _write_file(self, key, format_name, path):
+        info = zipfile.ZipInfo(_member_name(key), date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.comment = format_name.encode('utf-8')
+        with open(path, 'rb') as src, self._archive.open(info, 'w', force_zip64=True) as dst:
+            shutil.copyfileobj(src, dst, _COPY_BLOCK_SIZE)
+
+    def _close_container(self):
+        self._archive.close()
+
+
+class JsonlSink(_ReplacingSink):
+    """One JSON line per input: {"input": ..., "format": ..., "content": ...}"""
+
+    def __init__(self, path: str, commit_every: int = 1000):
+        super().__init__(path, commit_every)
+        self._file = open(self._tmp_path, 'w', encoding='utf-8')
+
+    def _write_entries(self, entries):
+        self._file.write(''.join(
+            json.dumps({'input': key, 'format': format_name, 'content': content},
+                       ensure_ascii=False) + '\n'
+            for key, format_name, content in entries
+        ))
+
+    def _write_file(self, key, format_name, path):
+        # The same line add() writes, with the content escaped block by block
+        head = json.dumps({'input': key, 'format': format_name, 'content': ''}, ensure_ascii=False)
+        self._file.write(head[:-2])
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for block in iter(lambda: f.read(_COPY_BLOCK_SIZE), ''):
+                self._file.write(json.dumps(block, ensure_ascii=False)[1:-1])
+        self._file.write('"}\n')
+
+    def _close_container(self):
+        self._file.close()
+
+
+class SqliteSink(OutputSink):
+    """SQLite table outputs(input PRIMARY KEY, format, content), updated in place
+
+    Outputs stored from files are written with incremental blob I/O (on
+    Python 3.11+), so their content is a UTF-8 BLOB rather than TEXT;
+    read_sink_entry decodes either.
+    """
+
+    def __init__(self, path: str, commit_every: int = 1000):
+        super().__init__(path, commit_every)
+        self._connection = sqlite3.connect(str(self.path))
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS outputs "
+            "(input TEXT PRIMARY KEY, format TEXT NOT NULL, content TEXT NOT NULL)"
+        )
+        self._connection.commit()
+
+    def _write_entries(self, entries):
+        # Left uncommitted until _finish
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO outputs (input, format, content) VALUES (?, ?, ?)",
+            entries
+        )
+
+    def _write_file(self, key, format_name, path):
+        if not hasattr(self._connection, 'blobopen'):
+            # Incremental blob I/O needs Python 3.11
+            with open(path, 'r', encoding='utf-8', newline='') as f:
+                self._write_entries([(key, format_name, f.read())])
+            return
+        # Reserve a blob of the file's size, then fill it block by block
+        cursor = self._connection.execute(
+            "INSERT OR REPLACE INTO outputs (input, format, content) VALUES (?, ?, zeroblob(?))",
+            (key, format_name, path.stat().st_size)
+        )
+        with open(path, 'rb') as f, \
+                self._connection.blobopen('outputs', 'content', cursor.lastrowid) as blob:
+            for block in iter(lambda: f.read(_COPY_BLOCK_SIZE), b''):
+                blob.write(block)
+
+    def _finish(self, keep: bool = True):
+        try:
+            if keep:
+                self._connection.commit()
+            else:
+                self._connection.rollback()
+        finally:
+            self._connection.close()
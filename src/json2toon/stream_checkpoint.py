@@ -0,0 +1,53 @@
+"""Sidecar checkpoints for resuming an interrupted streaming conversion"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class StreamCheckpoint:
+    """Progress of one streaming conversion, saved next to its partial output
+
+    A checkpoint records where the input can be re-entered (the byte offset
+    just after a top-level comma), how many items and output bytes precede
+    that point and the running token totals. The output is flushed and
+    fsynced before each save, and saves replace the sidecar atomically, so a
+    checkpoint never claims output that is not on disk. Checkpoints only
+    apply to the same input (size and modification time) and options.
+    """
+
+    def __init__(self, path, input_path: Path, options: Dict):
+        self.path = Path(path)
+        stat = input_path.stat()
+        self._identity = {
+            'input': str(input_path.resolve()),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'options': options,
+        }
+
+    def load(self) -> Optional[Dict]:
+        """Saved progress, or None if there is none for this input and these options"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict):
+            return None
+        if any(entry.get(key) != value for key, value in self._identity.items()):
+            return None
+        return entry.get('state')
+
+    def save(self, state: Dict):
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(self._identity, state=state), f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if self.path.exists():
+            self.path.unlink()
@@ -1,10 +1,16 @@
 """Streaming processor for very large JSON files"""
 
+import codecs
 import json
+import os
+import shutil
+import threading
 import time
 import tracemalloc
 from pathlib import Path
-from typing import Dict, Iterator, Any, Optional
+from typing import Dict, Iterator, Any, List, Optional
+
+from .compression import detect_compression, open_input, open_output, read_input_text
 
 
 def process_stream(
@@ -14,11 +20,29 @@ def process_stream(
     delimiter: str = "comma",
     indent: int = 2,
     quiet: bool = False,
-    verbose: bool = False
+    verbose: bool = False,
+    stream_path: Optional[str] = None,
+    workers: int = 1,
+    trace_memory: bool = False,
+    json_baseline: str = "raw",
+    compress: Optional[str] = None,
+    compress_level: Optional[int] = None,
+    resume: bool = False,
+    checkpoint_interval: float = 30.0,
+    max_tokens_per_file: Optional[int] = None,
+    format_choice: str = "toon",
+    format_sample_chunks: int = 3,
+    format_recheck_every: int = 50,
+    progress_file: Optional[str] = None,
+    progress_interval: float = 1.0
 ) -> Dict:
     """
     Process large JSON files using streaming to minimize memory usage
     
+    Arrays anywhere in the document are streamed item by item once they are
+    too large to buffer, in place and at their normal indentation, while the
+    surrounding objects are encoded field by field.
+    
     Args:
         input_file: Input JSON file path
         output_dir: Output directory
@@ -27,26 +51,76 @@ def process_stream(
         indent: Indentation spaces
         quiet: Suppress output
         verbose: Show detailed progress
+        stream_path: Dotted path of an array to always stream item by item
+            (e.g. "data.results"); the largest array found is reported as
+            'largest_array_path' either way
+        workers: Processes encoding chunks of a top-level array in parallel
+        trace_memory: Also trace Python allocations with tracemalloc
+            ('traced_peak_mb'); this hooks every allocation and slows
+            encoding down severalfold, so by default only the resident set
+            size is sampled
+        json_baseline: How the JSON token count savings are measured
+            against: "raw" tokenizes the input bytes with whitespace
+            outside strings removed, "sample" tokenizes one block in
+            _BASELINE_SAMPLE_EVERY and extrapolates, "off" skips it
+            ('estimated_tokens_saved' and 'estimated_savings_percent'
+            are then None)
+        compress: Compress the output ('gzip', 'zstd' or 'xz') on a
+            background thread; inputs compressed with gzip, zstd, xz or
+            bzip2 are always decompressed on the fly
+        compress_level: Compression level (default: per format)
+        resume: Checkpoint a top-level array's progress to a sidecar file
+            next to the partial output (about every checkpoint_interval
+            seconds) and continue from a checkpoint left by an interrupted
+            run with the same input and options, if there is one. Not
+            supported with compress
+        checkpoint_interval: Seconds between checkpoints when resuming
+        max_tokens_per_file: Split a top-level array into TOON parts of at
+            most this many tokens, each with its own header; several parts
+            are listed with their exact token counts in a manifest, which
+            'output_file' then names (see token_parts). Not supported with
+            resume
+        format_choice: Output format of a top-level array: "toon", "json",
+            "compact", or "auto" to encode the first format_sample_chunks
+            chunks in all three and keep the one with the fewest tokens.
+            With "auto", every format_recheck_every-th chunk is compared
+            again; drifts are reported in 'format_selection', and outputs
+            split into parts switch format at the next part. Other documents
+            are streamed as TOON ("json" or "compact" raise ValueError for
+            them rather than silently writing TOON)
+        format_sample_chunks: Chunks sampled by format_choice "auto"
+        format_recheck_every: Chunks between rechecks (0 disables them)
+        progress_file: Keep the progress counters (bytes read, items and
+            tokens written, rates, ETA; see StreamProgress) in this JSON
+            file, updated at most every progress_interval seconds, which
+            also paces the progress lines of verbose mode
+        progress_interval: Seconds between progress updates
         
     Returns:
-        Dictionary with streaming statistics
+        Dictionary with streaming statistics; 'start_memory_mb' and
+        'peak_memory_mb' are the RSS of this process when the run started
+        and at its highest during the run, 'memory_timeline' holds
+        (seconds, RSS MB) samples of this process, 'resumed_items' the
+        items converted by an earlier run and 'format' the output format
+        ('TOON', 'JSON' or 'TOON-COMPACT'; the estimated TOON tokens count
+        the output in that format)
     """
     from .toon_converter import TOONEncoder, TokenCounter
+    from .compression import compressed_name, input_stem, uncompressed_size
+    from .stream_progress import StreamProgress
     
-    tracemalloc.start()
     start_time = time.time()
     
     input_path = Path(input_file)
     if not input_path.exists():
         raise FileNotFoundError(f"Input file not found: {input_file}")
-    
-    # Determine output file
-    if output_dir:
-        output_path = Path(output_dir)
-        output_path.mkdir(parents=True, exist_ok=True)
-        output_file = output_path / f"{input_path.stem}-min.toon"
-    else:
-        output_file = input_path.parent / f"{input_path.stem}-min.toon"
+    if json_baseline not in BASELINE_MODES:
+        raise ValueError(f"Unknown JSON baseline: {json_baseline}")
+    if resume and compress is not None:
+        raise ValueError("Resuming is not supported for compressed outputs")
+    if resume and max_tokens_per_file is not None:
+        raise ValueError("Resuming is not supported for outputs split into parts")
+    plan = _FormatPlan(format_choice, format_sample_chunks, format_recheck_every)
     
     # Convert delimiter name to character
     delimiter_map = {
@@ -56,68 +130,292 @@ def process_stream(
     }
     delimiter_char = delimiter_map.get(delimiter, ',')
     
+    # Determine output file; its suffix depends on the format, which may
+    # only be known once the array has been sampled
+    if output_dir:
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+        output_base = output_path / input_stem(input_path)
+    else:
+        output_base = input_path.parent / input_stem(input_path)
+    output_compression = (compress, compress_level)
+    parts = None
+    if max_tokens_per_file is not None:
+        from .token_parts import TokenBudgetedParts
+        parts = TokenBudgetedParts(
+            output_base, max_tokens_per_file, delimiter_char, output_compression
+        )
+    output_file = compressed_name(_format_output_name(output_base, 'TOON'), compress)
+    
     encoder = TOONEncoder(delimiter=delimiter_char, indent=indent)
+    progress = StreamProgress(
+        input_path, uncompressed_size(input_path, input_path.stat().st_size),
+        verbose and not quiet, progress_file, progress_interval
+    )
     
     if not quiet:
         print(f"\n🔄 Streaming: {input_path.name}")
         if verbose:
             print(f"   Chunk size: {chunk_size}")
-            print(f"   Output: {output_file}")
+            if workers > 1:
+                print(f"   Workers: {workers}")
+            print(f"   Output: {output_base.parent}")
     
+    # Write to a sibling file and rename on success, so an interrupted run
+    # never leaves a partial output under the final name
+    partial_file = output_file.with_name(output_file.name + '.partial')
+    
+    checkpoint = None
+    resume_state = None
+    if resume:
+        from .stream_checkpoint import StreamCheckpoint
+        checkpoint = StreamCheckpoint(
+            partial_file.with_name(partial_file.name + '.checkpoint'), input_path,
+            {'delimiter': delimiter_char, 'indent': indent, 'json_baseline': json_baseline,
+             'format': format_choice}
+        )
+        resume_state = checkpoint.load()
+        # The partial output must still hold everything the checkpoint covers
+        if resume_state is not None and not (
+            partial_file.exists() and partial_file.stat().st_size >= resume_state['output_offset']
+        ):
+            resume_state = None
+    
+    if trace_memory:
+        tracemalloc.start()
+    sampler = _MemorySampler().start()
+    largest_array = None
+    output_format = 'TOON'
     try:
-        # Try to stream as array
-        items_processed, chunks_processed, estimated_json_tokens, estimated_toon_tokens = \
-            _stream_json_array(input_path, output_file, encoder, chunk_size, verbose, quiet)
+        from .batch_processor import _peek_first_byte
+        try:
+            if stream_path is None and _peek_first_byte(input_path) == b'[':
+                items_processed, chunks_processed, estimated_json_tokens, estimated_toon_tokens = \
+                    _stream_json_array(
+                        input_path, partial_file, encoder, chunk_size, verbose, quiet, workers,
+                        json_baseline, output_compression, checkpoint, resume_state,
+                        checkpoint_interval, parts, plan, progress
+                    )
+                # Parts that switched after a drift keep the sampled choice as the format
+                output_format = plan.chosen or plan.format
+                output_file = compressed_name(
+                    _format_output_name(output_base, output_format), compress
+                )
+            elif parts is not None:
+                raise ValueError("Only a top-level array can be split into parts")
+            elif plan.format != 'TOON':
+                raise ValueError(
+                    f"Only a top-level array can be streamed as {plan.format}; "
+                    f"other documents are streamed as TOON"
+                )
+            else:
+                # Objects (and scalars) go through the event-driven encoder
+                (items_processed, chunks_processed, estimated_json_tokens, estimated_toon_tokens,
+                 largest_array) = _stream_document(
+                    input_path, partial_file, encoder, verbose, quiet, stream_path,
+                    json_baseline, output_compression, progress
+                )
         
-    except Exception as e:
-        if verbose and not quiet:
-            print(f"   ⚠️  Cannot stream as array, processing as single object: {e}")
+        except ImportError as e:
+            if verbose and not quiet:
+                print(f"   ⚠️  {e}; processing in memory")
+            
+            # Fallback without ijson: load the document
+            items_processed, chunks_processed, estimated_json_tokens, estimated_toon_tokens = \
+                _process_large_object(
+                    input_path, partial_file, encoder, verbose, quiet, json_baseline,
+                    output_compression, parts, plan.format
+                )
+            if parts is None:
+                output_format = plan.format
+                output_file = compressed_name(
+                    _format_output_name(output_base, output_format), compress
+                )
         
-        # Fallback: process as single large object
-        items_processed, chunks_processed, estimated_json_tokens, estimated_toon_tokens = \
-            _process_large_object(input_path, output_file, encoder, verbose, quiet)
-    
-    # Get memory statistics
-    current, peak = tracemalloc.get_traced_memory()
-    tracemalloc.stop()
+        if parts is not None:
+            # Parts are written under their final names as they fill up
+            output_file = parts.output_file
+        else:
+            os.replace(partial_file, output_file)
+        if checkpoint is not None:
+            checkpoint.remove()
+        progress.update(items_processed, estimated_toon_tokens)
+        progress.finish('done')
+    except BaseException:
+        if parts is not None:
+            parts.abort()
+        progress.finish('failed')
+        raise
+    finally:
+        sampler.stop()
+        if trace_memory:
+            traced_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        # A checkpointed partial output is kept for the next run to resume
+        if partial_file.exists() and not (checkpoint is not None and checkpoint.path.exists()):
+            partial_file.unlink()
     
     processing_time = time.time() - start_time
+    input_mb = input_path.stat().st_size / 1024 / 1024
     
     # Calculate results
-    estimated_tokens_saved = estimated_json_tokens - estimated_toon_tokens
-    estimated_savings_percent = (
-        (estimated_tokens_saved / estimated_json_tokens * 100)
-        if estimated_json_tokens > 0 else 0.0
-    )
+    if json_baseline == 'off':
+        # Nothing was measured to save against
+        estimated_tokens_saved = estimated_savings_percent = None
+    else:
+        estimated_tokens_saved = estimated_json_tokens - estimated_toon_tokens
+        estimated_savings_percent = (
+            (estimated_tokens_saved / estimated_json_tokens * 100)
+            if estimated_json_tokens > 0 else 0.0
+        )
     
     result = {
         'input_file': str(input_path),
         'output_file': str(output_file),
         'chunks_processed': chunks_processed,
         'items_processed': items_processed,
+        'estimated_json_tokens': estimated_json_tokens,
+        'estimated_toon_tokens': estimated_toon_tokens,
         'estimated_tokens_saved': estimated_tokens_saved,
         'estimated_savings_percent': estimated_savings_percent,
+        'json_baseline': json_baseline,
         'processing_time': processing_time,
-        'peak_memory_mb': peak / 1024 / 1024
+        'items_per_second': items_processed / processing_time if processing_time > 0 else 0.0,
+        'input_mb_per_second': input_mb / processing_time if processing_time > 0 else 0.0,
+        'start_memory_mb': sampler.start_bytes / 1024 / 1024,
+        'peak_memory_mb': sampler.peak_bytes / 1024 / 1024,
+        'memory_timeline': sampler.timeline_mb(),
+        'resumed_items': resume_state['items'] if resume_state is not None else 0,
+        'format': output_format
     }
+    if trace_memory:
+        result['traced_peak_mb'] = traced_peak / 1024 / 1024
+    if largest_array is not None:
+        result['largest_array_path'], result['largest_array_items'] = largest_array
+    if parts is not None:
+        result['parts'] = parts.parts
+    if plan.chosen is not None:
+        result['format_selection'] = plan.summary()
     
     if not quiet:
         print(f"\n✅ Streaming complete!")
         print(f"   Processed: {items_processed:,} items in {chunks_processed} chunks")
+        if output_format != 'TOON' or plan.auto:
+            print(f"   Format: {output_format}")
+        if result['resumed_items']:
+            print(f"   Resumed after: {result['resumed_items']:,} items")
+        if parts is not None and len(parts.parts) > 1:
+            print(f"   Parts: {len(parts.parts)} (manifest: {output_file.name})")
+        print(f"   Throughput: {result['items_per_second']:,.0f} items/s, "
+              f"{result['input_mb_per_second']:.1f} MB/s")
         print(f"   Peak memory: {result['peak_memory_mb']:.1f} MB")
     
     return result
 
 
+# Samples kept in a memory timeline; when it fills up, every other sample is
+# dropped and the interval doubles, so long runs keep a bounded timeline
+_MAX_MEMORY_SAMPLES = 120
+
+
+class _MemorySampler:
+    """Samples this process's resident set size on a timer thread
+
+    A sample is one small read of /proc/self/statm, so unlike tracemalloc
+    the encoding loop itself pays nothing. The peak is the largest sample,
+    or the process peak from getrusage when that rose during the run (so it
+    also covers spikes between samples, but never an earlier run's peak).
+    """
+
+    def __init__(self, interval: float = 0.05):
+        from .batch_processor import _peak_rss_bytes
+        self.interval = interval
+        self.timeline: List[tuple] = []
+        self._start = time.time()
+        self._process_peak = _peak_rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> '_MemorySampler':
+        self._sample()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        self.timeline.append((time.time() - self._start, _current_rss_bytes()))
+        if len(self.timeline) >= _MAX_MEMORY_SAMPLES:
+            self.timeline = self.timeline[::2]
+            self.interval *= 2
+
+    @property
+    def start_bytes(self) -> int:
+        return self.timeline[0][1]
+
+    @property
+    def peak_bytes(self) -> int:
+        from .batch_processor import _peak_rss_bytes
+        peak = max(rss for _, rss in self.timeline)
+        process_peak = _peak_rss_bytes()
+        return max(peak, process_peak) if process_peak > self._process_peak else peak
+
+    def timeline_mb(self) -> List[tuple]:
+        return [(round(seconds, 3), round(rss / 1024 / 1024, 1)) for seconds, rss in self.timeline]
+
+
+def _current_rss_bytes() -> int:
+    """Current resident set size (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        from .batch_processor import _peak_rss_bytes
+        return _peak_rss_bytes()
+
+
 def _stream_json_array(
     input_path: Path,
     output_file: Path,
     encoder,
     chunk_size: int,
     verbose: bool,
-    quiet: bool
+    quiet: bool,
+    workers: int = 1,
+    json_baseline: str = "raw",
+    output_compression: tuple = (None, None),
+    checkpoint=None,
+    resume_state: Optional[Dict] = None,
+    checkpoint_interval: float = 30.0,
+    parts=None,
+    plan: Optional['_FormatPlan'] = None,
+    progress=None
 ) -> tuple:
-    """Stream process a JSON array file"""
+    """Stream process a JSON array file into one TOON array
+
+    A first pass over the parser events (no objects are built) counts the
+    items and finds the layout, so the single header can be written before
+    the rows, which are then streamed beneath it chunk by chunk. With
+    several workers, chunks are encoded in parallel (see _encode_chunks).
+    The JSON baseline is measured from the bytes the first pass reads.
+    The array is written in plan's format (JSON or compact TOON instead of
+    TOON if chosen), which samples the first chunks when set to "auto".
+
+    With a StreamCheckpoint, progress is saved about every
+    checkpoint_interval seconds. Given its resume_state, output_file is
+    truncated to the checkpoint and both files continue from there, without
+    repeating the first pass. With TokenBudgetedParts, the items are handed
+    to it instead of being written beneath one header. Both passes
+    report to a StreamProgress.
+    """
     try:
         import ijson
     except ImportError:
@@ -127,54 +425,699 @@ def _stream_json_array(
     
     from .toon_converter import TokenCounter
     
+    if plan is None:
+        plan = _FormatPlan()
+    if progress is None:
+        from .stream_progress import StreamProgress
+        progress = StreamProgress(input_path, 0)
+    
+    if resume_state is not None:
+        total_items, layout = resume_state['total_items'], _layout_from_json(resume_state['layout'])
+        plan.format = resume_state['format']
+        plan.prepare(layout, encoder.delimiter, encoder.indent, resume_state['schema'])
+        estimated_json_tokens = resume_state['json_tokens']
+        start = (resume_state['input_offset'], resume_state['items'])
+        items_processed = resume_state['items']
+        chunks_processed = resume_state['chunks']
+        estimated_toon_tokens = resume_state['toon_tokens']
+        separator_due = resume_state['separator_due']
+        progress.begin('encode', start[0], items_processed, estimated_toon_tokens, total_items)
+        # Drop whatever was written after the checkpoint
+        with open(output_file, 'r+b') as f_out:
+            f_out.truncate(resume_state['output_offset'])
+        f_out = open(output_file, 'a', encoding='utf-8')
+        if verbose and not quiet:
+            print(f"   Resuming at item {items_processed:,} of {total_items:,}")
+    else:
+        baseline = _JsonBaseline(json_baseline)
+        progress.begin('scan')
+        with open_input(input_path) as f_in:
+            total_items, layout = _scan_json_array(ijson.parse(progress.wrap(baseline.wrap(f_in))))
+        estimated_json_tokens = baseline.total()
+        _choose_array_format(plan, input_path, layout, total_items, encoder, chunk_size)
+        if verbose and not quiet and plan.auto:
+            print(f"   Format: {plan.format} (sampled {plan.sampled_items:,} items)")
+        progress.begin('encode', items_total=total_items)
+        if parts is not None:
+            items_processed, chunks_processed, estimated_toon_tokens = _stream_array_parts(
+                input_path, parts, plan, chunk_size, workers, progress
+            )
+            if items_processed != total_items:
+                raise ValueError(f"Counted {total_items} items but read {items_processed}")
+            return items_processed, chunks_processed, estimated_json_tokens, estimated_toon_tokens
+        start = (0, 0) if checkpoint is not None else None
+        items_processed = 0
+        chunks_processed = 0
+        separator_due = False
+        header = _format_header(plan.format, layout, total_items, encoder.delimiter, plan.schema)
+        estimated_toon_tokens = TokenCounter.count_tokens(header)
+        f_out = open_output(output_file, *output_compression)
+        f_out.write(header)
+    
+    separator = _format_separator(plan.format, layout, encoder.delimiter)
+    separator_tokens = TokenCounter.count_tokens(separator)
+    
+    with f_out:
+        for chunk_text, chunk_items, tokens, compared, resume_offset in _encode_chunks(
+            input_path, plan.next_options, chunk_size, workers, start, checkpoint_interval,
+            progress=progress
+        ):
+            if compared is not None:
+                plan.observe(items_processed, compared)
+            
+            # Write to output, with a separator between non-empty chunks
+            if chunk_text is not None:
+                if separator_due:
+                    f_out.write(separator)
+                    estimated_toon_tokens += separator_tokens
+                f_out.write(chunk_text)
+                estimated_toon_tokens += tokens
+                separator_due = True
+            f_out.flush()
+            
+            items_processed += chunk_items
+            if chunk_items:
+                chunks_processed += 1
+            
+            if resume_offset is not None:
+                os.fsync(f_out.fileno())
+                checkpoint.save({
+                    'total_items': total_items,
+                    'layout': layout,
+                    'format': plan.format,
+                    'schema': plan.schema,
+                    'json_tokens': estimated_json_tokens,
+                    'input_offset': resume_offset,
+                    'items': items_processed,
+                    'chunks': chunks_processed,
+                    'output_offset': f_out.tell(),
+                    'separator_due': separator_due,
+                    'toon_tokens': estimated_toon_tokens,
+                })
+            
+            progress.update(items_processed, estimated_toon_tokens)
+        
+        footer = _format_footer(plan.format)
+        f_out.write(footer)
+        estimated_toon_tokens += TokenCounter.count_tokens(footer)
+    
+    if items_processed != total_items:
+        raise ValueError(f"Counted {total_items} items but read {items_processed}")
+    
+    return items_processed, chunks_processed, estimated_json_tokens, estimated_toon_tokens
+
+
+def _choose_array_format(plan: '_FormatPlan', input_path: Path, layout: tuple, total_items: int,
+                         encoder, chunk_size: int):
+    """Prepare plan for an array, sampling its first chunks if needed
+
+    Compact TOON takes its schema from the first item, and "auto" encodes
+    the first sample_chunks chunks in every format. Either way only the
+    start of the array is parsed here; the conversion reads it again.
+    """
+    plan.prepare(layout, encoder.delimiter, encoder.indent)
+    if not plan.auto and plan.format != 'TOON-COMPACT':
+        return
+    
+    samples = []
+    sampled_items = 0
+    chunks = _read_chunks(input_path, chunk_size)
+    try:
+        for first_index, chunk, _ in chunks:
+            if first_index == 0:
+                plan.prepare(layout, encoder.delimiter, encoder.indent, _compact_schema(chunk[0]))
+            if not plan.auto:
+                break
+            samples.append(_encode_chunk(chunk, first_index, plan.sample_options())[3])
+            sampled_items += len(chunk)
+            if len(samples) >= plan.sample_chunks:
+                break
+    finally:
+        chunks.close()
+    if plan.auto:
+        plan.choose(samples, sampled_items, total_items)
+
+
+# Formats a streamed top-level array can be written in, in the order
+# process_json_file breaks ties in
+_ARRAY_FORMATS = ('JSON', 'TOON', 'TOON-COMPACT')
+
+_FORMAT_CHOICES = {'toon': 'TOON', 'json': 'JSON', 'compact': 'TOON-COMPACT'}
+
+# Output name suffixes after the input stem, as process_json_file names them
+_FORMAT_SUFFIXES = {'JSON': '-min.json', 'TOON': '-min.toon', 'TOON-COMPACT': '-min-compact.toon'}
+
+# Share of its tokens the current format must lose to another one at a
+# recheck before that counts as a drift
+_FORMAT_SWITCH_MARGIN = 0.05
+
+
+class _FormatPlan:
+    """Format streamed array chunks are encoded in, chosen from samples and rechecked
+
+    With format_choice "auto", choose() picks the format with the fewest
+    tokens over the sampled chunks (headers included). Every recheck_every-th
+    chunk is then encoded in all formats too; when another format would
+    save at least _FORMAT_SWITCH_MARGIN of the tokens, observe() records a
+    drift and, if can_switch (outputs split into parts), makes it the format
+    of chunks submitted from then on. Options for each chunk are taken from
+    next_options() as it is submitted, so chunks already in flight keep the
+    format they were submitted with.
+    """
+
+    def __init__(
+        self, format_choice: str = 'toon', sample_chunks: int = 3, recheck_every: int = 50
+    ):
+        if format_choice != 'auto' and format_choice not in _FORMAT_CHOICES:
+            raise ValueError(f"Unknown format: {format_choice}")
+        self.auto = format_choice == 'auto'
+        self.format = 'TOON' if self.auto else _FORMAT_CHOICES[format_choice]
+        self.sample_chunks = max(sample_chunks, 1)
+        self.recheck_every = recheck_every if self.auto else 0
+        self.can_switch = False
+        self.schema = ''
+        self.chosen: Optional[str] = None
+        self.sampled_items = 0
+        self.sample_tokens: Dict[str, int] = {}
+        self.rechecks = 0
+        self.drifts: List[Dict] = []
+        self._base = (('empty',), ',', 2)
+        self._submitted = 0
+
+    @property
+    def layout(self) -> tuple:
+        return self._base[0]
+
+    def prepare(self, layout: tuple, delimiter_char: str, indent: int, schema: str = ''):
+        self._base = (layout, delimiter_char, indent)
+        self.schema = schema
+
+    def sample_options(self) -> tuple:
+        return self._base + (self.format, self.schema, True)
+
+    def next_options(self) -> tuple:
+        """Options for the next chunk submitted for encoding"""
+        self._submitted += 1
+        compare = self.recheck_every > 0 and self._submitted % self.recheck_every == 0
+        return self._base + (self.format, self.schema, compare)
+
+    def choose(self, samples: List[Dict[str, int]], sampled_items: int, total_items: int):
+        """Pick the format with the fewest tokens over the sampled chunks"""
+        from .toon_converter import TokenCounter
+        
+        layout, delimiter_char, _ = self._base
+        self.sampled_items = sampled_items
+        for fmt in _ARRAY_FORMATS:
+            separator_tokens = TokenCounter.count_tokens(
+                _format_separator(fmt, layout, delimiter_char)
+            )
+            bodies = [sample[fmt] for sample in samples if sample[fmt]]
+            self.sample_tokens[fmt] = (
+                TokenCounter.count_tokens(
+                    _format_header(fmt, layout, total_items, delimiter_char, self.schema)
+                    + _format_footer(fmt)
+                )
+                + sum(bodies) + separator_tokens * max(len(bodies) - 1, 0)
+            )
+        self.format = self.chosen = min(_ARRAY_FORMATS, key=lambda fmt: self.sample_tokens[fmt])
+
+    def observe(self, first_item: int, tokens: Dict[str, int]):
+        """Compare the formats of a rechecked chunk starting at first_item"""
+        self.rechecks += 1
+        best = min(_ARRAY_FORMATS, key=lambda fmt: tokens[fmt])
+        current = tokens[self.format]
+        if best == self.format or not current:
+            return
+        margin = (current - tokens[best]) / current
+        if margin < _FORMAT_SWITCH_MARGIN:
+            return
+        self.drifts.append({
+            'item': first_item,
+            'from': self.format,
+            'to': best,
+            'margin_percent': round(margin * 100, 1),
+            'switched': self.can_switch
+        })
+        if self.can_switch:
+            self.format = best
+
+    def summary(self) -> Dict:
+        """Decision, sampled token counts and margins for the stream stats"""
+        chosen = self.sample_tokens[self.chosen]
+        return {
+            'format': self.chosen,
+            'sampled_items': self.sampled_items,
+            'sample_tokens': dict(self.sample_tokens),
+            # How many more tokens each format took over the sample than the chosen one
+            'margins_percent': {
+                fmt: round((tokens - chosen) / chosen * 100, 1) if chosen else 0.0
+                for fmt, tokens in self.sample_tokens.items()
+            },
+            'rechecks': self.rechecks,
+            'drifts': self.drifts
+        }
+
+
+def _format_output_name(output_base: Path, fmt: str) -> Path:
+    """Output path of a conversion in fmt ("dir/data" -> "dir/data-min.json")"""
+    return output_base.with_name(output_base.name + _FORMAT_SUFFIXES[fmt])
+
+
+def _compact_schema(first_item: Any) -> str:
+    """Item schema compact TOON puts after an array's count (from its first item)"""
+    if isinstance(first_item, (dict, list)):
+        from .toon_converter import CompactTOONEncoder
+        return CompactTOONEncoder()._build_schema(first_item)
+    return ''
+
+
+def _format_header(fmt: str, layout: tuple, count: int, delimiter_char: str, schema: str) -> str:
+    """Text before the items of an array in fmt"""
+    if fmt == 'JSON':
+        return '['
+    if fmt == 'TOON-COMPACT':
+        return f'[{count}]{schema}:' if count else '[]:'
+    return _array_header(layout, count, delimiter_char)
+
+
+def _format_separator(fmt: str, layout: tuple, delimiter_char: str) -> str:
+    """Text between two encoded items in fmt"""
+    if fmt == 'TOON':
+        return _item_separator(layout, delimiter_char)
+    return ','
+
+
+def _format_footer(fmt: str) -> str:
+    return ']' if fmt == 'JSON' else ''
+
+
+def _encode_pieces(
+    fmt: str, encoder, layout: tuple, chunk: List[Any], first_index: int
+) -> List[Optional[str]]:
+    """Encode each item of a chunk in fmt; None for items without text (compact, no values)"""
+    if fmt == 'JSON':
+        return [json.dumps(item, ensure_ascii=False, separators=(',', ':')) for item in chunk]
+    if fmt == 'TOON-COMPACT':
+        from .toon_converter import CompactTOONEncoder
+        compact = CompactTOONEncoder()
+        pieces = []
+        for item in chunk:
+            values = compact._flatten_values(item)
+            pieces.append(','.join(values) if values else None)
+        return pieces
+    pieces = []
+    for offset, item in enumerate(chunk):
+        piece = _encode_item(encoder, layout, item)
+        if piece is None:
+            raise ValueError(f"Item {first_index + offset} changed while streaming")
+        pieces.append(piece)
+    return pieces
+
+
+def _compare_formats(encoder, layout: tuple, chunk: List[Any], first_index: int) -> Dict[str, int]:
+    """Tokens of a chunk's items (with separators) in every format"""
+    from .toon_converter import TokenCounter
+    
+    tokens = {}
+    for fmt in _ARRAY_FORMATS:
+        pieces = [piece for piece in _encode_pieces(fmt, encoder, layout, chunk, first_index)
+                  if piece is not None]
+        separator = _format_separator(fmt, layout, encoder.delimiter)
+        tokens[fmt] = TokenCounter.count_tokens(separator.join(pieces)) if pieces else 0
+    return tokens
+
+
+def _stream_array_parts(
+    input_path: Path,
+    parts,
+    plan: '_FormatPlan',
+    chunk_size: int,
+    workers: int,
+    progress
+) -> tuple:
+    """Hand the items of a top-level array to TokenBudgetedParts; returns (items, chunks, tokens)
+
+    Parts are separate files, so a format drift found by a recheck can
+    switch the format from the next part on.
+    """
+    plan.can_switch = True
+    parts.begin(plan.layout, plan.format, plan.schema)
     items_processed = 0
     chunks_processed = 0
-    estimated_json_tokens = 0
-    estimated_toon_tokens = 0
+    tokens = 0
+    for pieces, chunk_items, piece_tokens, compared, fmt, _ in _encode_chunks(
+        input_path, plan.next_options, chunk_size, workers, encode=_encode_chunk_pieces,
+        progress=progress
+    ):
+        if compared is not None:
+            plan.observe(items_processed, compared)
+        parts.switch(fmt)
+        for piece, piece_count in zip(pieces, piece_tokens):
+            parts.add(piece, piece_count)
+        items_processed += chunk_items
+        chunks_processed += 1
+        tokens += sum(piece_tokens)
+        progress.update(items_processed, tokens)
+    return items_processed, chunks_processed, parts.close()
+
+
+def _layout_from_json(layout: list) -> tuple:
+    """Layout tuple from its JSON form in a checkpoint"""
+    if layout[0] == 'tabular':
+        return ('tabular', tuple(layout[1]))
+    return tuple(layout)
+
+
+def _encode_chunk(chunk: List[Any], first_index: int, options: tuple) -> tuple:
+    """Encode one chunk of array items; returns (text, items, tokens, tokens per format)
+
+    Items are joined by the format's separator; the writer puts one between
+    chunks. text is None if no item has any text. Options ask for a
+    comparison of all formats on rechecked chunks, else tokens per format
+    is None.
+    """
+    from .toon_converter import TOONEncoder, TokenCounter
     
-    with open(input_path, 'rb') as f_in, open(output_file, 'w', encoding='utf-8') as f_out:
-        # Write array header
-        parser = ijson.items(f_in, 'item')
-        
+    layout, delimiter_char, indent, fmt, _, compare = options
+    encoder = TOONEncoder(delimiter=delimiter_char, indent=indent)
+    
+    pieces = [piece for piece in _encode_pieces(fmt, encoder, layout, chunk, first_index)
+              if piece is not None]
+    compared = _compare_formats(encoder, layout, chunk, first_index) if compare else None
+    if not pieces:
+        return None, len(chunk), 0, compared
+    chunk_text = _format_separator(fmt, layout, delimiter_char).join(pieces)
+    return chunk_text, len(chunk), TokenCounter.count_tokens(chunk_text), compared
+
+
+def _encode_chunk_pieces(chunk: List[Any], first_index: int, options: tuple) -> tuple:
+    """Encode one chunk item by item
+
+    Returns (pieces, items, token count of each piece, tokens per format or
+    None, format); pieces are None for items without text.
+    """
+    from .toon_converter import TOONEncoder, TokenCounter
+    
+    layout, delimiter_char, indent, fmt, _, compare = options
+    encoder = TOONEncoder(delimiter=delimiter_char, indent=indent)
+    
+    pieces = _encode_pieces(fmt, encoder, layout, chunk, first_index)
+    piece_tokens = [
+        TokenCounter.count_tokens(piece) if piece is not None else 0 for piece in pieces
+    ]
+    compared = _compare_formats(encoder, layout, chunk, first_index) if compare else None
+    return pieces, len(chunk), piece_tokens, compared, fmt
+
+
+def _read_chunks(
+    input_path: Path,
+    chunk_size: int,
+    start: Optional[tuple] = None,
+    checkpoint_interval: float = 30.0,
+    progress=None
+) -> Iterator[tuple]:
+    """Yield (index of first item, items, resume offset) for chunks of a top-level array
+
+    Without start, the resume offset is always None. With start, an
+    (input offset, items before it) pair from a checkpoint (or (0, 0)),
+    reading begins there, and about every checkpoint_interval seconds a
+    chunk is ended early at a place the array can be resumed from, whose
+    byte offset it carries. The bytes read are counted by progress.
+    """
+    import ijson
+    
+    with open_input(input_path) as f_in:
+        if start is None:
+            reader = boundaries = f_in
+            first_index = 0
+        else:
+            offset, first_index = start
+            reader = boundaries = _BoundaryReader(f_in, offset, checkpoint_interval)
+        if progress is not None:
+            reader = progress.wrap(reader)
         chunk = []
-        for item in parser:
+        for item in ijson.items(reader, 'item', use_float=True):
+            if start is not None and boundaries.boundary is not None:
+                # Every item before this one precedes the boundary
+                yield first_index, chunk, boundaries.boundary
+                first_index += len(chunk)
+                chunk = []
+                boundaries.boundary = None
             chunk.append(item)
-            items_processed += 1
-            
             if len(chunk) >= chunk_size:
-                # Process chunk
-                chunk_json = json.dumps(chunk, ensure_ascii=False, separators=(',', ':'))
-                chunk_toon = encoder.encode(chunk)
-                
-                # Update token estimates
-                estimated_json_tokens += TokenCounter.count_tokens(chunk_json)
-                estimated_toon_tokens += TokenCounter.count_tokens(chunk_toon)
-                
-                # Write to output
-                f_out.write(chunk_toon)
-                f_out.write('\n')
-                f_out.flush()
-                
-                chunks_processed += 1
+                yield first_index, chunk, None
+                first_index += len(chunk)
                 chunk = []
-                
-                if verbose and not quiet and chunks_processed % 10 == 0:
-                    print(f"   Processed {items_processed:,} items ({chunks_processed} chunks)...")
-        
-        # Process remaining items
         if chunk:
-            chunk_json = json.dumps(chunk, ensure_ascii=False, separators=(',', ':'))
-            chunk_toon = encoder.encode(chunk)
-            
-            estimated_json_tokens += TokenCounter.count_tokens(chunk_json)
-            estimated_toon_tokens += TokenCounter.count_tokens(chunk_toon)
-            
-            f_out.write(chunk_toon)
-            f_out.flush()
-            
-            chunks_processed += 1
+            yield first_index, chunk, None
+
+
+class _BoundaryReader:
+    """Reader over a top-level JSON array that can stop the parser between items
+
+    The string and bracket state of the bytes handed out is tracked per
+    block with a few bytes operations (split on quotes, count brackets
+    outside strings). When a checkpoint is due, the next block is cut just
+    after the first top-level comma. The parser asks for more data only
+    once it has yielded every item it completed, so at that next read,
+    boundary is set to the offset after the comma: the items read so far
+    are exactly those before it. A reader starting at a non-zero offset
+    (just after such a comma) first hands out '[' to reopen the array.
+    """
+
+    def __init__(self, f, offset: int = 0, interval: float = 30.0):
+        self._f = f
+        self._offset = offset
+        if offset:
+            f.seek(offset)
+        self._prefix = b'[' if offset else b''
+        self._pending = b''
+        self._in_string = False
+        self._escape = False
+        self._depth = 0
+        self._interval = interval
+        self._due = time.monotonic() + interval
+        self._cut: Optional[int] = None
+        self.boundary: Optional[int] = None
+
+    def read(self, size: int = -1) -> bytes:
+        if size == 0:
+            return b''
+        if self._prefix:
+            data, self._prefix = self._prefix, b''
+            self._depth = 1
+            return data
+        if self._cut is not None:
+            self.boundary, self._cut = self._cut, None
+        
+        if self._pending:
+            data, self._pending = self._pending, b''
+        else:
+            data = self._f.read(size)
+        
+        if data and time.monotonic() >= self._due:
+            comma = self._find_top_level_comma(data)
+            if comma >= 0:
+                data, self._pending = data[:comma + 1], data[comma + 1:]
+                self._offset += len(data)
+                self._cut = self._offset
+                self._due = time.monotonic() + self._interval
+                return data
+        else:
+            self._track(data)
+        self._offset += len(data)
+        return data
+
+    def _track(self, data: bytes):
+        """Advance the string and bracket state over data"""
+        if self._escape and data:
+            data = data[1:]
+            self._escape = False
+        if b'\\' in data:
+            complete = data.rstrip(b'\\')
+            # Backslashes only occur in strings; an odd run at the end
+            # escapes the first byte of the next block
+            self._escape = (len(data) - len(complete)) % 2 == 1
+            data = complete.replace(b'\\\\', b'').replace(b'\\"', b'')
+        segments = data.split(b'"')
+        outside = b''.join(segments[1 if self._in_string else 0::2])
+        self._depth += (outside.count(b'[') + outside.count(b'{')
+                        - outside.count(b']') - outside.count(b'}'))
+        if len(segments) % 2 == 0:
+            self._in_string = not self._in_string
+
+    def _find_top_level_comma(self, data: bytes) -> int:
+        """Index of the first comma between items in data (-1 if none), tracking state up to it"""
+        in_string, escape, depth = self._in_string, self._escape, self._depth
+        for position in range(len(data)):
+            c = data[position]
+            if in_string:
+                if escape:
+                    escape = False
+                elif c == 0x5C:
+                    escape = True
+                elif c == 0x22:
+                    in_string = False
+            elif c == 0x22:
+                in_string = True
+            elif c == 0x5B or c == 0x7B:
+                depth += 1
+            elif c == 0x5D or c == 0x7D:
+                depth -= 1
+            elif c == 0x2C and depth == 1:
+                self._in_string, self._escape, self._depth = False, False, 1
+                return position
+        self._in_string, self._escape, self._depth = in_string, escape, depth
+        return -1
+
+
+_END_OF_CHUNKS = object()
+
+
+def _encode_chunks(
+    input_path: Path,
+    options,
+    chunk_size: int,
+    workers: int,
+    start: Optional[tuple] = None,
+    checkpoint_interval: float = 30.0,
+    encode=None,
+    progress=None
+) -> Iterator[tuple]:
+    """Yield encoded chunks in input order, each with its resume offset (see _read_chunks)
+
+    With several workers this is a pipeline: a reader thread parses chunks
+    onto a bounded queue, worker processes encode them and count tokens, and
+    results are yielded in submission order. At most 2 x workers chunks wait
+    in the queue and 2 x workers are in flight, which bounds memory.
+    Chunks are encoded with encode (default: _encode_chunk), with options
+    or, if it is callable, what it returns as each chunk is submitted.
+    progress counts the bytes read (on the reader thread, so slightly
+    ahead of the chunks yielded).
+    """
+    if encode is None:
+        encode = _encode_chunk
+    options_for = options if callable(options) else (lambda: options)
+    if workers <= 1:
+        for first_index, chunk, resume_offset in _read_chunks(
+            input_path, chunk_size, start, checkpoint_interval, progress
+        ):
+            yield encode(chunk, first_index, options_for()) + (resume_offset,)
+        return
     
-    return items_processed, chunks_processed, estimated_json_tokens, estimated_toon_tokens
+    import queue
+    import threading
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    
+    chunks = queue.Queue(maxsize=workers * 2)
+    stop = threading.Event()
+    
+    def read():
+        try:
+            for entry in _read_chunks(input_path, chunk_size, start, checkpoint_interval, progress):
+                while not stop.is_set():
+                    try:
+                        chunks.put(entry, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            entry = _END_OF_CHUNKS
+        except BaseException as e:
+            entry = e
+        chunks.put(entry)
+    
+    reader = threading.Thread(target=read, name="json2toon-reader", daemon=True)
+    reader.start()
+    in_flight = deque()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while True:
+                entry = chunks.get()
+                if entry is _END_OF_CHUNKS:
+                    break
+                if isinstance(entry, BaseException):
+                    raise entry
+                first_index, chunk, resume_offset = entry
+                in_flight.append(
+                    (executor.submit(encode, chunk, first_index, options_for()), resume_offset)
+                )
+                # Sequencer: the oldest chunk is written first
+                while len(in_flight) >= workers * 2:
+                    future, resume_offset = in_flight.popleft()
+                    yield future.result() + (resume_offset,)
+            while in_flight:
+                future, resume_offset = in_flight.popleft()
+                yield future.result() + (resume_offset,)
+    finally:
+        stop.set()
+        for future, _ in in_flight:
+            future.cancel()
+        # Unblock a reader waiting to hand over its final entry
+        while reader.is_alive():
+            try:
+                chunks.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def _scan_json_array(events) -> tuple:
+    """Count the items of a top-level array and find its TOON layout
+
+    Works on ijson.parse events in constant memory. Returns (count, layout)
+    where layout is ('empty',), ('primitive',), ('tabular', keys) with the
+    keys of the first item, or ('list',), matching TOONEncoder's choice.
+    """
+    depth = 0
+    count = 0
+    all_primitive = True
+    uniform = True
+    first_keys = None
+    keys = []
+    item_is_map = False
+    
+    for _, event, value in events:
+        if event in ('start_map', 'start_array'):
+            depth += 1
+            if depth == 1:
+                if event != 'start_array':
+                    raise ValueError("Top-level value is not an array")
+            elif depth == 2:
+                count += 1
+                all_primitive = False
+                item_is_map = event == 'start_map'
+                keys = []
+                if not item_is_map:
+                    uniform = False
+            elif depth == 3:
+                # Nested container inside an item
+                uniform = False
+        elif event in ('end_map', 'end_array'):
+            if depth == 2 and item_is_map and uniform:
+                if first_keys is None:
+                    first_keys = keys
+                elif len(keys) != len(first_keys) or set(keys) != set(first_keys):
+                    uniform = False
+            depth -= 1
+        elif event == 'map_key':
+            if depth == 2:
+                keys.append(value)
+        elif depth == 1:
+            # Primitive item
+            count += 1
+            uniform = False
+        elif depth == 0:
+            raise ValueError("Top-level value is not an array")
+    
+    if count == 0:
+        return 0, ('empty',)
+    if all_primitive:
+        return count, ('primitive',)
+    if uniform:
+        return count, ('tabular', tuple(first_keys))
+    return count, ('list',)
 
 
 def _process_large_object(
@@ -182,27 +1125,561 @@ def _process_large_object(
     output_file: Path,
     encoder,
     verbose: bool,
-    quiet: bool
+    quiet: bool,
+    json_baseline: str = "raw",
+    output_compression: tuple = (None, None),
+    parts=None,
+    output_format: str = 'TOON'
 ) -> tuple:
-    """Process a large JSON object (fallback when streaming fails)"""
-    from .toon_converter import TokenCounter
+    """Process a large JSON object in memory (fallback when ijson is missing)"""
+    from .toon_converter import CompactTOONEncoder, TokenCounter
     
     if verbose and not quiet:
         print("   Processing as single large object...")
     
-    with open(input_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    text = read_input_text(input_path)
+    data = json.loads(text)
+    baseline = _JsonBaseline(json_baseline)
+    # In blocks, so the baseline never holds another copy of the document
+    for start in range(0, len(text), _TokenTally.BLOCK_SIZE):
+        baseline.feed(text[start:start + _TokenTally.BLOCK_SIZE].encode('utf-8'))
+    del text
     
-    # Encode to TOON
-    toon_content = encoder.encode(data)
+    if parts is not None:
+        if not isinstance(data, list):
+            raise ValueError("Only a top-level array can be split into parts")
+        toon_tokens = parts.write_array(data, encoder)
+        return len(data), len(parts.parts), baseline.total(), toon_tokens
+    
+    # Encode to the requested format (TOON unless one was given)
+    if output_format == 'JSON':
+        toon_content = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    elif output_format == 'TOON-COMPACT':
+        toon_content = CompactTOONEncoder().encode(data)
+    else:
+        toon_content = encoder.encode(data)
     
     # Write output
-    with open(output_file, 'w', encoding='utf-8') as f:
+    with open_output(output_file, *output_compression) as f:
         f.write(toon_content)
     
     # Calculate tokens
-    json_minified = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
-    estimated_json_tokens = TokenCounter.count_tokens(json_minified)
     estimated_toon_tokens = TokenCounter.count_tokens(toon_content)
     
-    return 1, 1, estimated_json_tokens, estimated_toon_tokens
+    return 1, 1, baseline.total(), estimated_toon_tokens
+
+
+def _stream_document(
+    input_path: Path,
+    output_file: Path,
+    encoder,
+    verbose: bool,
+    quiet: bool,
+    stream_path: Optional[str] = None,
+    json_baseline: str = "raw",
+    output_compression: tuple = (None, None),
+    progress=None
+) -> tuple:
+    """Stream any JSON document with the event-driven encoder
+
+    The input is parsed twice (see EventTOONEncoder): once to measure large
+    arrays and the JSON baseline, once to write the TOON output. Both
+    passes report the bytes they read to progress.
+    """
+    try:
+        import ijson
+    except ImportError:
+        raise ImportError(
+            "ijson is required for streaming. Install with: pip install ijson"
+        )
+    
+    from .event_encoder import EventTOONEncoder
+    
+    event_encoder = EventTOONEncoder(
+        encoder, stream_paths=[stream_path] if stream_path is not None else None
+    )
+    baseline = _JsonBaseline(json_baseline)
+    toon_tokens = _TokenTally()
+    
+    if progress is None:
+        from .stream_progress import StreamProgress
+        progress = StreamProgress(input_path, 0)
+    
+    progress.begin('scan')
+    with open_input(input_path) as f_in:
+        large_arrays = event_encoder.scan(
+            ijson.basic_parse(progress.wrap(baseline.wrap(f_in)), use_float=True)
+        )
+    
+    if verbose and not quiet:
+        print(f"   Streaming {len(large_arrays)} large arrays item by item...")
+        if event_encoder.largest_array is not None:
+            path, count = event_encoder.largest_array
+            print(f"   Largest array: {path or '(top level)'} ({count:,} items)")
+    
+    progress.begin('encode')
+    with open_input(input_path) as f_in, open_output(output_file, *output_compression) as f_out:
+        def write(text: str):
+            f_out.write(text)
+            toon_tokens.add(text)
+        
+        event_encoder.encode(
+            ijson.basic_parse(progress.wrap(f_in), use_float=True), large_arrays, write
+        )
+    
+    toon_tokens.flush()
+    largest = event_encoder.largest_array
+    items = largest[1] if largest is not None else 1
+    return items, toon_tokens.chunks, baseline.total(), toon_tokens.total, largest
+
+
+class _TokenTally:
+    """Counts tokens of streamed text in blocks of bounded size"""
+    
+    BLOCK_SIZE = 64 * 1024
+    
+    def __init__(self):
+        self.total = 0
+        self.chunks = 0
+        self._pieces: List[str] = []
+        self._size = 0
+    
+    def add(self, text: str):
+        self._pieces.append(text)
+        self._size += len(text)
+        if self._size >= self.BLOCK_SIZE:
+            self.flush()
+    
+    def flush(self):
+        from .toon_converter import TokenCounter
+        if self._pieces:
+            self.total += TokenCounter.count_tokens(''.join(self._pieces))
+            self.chunks += 1
+            self._pieces = []
+            self._size = 0
+
+
+BASELINE_MODES = ('raw', 'sample', 'off')
+
+# In "sample" mode, one block of _TokenTally.BLOCK_SIZE characters in this
+# many is tokenized
+_BASELINE_SAMPLE_EVERY = 16
+
+# Placeholders for escapes while splitting on quotes; control characters
+# can't occur unescaped in valid JSON
+_ESCAPED_BACKSLASH = '\x01'
+_ESCAPED_QUOTE = '\x02'
+
+
+class _JsonBaseline:
+    """Estimates JSON tokens of a document from the raw bytes the parser reads
+
+    Serializing parsed items again just to count their tokens doubles the
+    work of the streaming loop. Instead the input bytes are minified with a
+    few string operations per block as they are read and tokenized in
+    blocks; in "sample" mode only some blocks are tokenized and the count is
+    scaled by length.
+    """
+
+    def __init__(self, mode: str = 'raw'):
+        self.mode = mode
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._carry = ''
+        self._in_string = False
+        self._pieces: List[str] = []
+        self._size = 0
+        self._blocks = 0
+        self._chars = 0
+        self._counted_chars = 0
+        self._tokens = 0
+
+    def wrap(self, f):
+        """File object passing everything read from f through feed"""
+        return f if self.mode == 'off' else _TeeReader(f, self.feed)
+
+    def feed(self, data: bytes):
+        if self.mode == 'off':
+            return
+        text = self._carry + self._decoder.decode(data)
+        # A trailing backslash escapes a character of the next block
+        complete = text.rstrip('\\')
+        self._carry = text[len(complete):]
+        
+        escaped = '\\' in complete
+        if escaped:
+            complete = complete.replace('\\\\', _ESCAPED_BACKSLASH).replace('\\"', _ESCAPED_QUOTE)
+        # Split on quotes: string contents and the text between strings
+        # alternate, and whitespace is dropped from the latter in one go
+        segments = complete.split('"')
+        first_outside = 1 if self._in_string else 0
+        if len(segments) > first_outside:
+            outside = '\x00'.join(segments[first_outside::2])
+            for whitespace in ' \n\r\t':
+                if whitespace in outside:
+                    outside = outside.replace(whitespace, '')
+            segments[first_outside::2] = outside.split('\x00')
+        if len(segments) % 2 == 0:
+            self._in_string = not self._in_string
+        minified = '"'.join(segments)
+        if escaped:
+            minified = minified.replace(_ESCAPED_QUOTE, '\\"').replace(_ESCAPED_BACKSLASH, '\\\\')
+        
+        self._chars += len(minified)
+        self._pieces.append(minified)
+        self._size += len(minified)
+        if self._size >= _TokenTally.BLOCK_SIZE:
+            self._flush()
+
+    def _flush(self):
+        from .toon_converter import TokenCounter
+        if not self._pieces:
+            return
+        block = ''.join(self._pieces)
+        self._pieces = []
+        self._size = 0
+        if self.mode == 'raw' or self._blocks % _BASELINE_SAMPLE_EVERY == 0:
+            self._tokens += TokenCounter.count_tokens(block)
+            self._counted_chars += len(block)
+        self._blocks += 1
+
+    def total(self) -> int:
+        """Estimated JSON tokens of everything fed (0 in "off" mode)"""
+        if self._carry:
+            # Backslashes ending the input; the parser has already failed on them
+            self._pieces.append(self._carry)
+            self._chars += len(self._carry)
+            self._carry = ''
+        self._flush()
+        if not self._counted_chars:
+            return 0
+        return round(self._tokens * self._chars / self._counted_chars)
+
+
+class _TeeReader:
+    """Binary file wrapper handing every block read to a callback"""
+
+    def __init__(self, f, callback):
+        self._f = f
+        self._callback = callback
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._f.read(size)
+        if data:
+            self._callback(data)
+        return data
+
+
+# NDJSON files are split into at least this many bytes per range, and into
+# several ranges per worker so that uneven ranges still balance out
+_MIN_RANGE_BYTES = 4 * 1024 * 1024
+_RANGES_PER_WORKER = 4
+
+
+def process_ndjson(
+    input_file: str,
+    output_dir: Optional[str] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 1000,
+    delimiter: str = "comma",
+    indent: int = 2,
+    quiet: bool = False,
+    verbose: bool = False
+) -> Dict:
+    """
+    Convert a JSON Lines (NDJSON) file to one TOON array, in parallel
+
+    The file is split into byte ranges aligned to line starts. Each worker
+    parses and encodes its ranges into fragment files, assuming its records
+    form a table (uniform objects with primitive values); a range that does
+    not is re-encoded as a list. The fragments are then concatenated under a
+    single header carrying the total row count, so the output is identical to
+    encoding all records as one array. Ranges encoded with a layout that
+    turns out not to be the global one are re-encoded in a second round.
+    
+    Args:
+        input_file: Input NDJSON file path (one JSON value per line)
+        output_dir: Output directory
+        workers: Worker processes (default: number of CPUs)
+        chunk_size: Records per token-estimation chunk
+        delimiter: Delimiter for arrays (comma/tab/pipe)
+        indent: Indentation spaces
+        quiet: Suppress output
+        verbose: Show detailed progress
+        
+    Returns:
+        Dictionary with the same statistics as process_stream; with worker
+        processes, 'peak_memory_mb' is the highest RSS of this process or
+        any one worker
+    """
+    start_time = time.time()
+    
+    input_path = Path(input_file)
+    if not input_path.exists():
+        raise FileNotFoundError(f"Input file not found: {input_file}")
+    if detect_compression(input_path) is not None:
+        raise ValueError(
+            f"Cannot split compressed NDJSON into byte ranges: {input_file}; "
+            "decompress it first"
+        )
+    
+    output_path = Path(output_dir) if output_dir else input_path.parent
+    output_path.mkdir(parents=True, exist_ok=True)
+    output_file = output_path / f"{input_path.stem}-min.toon"
+    
+    delimiter_map = {
+        'comma': ',',
+        'tab': '\t',
+        'pipe': '|'
+    }
+    delimiter_char = delimiter_map.get(delimiter, ',')
+    workers = max(1, workers or os.cpu_count() or 1)
+    
+    size = input_path.stat().st_size
+    range_count = max(1, min(workers * _RANGES_PER_WORKER, size // _MIN_RANGE_BYTES))
+    bounds = [size * i // range_count for i in range(range_count + 1)]
+    fragments = [
+        output_path / f".{output_file.name}.{os.getpid()}.{i}.part"
+        for i in range(range_count)
+    ]
+    
+    if not quiet:
+        print(f"\n🔄 Streaming NDJSON: {input_path.name}")
+        if verbose:
+            print(f"   Ranges: {range_count} across {min(workers, range_count)} workers")
+            print(f"   Output: {output_file}")
+    
+    partial_file = output_file.with_name(output_file.name + '.partial')
+    
+    sampler = _MemorySampler().start()
+    try:
+        tasks = [
+            (str(input_path), bounds[i], bounds[i + 1], str(fragments[i]), None,
+             delimiter_char, indent, chunk_size)
+            for i in range(range_count)
+        ]
+        results = _run_range_tasks(tasks, workers)
+        
+        layout = _global_layout([r['layout'] for r in results])
+        redo = [i for i, r in enumerate(results) if r['items'] and r['layout'] != layout]
+        if redo:
+            if verbose and not quiet:
+                print(f"   Re-encoding {len(redo)} ranges as {layout[0]}")
+            redo_tasks = [tasks[i][:4] + (layout,) + tasks[i][5:] for i in redo]
+            for i, result in zip(redo, _run_range_tasks(redo_tasks, workers)):
+                results[i] = result
+        
+        items_processed = sum(r['items'] for r in results)
+        header = _array_header(layout, items_processed, delimiter_char)
+        
+        # Every fragment element ends with a separator; the last one is
+        # dropped so the output matches TOONEncoder.encode exactly
+        separator = _item_separator(layout, delimiter_char)
+        with open(partial_file, 'wb') as f_out:
+            f_out.write(header.encode('utf-8'))
+            for fragment in fragments:
+                with open(fragment, 'rb') as f_in:
+                    shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+            if items_processed:
+                f_out.truncate(f_out.tell() - len(separator.encode('utf-8')))
+        
+        os.replace(partial_file, output_file)
+    finally:
+        sampler.stop()
+        for path in [partial_file] + fragments:
+            if path.exists():
+                path.unlink()
+    
+    from .toon_converter import TokenCounter
+    estimated_json_tokens = sum(r['json_tokens'] for r in results)
+    estimated_toon_tokens = (
+        sum(r['toon_tokens'] for r in results) + TokenCounter.count_tokens(header)
+    )
+    estimated_tokens_saved = estimated_json_tokens - estimated_toon_tokens
+    estimated_savings_percent = (
+        (estimated_tokens_saved / estimated_json_tokens * 100)
+        if estimated_json_tokens > 0 else 0.0
+    )
+    
+    result = {
+        'input_file': str(input_path),
+        'output_file': str(output_file),
+        'chunks_processed': range_count,
+        'items_processed': items_processed,
+        'estimated_json_tokens': estimated_json_tokens,
+        'estimated_toon_tokens': estimated_toon_tokens,
+        'estimated_tokens_saved': estimated_tokens_saved,
+        'estimated_savings_percent': estimated_savings_percent,
+        'processing_time': time.time() - start_time,
+        'start_memory_mb': sampler.start_bytes / 1024 / 1024,
+        'peak_memory_mb': max(
+            [sampler.peak_bytes] + [r.get('peak_memory', 0) for r in results]
+        ) / 1024 / 1024,
+        'layout': layout[0],
+        'ranges_reencoded': len(redo)
+    }
+    
+    if not quiet:
+        print("\n✅ Streaming complete!")
+        print(f"   Processed: {items_processed:,} records in {range_count} ranges")
+    
+    return result
+
+
+def _run_range_tasks(tasks: List[tuple], workers: int) -> List[Dict]:
+    """Encode ranges in worker processes (in order of the task list)"""
+    if workers > 1 and len(tasks) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            return list(executor.map(_encode_ndjson_range_in_worker, *zip(*tasks)))
+    return [_encode_ndjson_range(*task) for task in tasks]
+
+
+def _encode_ndjson_range_in_worker(*task) -> Dict:
+    """_encode_ndjson_range in a pool worker, with the worker's peak RSS"""
+    from .batch_processor import _peak_rss_bytes
+    stats = _encode_ndjson_range(*task)
+    stats['peak_memory'] = _peak_rss_bytes()
+    return stats
+
+
+def _encode_ndjson_range(
+    input_file: str,
+    start: int,
+    end: int,
+    fragment_file: str,
+    layout: Optional[tuple],
+    delimiter_char: str,
+    indent: int,
+    chunk_size: int
+) -> Dict:
+    """Encode the records whose line starts in [start, end) into a fragment file
+
+    With layout None the range guesses its layout from its first record:
+    ('primitive',), ('tabular', keys) or ('list',). A guess contradicted by a
+    later record restarts the range as a list.
+    """
+    from .toon_converter import TOONEncoder, TokenCounter
+    
+    encoder = TOONEncoder(delimiter=delimiter_char, indent=indent)
+    forced = layout is not None
+    
+    while True:
+        stats = {'layout': layout, 'items': 0, 'json_tokens': 0, 'toon_tokens': 0}
+        json_chunk: List[str] = []
+        toon_chunk: List[str] = []
+        
+        def flush():
+            stats['json_tokens'] += TokenCounter.count_tokens(
+                '[' + ','.join(json_chunk) + ']'
+            )
+            stats['toon_tokens'] += TokenCounter.count_tokens(''.join(toon_chunk))
+            f_out.write(''.join(toon_chunk))
+            json_chunk.clear()
+            toon_chunk.clear()
+        
+        with open(input_file, 'rb') as f_in, \
+                open(fragment_file, 'w', encoding='utf-8') as f_out:
+            for offset, record in _iter_range_records(f_in, start, end):
+                if stats['layout'] is None:
+                    stats['layout'] = _record_layout(record)
+                piece = _encode_item(encoder, stats['layout'], record)
+                if piece is None:
+                    if forced:
+                        raise ValueError(
+                            f"Record at byte {offset} does not fit the {layout[0]} layout"
+                        )
+                    break
+                json_chunk.append(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+                toon_chunk.append(piece + _item_separator(stats['layout'], delimiter_char))
+                stats['items'] += 1
+                if len(json_chunk) >= chunk_size:
+                    flush()
+            else:
+                if json_chunk:
+                    flush()
+                if stats['layout'] is None:
+                    stats['layout'] = ('empty',)
+                return stats
+        
+        # The guessed layout did not hold for the whole range
+        layout = ('list',)
+
+
+def _iter_range_records(f_in, start: int, end: int) -> Iterator[tuple]:
+    """Yield (offset, record) for non-blank lines starting in [start, end)"""
+    if start > 0:
+        # Skip the line that started in the previous range
+        f_in.seek(start - 1)
+        f_in.readline()
+    position = f_in.tell()
+    while position < end:
+        line = f_in.readline()
+        if not line:
+            break
+        if line.strip():
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"Invalid JSON line at byte {position}: {e}") from e
+            yield position, record
+        position += len(line)
+
+
+def _record_layout(record: Any) -> tuple:
+    """Layout the range would have if every record looked like this one"""
+    if isinstance(record, dict):
+        if all(not isinstance(v, (dict, list)) for v in record.values()):
+            return ('tabular', tuple(record.keys()))
+        return ('list',)
+    if isinstance(record, list):
+        return ('list',)
+    return ('primitive',)
+
+
+def _encode_item(encoder, layout: tuple, record: Any) -> Optional[str]:
+    """Encode one array item for the layout, or None if it breaks the layout"""
+    kind = layout[0]
+    if kind == 'tabular':
+        keys = layout[1]
+        if (not isinstance(record, dict) or len(record) != len(keys)
+                or any(k not in record for k in keys)
+                or any(isinstance(v, (dict, list)) for v in record.values())):
+            return None
+        return encoder.encode_table_row(record, keys)
+    if kind == 'primitive':
+        if isinstance(record, (dict, list)):
+            return None
+        return encoder._encode_primitive(record)
+    return encoder.encode_list_item(record)
+
+
+def _item_separator(layout: tuple, delimiter_char: str) -> str:
+    """Text between two encoded items: primitive arrays are inline"""
+    return delimiter_char if layout[0] == 'primitive' else '\n'
+
+
+def _global_layout(layouts: List[tuple]) -> tuple:
+    """Layout of the whole array given the layout of each range"""
+    found = [layout for layout in layouts if layout[0] != 'empty']
+    if not found:
+        return ('empty',)
+    if all(layout[0] == 'primitive' for layout in found):
+        return found[0]
+    if all(layout[0] == 'tabular' for layout in found):
+        key_set = set(found[0][1])
+        if all(set(layout[1]) == key_set for layout in found):
+            return found[0]
+    return ('list',)
+
+
+def _array_header(layout: tuple, count: int, delimiter_char: str) -> str:
+    """Array header matching TOONEncoder for the given layout and row count"""
+    if layout[0] == 'empty' or count == 0:
+        return '[0]:'
+    if layout[0] == 'tabular':
+        delimiter_in_header = delimiter_char if delimiter_char != ',' else ''
+        return f'[{count}{delimiter_in_header}]{{{delimiter_char.join(layout[1])}}}\n'
+    if layout[0] == 'primitive':
+        return f'[{count}]: '
+    return f'[{count}]:\n'
+
@@ -0,0 +1,149 @@
+"""Progress, throughput and ETA of a streaming conversion"""
+
+import datetime
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+# Share of the elapsed time rendering (printing and writing the status
+# file) may take; the next render is pushed back until it holds
+_MAX_RENDER_OVERHEAD = 0.002
+
+
+class StreamProgress:
+    """Progress of a streaming conversion, judged by the input read position
+
+    Files returned by wrap() count the bytes the parser reads (decompressed,
+    for compressed inputs, against their uncompressed_size); the loop
+    consuming encoded chunks reports items and tokens with update(). A
+    conversion reads its input once per pass (the layout scan, then the
+    encoding), so begin() starts a pass and rates and ETA are those of the
+    current pass.
+
+    Every interval seconds at most, a line is printed (if verbose) and the
+    counters are written to status_file as JSON for dashboards. A render
+    that took long moves the next one back, so rendering never costs more
+    than _MAX_RENDER_OVERHEAD of the run.
+    """
+
+    def __init__(
+        self,
+        input_path: Path,
+        bytes_total: int,
+        verbose: bool = False,
+        status_file: Optional[str] = None,
+        interval: float = 1.0
+    ):
+        self.input_path = input_path
+        self.bytes_total = bytes_total
+        self.verbose = verbose
+        self.status_file = Path(status_file) if status_file is not None else None
+        self.interval = interval
+        self.phase = 'scan'
+        self.bytes_read = 0
+        self.items = 0
+        self.items_total: Optional[int] = None
+        self.tokens = 0
+        self._start = time.time()
+        self._phase_start = (time.monotonic(), 0, 0, 0)
+        self._due = time.monotonic() + interval
+        self._lock = threading.Lock()
+
+    def wrap(self, f):
+        """File object counting everything read from f"""
+        from .stream_processor import _TeeReader
+        return _TeeReader(f, self.feed)
+
+    def begin(self, phase: str, bytes_read: int = 0, items: int = 0, tokens: int = 0,
+              items_total: Optional[int] = None):
+        """Start a pass over the input (resumed passes start at a checkpoint's counters)"""
+        self.phase = phase
+        self.bytes_read, self.items, self.tokens = bytes_read, items, tokens
+        if items_total is not None:
+            self.items_total = items_total
+        self._phase_start = (time.monotonic(), bytes_read, items, tokens)
+
+    def feed(self, data: bytes):
+        self.bytes_read += len(data)
+        self.tick()
+
+    def update(self, items: int, tokens: int):
+        """Items and tokens written so far"""
+        self.items, self.tokens = items, tokens
+        self.tick()
+
+    def tick(self):
+        """Render if it is due"""
+        if time.monotonic() < self._due or not (self.verbose or self.status_file):
+            return
+        with self._lock:
+            started = time.monotonic()
+            if started < self._due:
+                return
+            status = self.status()
+            if self.verbose:
+                print(_status_line(status))
+            if self.status_file is not None:
+                self._write(status)
+            cost = time.monotonic() - started
+            self._due = time.monotonic() + max(self.interval, cost / _MAX_RENDER_OVERHEAD)
+
+    def finish(self, state: str = 'done'):
+        """Write the final status ("done" or "failed")"""
+        if self.status_file is not None:
+            with self._lock:
+                self._write(self.status(state))
+
+    def status(self, state: str = 'running') -> Dict:
+        """Counters, rates of the current pass and its ETA"""
+        started, start_bytes, start_items, start_tokens = self._phase_start
+        seconds = time.monotonic() - started
+        bytes_rate = (self.bytes_read - start_bytes) / seconds if seconds > 0 else 0.0
+        remaining = max(self.bytes_total - self.bytes_read, 0)
+        if state == 'done':
+            eta = 0.0
+        elif bytes_rate > 0:
+            eta = remaining / bytes_rate
+        else:
+            eta = None
+        return {
+            'input': str(self.input_path),
+            'state': state,
+            'phase': self.phase,
+            'bytes_read': self.bytes_read,
+            'bytes_total': self.bytes_total,
+            'percent': 100.0 if state == 'done' or not self.bytes_total
+            else round(min(self.bytes_read / self.bytes_total * 100, 100.0), 2),
+            'items': self.items,
+            'items_total': self.items_total,
+            'tokens': self.tokens,
+            'elapsed_seconds': round(time.time() - self._start, 3),
+            'bytes_per_second': round(bytes_rate, 1),
+            'items_per_second': (
+                round((self.items - start_items) / seconds, 1) if seconds > 0 else 0.0
+            ),
+            'tokens_per_second': (
+                round((self.tokens - start_tokens) / seconds, 1) if seconds > 0 else 0.0
+            ),
+            'eta_seconds': round(eta, 1) if eta is not None else None,
+            'updated_at': time.time(),
+        }
+
+    def _write(self, status: Dict):
+        from .toon_converter import _write_text_atomic
+        _write_text_atomic(self.status_file, json.dumps(status) + '\n')
+
+
+def _status_line(status: Dict) -> str:
+    eta = status['eta_seconds']
+    line = (
+        f"   {'Scanning' if status['phase'] == 'scan' else 'Encoding'} "
+        f"{status['percent']:.1f}%: {status['bytes_per_second'] / 1024 / 1024:.1f} MB/s"
+    )
+    if status['phase'] != 'scan':
+        line += (f", {status['items_per_second']:,.0f} items/s, "
+                 f"{status['tokens_per_second']:,.0f} tokens/s")
+    eta_text = str(datetime.timedelta(seconds=round(eta))) if eta is not None else '?'
+    return f"{line}, ETA {eta_text}"
@@ -0,0 +1,199 @@
+"""TOON outputs split into parts that each fit a token budget"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .compression import compressed_name
+
+
+class TokenBudgetedParts:
+    """Writes the items of a top-level array as parts of at most max_tokens tokens
+
+    Items are added one encoded piece at a time with their token count, and
+    a part is closed when the next item would take its running count past
+    the budget. Every part is a complete array with its own header (for
+    TOON tables, the field list is repeated), so each one can be used on
+    its own. When a part is closed its exact token count is measured on the
+    final text; should that still exceed the budget (tokens can merge
+    across item boundaries), trailing items move on to the next part.
+
+    Parts are TOON unless begin() or switch() set another format of
+    stream_processor (JSON or compact TOON); switch() closes the pending
+    part first, so every part has a single format.
+
+    An output that fits in one part is written under its usual name
+    (output_base plus the format's suffix, e.g. "data-min.toon").
+    Otherwise parts are named like "data-min.part0001.toon" and a manifest
+    ("data-min.parts.json") lists each part with its format, first item,
+    item count and exact token count; output_file then names the manifest.
+    """
+
+    def __init__(
+        self,
+        output_base: Path,
+        max_tokens: int,
+        delimiter: str,
+        compression: Tuple[Optional[str], Optional[int]] = (None, None)
+    ):
+        if max_tokens < 1:
+            raise ValueError(f"max_tokens must be positive, got {max_tokens}")
+        self.max_tokens = max_tokens
+        self.delimiter = delimiter
+        self.compression = compression
+        self.manifest_file = output_base.with_name(f"{output_base.name}-min.parts.json")
+        self._base = output_base
+        self.parts: List[Dict] = []
+        self.format = 'TOON'
+        self._schema = ''
+        self._layout: tuple = ('empty',)
+        self._pending: List[Tuple[Optional[str], int]] = []
+        self._running = 0
+        self._first_item = 0
+        self._written: List[Path] = []
+        self.begin(('empty',))
+
+    @property
+    def output_file(self) -> Path:
+        """The manifest once there are several parts, else the single output"""
+        if len(self.parts) > 1:
+            return self.manifest_file
+        return self._part_path(None)
+
+    def begin(self, layout: tuple, fmt: str = 'TOON', schema: str = ''):
+        """Set the layout (and format) of the array whose items follow
+
+        schema is the compact TOON item schema (see stream_processor._compact_schema).
+        """
+        from .stream_processor import _format_footer, _format_header, _format_separator
+        from .toon_converter import TokenCounter
+
+        self._layout = layout
+        self._schema = schema
+        self.format = fmt
+        self._separator = _format_separator(fmt, layout, self.delimiter)
+        self._separator_tokens = TokenCounter.count_tokens(self._separator)
+        # A part never holds more items than tokens, so this header is the longest
+        self._header_tokens = TokenCounter.count_tokens(
+            _format_header(fmt, layout, self.max_tokens, self.delimiter, schema)
+            + _format_footer(fmt)
+        )
+        self._running = self._header_tokens
+
+    def switch(self, fmt: str):
+        """Write the following items in fmt, closing the pending part if it changes"""
+        if fmt == self.format:
+            return
+        while self._pending:
+            self._close_part(final=False)
+        self.begin(self._layout, fmt, self._schema)
+
+    def add(self, piece: Optional[str], tokens: int):
+        """Append one encoded item (without separator; None if it has no text) of ~tokens tokens"""
+        cost = tokens + (self._separator_tokens if self._pending and piece is not None else 0)
+        if self._pending and self._running + cost > self.max_tokens:
+            self._close_part(final=False)
+            cost = tokens + (self._separator_tokens if self._pending and piece is not None else 0)
+        self._pending.append((piece, tokens))
+        self._running += cost
+
+    def close(self) -> int:
+        """Write the remaining items (and the manifest if there are several parts)
+
+        Returns:
+            Exact token count of all parts
+        """
+        self._close_part(final=True)
+        while self._pending:
+            self._close_part(final=True)
+        total = sum(part['tokens'] for part in self.parts)
+        if len(self.parts) > 1:
+            from .toon_converter import _write_text_atomic
+            _write_text_atomic(self.manifest_file, json.dumps({
+                'max_tokens': self.max_tokens,
+                'total_tokens': total,
+                'items': sum(part['items'] for part in self.parts),
+                'parts': self.parts
+            }, ensure_ascii=False, indent=2) + '\n')
+        return total
+
+    def write_array(self, items: list, encoder) -> int:
+        """Write the parts of an array held in memory; returns their exact token count"""
+        from .stream_processor import _encode_item, _global_layout, _record_layout
+        from .toon_converter import TokenCounter
+
+        layout = _global_layout([_record_layout(item) for item in items])
+        self.begin(layout)
+        for item in items:
+            piece = _encode_item(encoder, layout, item)
+            self.add(piece, TokenCounter.count_tokens(piece))
+        return self.close()
+
+    def abort(self):
+        """Delete the parts written so far"""
+        for path in self._written:
+            if path.exists():
+                path.unlink()
+
+    def _close_part(self, final: bool):
+        """Write the pending items as the next part, carrying over what does not fit"""
+        from .stream_processor import _format_footer, _format_header
+        from .toon_converter import TokenCounter, _write_text_atomic
+
+        pieces = self._pending
+        carried = []
+        while True:
+            text = (
+                _format_header(self.format, self._layout, len(pieces), self.delimiter, self._schema)
+                + self._separator.join(piece for piece, _ in pieces if piece is not None)
+                + _format_footer(self.format)
+            )
+            tokens = TokenCounter.count_tokens(text)
+            if tokens <= self.max_tokens or len(pieces) <= 1:
+                break
+            carried.insert(0, pieces.pop())
+        if tokens > self.max_tokens:
+            raise ValueError(
+                f"Item {self._first_item} alone takes {tokens} tokens, "
+                f"more than the limit of {self.max_tokens} per file"
+            )
+
+        if final and not carried and not self.parts:
+            path = self._part_path(None)
+        else:
+            path = self._part_path(len(self.parts) + 1)
+        _write_text_atomic(path, text, *self.compression)
+        self._written.append(path)
+        self.parts.append({
+            'file': path.name,
+            'format': self.format,
+            'first_item': self._first_item,
+            'items': len(pieces),
+            'tokens': tokens
+        })
+
+        self._first_item += len(pieces)
+        self._pending = carried
+        self._running = self._header_tokens + sum(t for _, t in carried) + \
+            self._separator_tokens * max(len(carried) - 1, 0)
+
+    def _part_path(self, number: Optional[int]) -> Path:
+        """Path of part number in the current format, or of the single output (None)"""
+        from .stream_processor import _format_output_name
+
+        path = _format_output_name(self._base, self.format)
+        if number is not None:
+            path = path.with_name(f"{path.stem}.part{number:04d}{path.suffix}")
+        return compressed_name(path, self.compression[0])
+
+
+def remove_parts(output: Path):
+    """Delete a parts manifest and the parts it lists"""
+    with open(output, 'r', encoding='utf-8') as f:
+        parts = json.load(f).get('parts', [])
+    for part in parts:
+        path = output.with_name(part['file'])
+        if path.exists():
+            path.unlink()
+    os.remove(output)
@@ -7,10 +7,16 @@ Token estimation rule: ~1 token per 4 characters
 """
 
 import json
+import os
 import re
+import itertools
 import math
+import shutil
+import tempfile
 from pathlib import Path
-from typing import Any, Dict, List, Union, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Sequence, TextIO, Union, Tuple
+
+from .compression import compressed_name, input_stem, open_output, read_input_text
 
 
 class TokenCounter:
@@ -367,29 +373,125 @@ class TOONEncoder:
         indent_str = ' ' * (depth * self.indent)
         
         for obj in arr:
-            values = [self._encode_primitive(obj[key]) for key in keys]
-            line = indent_str + self.delimiter.join(values)
-            lines.append(line)
+            lines.append(indent_str + self.encode_table_row(obj, keys))
         
         return '\n'.join(lines)
     
+    def encode_table_row(self, obj: Dict, keys: List[str]) -> str:
+        """Encodes one row of a tabular array (without indentation)"""
+        return self.delimiter.join(self._encode_primitive(obj[key]) for key in keys)
+    
+    def encode_table(
+        self,
+        rows: Iterable,
+        fields: Optional[Sequence[str]] = None,
+        *,
+        out: TextIO,
+        length: Optional[int] = None,
+        key: Optional[str] = None
+    ) -> int:
+        """Writes a tabular array from any iterable of rows, one row at a time
+        
+        Rows are mappings (dicts, sqlite3.Row, ...) or, given fields,
+        sequences such as database cursor tuples. Without fields, the keys
+        of the first row are used and every row must have exactly those
+        keys. Values are encoded like any other primitive (types JSON does
+        not have become null), and nested values are rejected.
+        
+        The header holds the row count, so without a length hint the rows
+        are spooled to a temporary file and copied to out once they are
+        all counted; with length, they are written straight to out and a
+        wrong hint raises ValueError after the rows. Either way memory does
+        not grow with the number of rows. The output is what encode() gives
+        for the same rows as a list, or for {key: rows} with key.
+        
+        Returns:
+            Number of rows written
+        """
+        delimiter_in_header = self.delimiter if self.delimiter != ',' else ''
+        prefix = self._format_key(key) if key is not None else ''
+        # A table under a key has its rows indented as _encode_list_field does
+        indent_str = ' ' * (2 * self.indent) if key is not None else ''
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            if length:
+                raise ValueError(f"Expected {length} rows, got 0")
+            out.write(f'{prefix}[0]:')
+            return 0
+        
+        by_name = hasattr(first, 'keys')
+        # Inferred fields must match every row exactly; given ones only
+        # have to be present (other columns are left out)
+        exact = fields is None
+        if exact:
+            if not by_name:
+                raise ValueError("fields are required for rows that are not mappings")
+            fields = first.keys()
+        fields = list(fields)
+        field_set = set(fields)
+        
+        def header(count: int) -> str:
+            return f'{prefix}[{count}{delimiter_in_header}]{{{self.delimiter.join(fields)}}}'
+        
+        def row_text(row, index: int) -> str:
+            if by_name:
+                row_keys = set(row.keys())
+                if not field_set <= row_keys or (exact and len(row_keys) != len(field_set)):
+                    raise ValueError(f"Row {index} does not have the fields {fields}")
+                values = [row[name] for name in fields]
+            else:
+                values = list(row)
+                if len(values) != len(fields):
+                    raise ValueError(
+                        f"Row {index} has {len(values)} values for {len(fields)} fields"
+                    )
+            if any(isinstance(value, (dict, list)) for value in values):
+                raise ValueError(f"Row {index} has a nested value; tables hold primitives only")
+            return '\n' + indent_str + self.delimiter.join(
+                self._encode_primitive(v) for v in values
+            )
+        
+        if length is not None:
+            out.write(header(length))
+            count = 0
+            for index, row in enumerate(itertools.chain([first], rows)):
+                out.write(row_text(row, index))
+                count += 1
+            if count != length:
+                raise ValueError(f"Expected {length} rows, got {count}")
+            return count
+        
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as spool:
+            count = 0
+            for index, row in enumerate(itertools.chain([first], rows)):
+                spool.write(row_text(row, index))
+                count += 1
+            out.write(header(count))
+            spool.seek(0)
+            shutil.copyfileobj(spool, out)
+        return count
+    
     def _encode_list_array(self, arr: List, depth: int = 0) -> str:
         """Encodes mixed/non-uniform array in list format"""
         lines = [f'[{len(arr)}]:']
-        indent_str = ' ' * ((depth + 1) * self.indent)
         
         for item in arr:
-            if isinstance(item, dict):
-                lines.append(self._encode_list_item_dict(item, indent_str, depth))
-            elif isinstance(item, list):
-                arr_str = self._encode_array(item, depth + 2)
-                lines.append(f'{indent_str}- {arr_str}')
-            else:
-                val_str = self._encode_primitive(item)
-                lines.append(f'{indent_str}- {val_str}')
+            lines.append(self.encode_list_item(item, depth))
         
         return '\n'.join(lines)
     
+    def encode_list_item(self, item: Any, depth: int = 0) -> str:
+        """Encodes one '- ' item of a list array at the given array depth"""
+        indent_str = ' ' * ((depth + 1) * self.indent)
+        if isinstance(item, dict):
+            return self._encode_list_item_dict(item, indent_str, depth)
+        if isinstance(item, list):
+            arr_str = self._encode_array(item, depth + 2)
+            return f'{indent_str}- {arr_str}'
+        val_str = self._encode_primitive(item)
+        return f'{indent_str}- {val_str}'
+    
     def _encode_list_item_dict(self, obj: Dict, indent_str: str, depth: int) -> str:
         """Encodes an object within a list item"""
         if not obj:
@@ -406,13 +508,36 @@ class TOONEncoder:
         return '\n'.join(result)
 
 
+def _write_text_atomic(
+    path: Path,
+    content: str,
+    compression: Optional[str] = None,
+    compression_level: Optional[int] = None
+):
+    """Writes a file via a temporary sibling and rename, so a crash never leaves partial output"""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open_output(tmp_path, compression, compression_level) as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+
+
 def process_json_file(
     input_file: str,
     output_dir: str = None,
     delimiter: str = ',',
     indent: int = 2,
     format_choice: str = 'auto',
-    force_format: bool = False
+    force_format: bool = False,
+    write_output: bool = True,
+    json_content: Optional[str] = None,
+    compress: Optional[str] = None,
+    compress_level: Optional[int] = None,
+    max_tokens_per_file: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     Processes a JSON file:
@@ -429,24 +554,35 @@ def process_json_file(
         indent: Number of spaces for indentation
         format_choice: Output format ('auto', 'toon', 'json', 'compact')
         force_format: Force specified format even if not optimal
+        write_output: Save the chosen format to output_dir; when False the
+            content is only returned (as 'output_content')
+        json_content: Document text that was already read (e.g. from an
+            archive member); input_file then only names the output
+        compress: Compress the written output ('gzip', 'zstd' or 'xz');
+            compressed inputs are detected and decompressed automatically
+        compress_level: Compression level (default: per format)
+        max_tokens_per_file: If the chosen output has more tokens, a
+            top-level array is written as TOON parts of at most this many
+            tokens listed in a manifest (see token_parts), which
+            'output_file' then names; other documents raise ValueError
     
     Returns:
         Dictionary with processing results and statistics
     """
     input_path = Path(input_file)
     
-    if not input_path.exists():
+    if json_content is None and not input_path.exists():
         raise FileNotFoundError(f"File not found: {input_file}")
     
     if output_dir is None:
         output_dir = str(input_path.parent)
-    else:
+    elif write_output:
         Path(output_dir).mkdir(parents=True, exist_ok=True)
     
     # Read JSON
     print(f"\n📖 Reading file: {input_file}")
-    with open(input_path, 'r', encoding='utf-8') as f:
-        json_content = f.read()
+    if json_content is None:
+        json_content = read_input_text(input_path)
     
     json_data = json.loads(json_content)
     
@@ -517,6 +653,29 @@ def process_json_file(
             chosen_format_name, chosen_tokens, chosen_content, _ = formats[idx]
             print(f"\n✓ Selected format: {chosen_format_name}")
     
+    stem = input_stem(input_path)
+    
+    parts = None
+    if max_tokens_per_file is not None and chosen_tokens > max_tokens_per_file:
+        if not isinstance(json_data, list):
+            raise ValueError(
+                f"Output of {chosen_tokens} tokens exceeds the limit of {max_tokens_per_file} "
+                f"per file, and only a top-level array can be split into parts"
+            )
+        if force_format and format_choice in ('json', 'compact'):
+            raise ValueError(f"Only TOON output can be split into parts, not {chosen_format_name}")
+        if not write_output:
+            raise ValueError("Outputs split into parts must be written to files")
+        from .token_parts import TokenBudgetedParts
+        parts = TokenBudgetedParts(
+            Path(output_dir) / stem, max_tokens_per_file, delimiter,
+            (compress, compress_level)
+        )
+        chosen_tokens = parts.write_array(json_data, encoder)
+        chosen_format_name = 'TOON'
+        chosen_content = None
+        print(f"\n✂️  Split into {len(parts.parts)} parts of at most {max_tokens_per_file} tokens")
+    
     # Calculate savings vs JSON
     savings = json_analysis['tokens'] - chosen_tokens
     savings_pct = (savings / json_analysis['tokens'] * 100) if json_analysis['tokens'] > 0 else 0
@@ -524,25 +683,30 @@ def process_json_file(
     print(f"   Savings vs JSON: {savings} tokens ({savings_pct:.1f}%)")
     
     # Save the most economical format
-    stem = input_path.stem
-    
-    if chosen_format_name == 'JSON':
+    if parts is not None:
+        # Already written, under compressed names where requested
+        output_file = parts.output_file
+        saved_as = (
+            f"{len(parts.parts)} TOON parts listed in" if len(parts.parts) > 1 else "TOON format"
+        )
+    elif chosen_format_name == 'JSON':
         output_file = Path(output_dir) / f"{stem}-min.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(chosen_content)
-        print(f"\n✅ Saved in minified JSON format: {output_file}")
+        saved_as = "minified JSON format"
     elif chosen_format_name == 'TOON-COMPACT':
         output_file = Path(output_dir) / f"{stem}-min-compact.toon"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(chosen_content)
-        print(f"\n✅ Saved in compact TOON format: {output_file}")
+        saved_as = "compact TOON format"
     else:  # TOON
         output_file = Path(output_dir) / f"{stem}-min.toon"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(chosen_content)
-        print(f"\n✅ Saved in TOON format: {output_file}")
+        saved_as = "TOON format"
+    if parts is None:
+        output_file = compressed_name(output_file, compress)
+
+    if write_output:
+        if parts is None:
+            _write_text_atomic(output_file, chosen_content, compress, compress_level)
+        print(f"\n✅ Saved in {saved_as}: {output_file}")
     
-    return {
+    result = {
         'input_file': str(input_path),
         'output_file': str(output_file),
         'json_tokens': json_analysis['tokens'],
@@ -554,8 +718,12 @@ def process_json_file(
         'chosen_tokens': chosen_tokens,
         'json_content': json_content,
         'toon_content': toon_content,
-        'toon_compact': toon_compact
+        'toon_compact': toon_compact,
+        'output_content': chosen_content
     }
+    if parts is not None:
+        result['parts'] = parts.parts
+    return result
 
 
 if __name__ == '__main__':
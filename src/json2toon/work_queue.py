@@ -0,0 +1,266 @@
+"""Coordinator-free work queue on a shared directory for distributed batches"""
+
+import json
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .archive_inputs import resolve_inputs
+
+
+def path_key(path) -> str:
+    """Key of an input path in units ("./data/x.json" and "data/x.json" share one)"""
+    if isinstance(path, (str, os.PathLike)):
+        return os.fspath(Path(path))
+    return str(path)
+
+
+class LeaseQueue:
+    """Work units shared by several nodes through atomic renames
+
+    Layout of the queue directory:
+
+        pending/<unit>.json            unclaimed unit (JSON list of input paths)
+        leased/<unit>.<expiry>.<node>  unit claimed by node until expiry (epoch ms)
+        done/<unit>.json               completed unit
+        .populating / .ready           population lock and completion marker
+
+    A node claims a unit by renaming it from pending/ to leased/; rename is
+    atomic, so exactly one node wins. Leases are renewed by renaming to a
+    later expiry from a heartbeat thread. A lease whose expiry has passed
+    belongs to a dead node and is renamed back to pending/ by whichever node
+    notices first. Lease times should be much longer than clock skew between
+    nodes. A unit that is reclaimed while its owner is merely slow may be
+    converted twice; outputs are written atomically, so this is harmless.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        lease_seconds: float = 300.0,
+        node_id: Optional[str] = None,
+        poll_interval: float = 1.0
+    ):
+        self.directory = Path(directory)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        node = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.node_id = node.replace(os.sep, '_')
+
+        self.pending_dir = self.directory / 'pending'
+        self.leased_dir = self.directory / 'leased'
+        self.done_dir = self.directory / 'done'
+        for path in (self.pending_dir, self.leased_dir, self.done_dir):
+            path.mkdir(parents=True, exist_ok=True)
+
+        # Units claimed by this node: unit -> current lease file name
+        self._leases: Dict[str, str] = {}
+        # Input path -> unit, and files still outstanding per unit
+        self._path_units: Dict[str, str] = {}
+        self._remaining: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.units_completed = 0
+
+    # Population
+
+    def populate(self, paths: Iterable[Path], unit_size: int = 100) -> bool:
+        """Split paths into units unless another node already did
+
+        A path given more than once is queued once.
+
+        Returns True if this node populated the queue. If a previous
+        populator died (its lock is older than the lease time and the queue
+        was never marked ready), population is taken over; units that
+        already exist in any state are kept as they are.
+        """
+        lock = self.directory / '.populating'
+        ready = self.directory / '.ready'
+        if ready.exists():
+            return False
+
+        try:
+            fd = os.open(str(lock), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.close(fd)
+        except FileExistsError:
+            try:
+                stale = time.time() - lock.stat().st_mtime > self.lease_seconds
+            except FileNotFoundError:
+                stale = False
+            if not stale or ready.exists():
+                return False
+            os.utime(lock)
+
+        existing = self._existing_units()
+        unit_index = 0
+        batch: List[str] = []
+
+        def flush():
+            nonlocal unit_index, batch
+            unit = f"u{unit_index:08d}"
+            unit_index += 1
+            if unit not in existing:
+                tmp_path = self.directory / f".{unit}.{self.node_id}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(batch, f)
+                os.replace(tmp_path, self.pending_dir / f"{unit}.json")
+            batch = []
+            # Keep the lock fresh so other nodes don't take over
+            os.utime(lock)
+
+        seen = set()
+        for path in paths:
+            key = path_key(path)
+            if key in seen:
+                continue
+            seen.add(key)
+            batch.append(key)
+            if len(batch) >= unit_size:
+                flush()
+        if batch:
+            flush()
+
+        ready.touch()
+        return True
+
+    def _existing_units(self) -> set:
+        units = set()
+        for directory in (self.pending_dir, self.leased_dir, self.done_dir):
+            for name in os.listdir(directory):
+                units.add(name.split('.', 1)[0])
+        return units
+
+    # Claiming
+
+    def claim_paths(self) -> Iterator:
+        """Claim units one at a time and yield their inputs, until none are pending
+
+        Inputs are Paths, or ArchiveMembers for members of an archive.
+        Never waits: when pending/ is empty the iterator ends, even if other
+        nodes still hold leases (see wait_for_work).
+        """
+        self._start_heartbeat()
+        while True:
+            unit = self._claim()
+            if unit is None:
+                return
+            unit_name, paths = unit
+            if not paths:
+                self._complete(unit_name)
+                continue
+            # Units written by older versions hold paths as given, repeats included
+            keys = list(dict.fromkeys(path_key(path) for path in paths))
+            with self._lock:
+                self._remaining[unit_name] = len(keys)
+                for key in keys:
+                    self._path_units[key] = unit_name
+            # Archive members are looked up again from their reported path
+            yield from resolve_inputs(keys)
+
+    def _claim(self):
+        for name in sorted(os.listdir(self.pending_dir)):
+            if not name.endswith('.json'):
+                continue
+            unit_name = name[:-len('.json')]
+            lease_name = self._lease_name(unit_name)
+            try:
+                os.rename(self.pending_dir / name, self.leased_dir / lease_name)
+            except FileNotFoundError:
+                # Another node claimed it first
+                continue
+            with self._lock:
+                self._leases[unit_name] = lease_name
+            with open(self.leased_dir / lease_name, 'r', encoding='utf-8') as f:
+                return unit_name, json.load(f)
+        return None
+
+    def _lease_name(self, unit_name: str) -> str:
+        expiry = int((time.time() + self.lease_seconds) * 1000)
+        return f"{unit_name}.{expiry}.{self.node_id}"
+
+    def file_done(self, path) -> None:
+        """Mark one input path as finished; completes its unit when it is the last"""
+        with self._lock:
+            unit_name = self._path_units.pop(path_key(path), None)
+            if unit_name is None:
+                return
+            self._remaining[unit_name] -= 1
+            if self._remaining[unit_name] > 0:
+                return
+            del self._remaining[unit_name]
+        self._complete(unit_name)
+
+    def _complete(self, unit_name: str):
+        with self._lock:
+            lease_name = self._leases.pop(unit_name, None)
+            if lease_name is None:
+                return
+            try:
+                os.rename(self.leased_dir / lease_name, self.done_dir / f"{unit_name}.json")
+                self.units_completed += 1
+            except FileNotFoundError:
+                # Lease was reclaimed while we worked; the new owner redoes it
+                pass
+
+    # Leases
+
+    def _start_heartbeat(self):
+        if self._heartbeat is not None:
+            return
+        self._heartbeat = threading.Thread(target=self._renew_loop, daemon=True)
+        self._heartbeat.start()
+
+    def _renew_loop(self):
+        while not self._stop.wait(self.lease_seconds / 3):
+            self.renew_leases()
+
+    def renew_leases(self):
+        """Push back the expiry of every lease held by this node"""
+        with self._lock:
+            for unit_name, lease_name in list(self._leases.items()):
+                new_name = self._lease_name(unit_name)
+                try:
+                    os.rename(self.leased_dir / lease_name, self.leased_dir / new_name)
+                    self._leases[unit_name] = new_name
+                except FileNotFoundError:
+                    # Lost the lease to a reclaim
+                    del self._leases[unit_name]
+
+    def reclaim_expired(self) -> int:
+        """Return expired leases of dead nodes to pending/; returns how many"""
+        now_ms = time.time() * 1000
+        reclaimed = 0
+        for name in os.listdir(self.leased_dir):
+            parts = name.split('.', 2)
+            if len(parts) != 3 or not parts[1].isdigit() or int(parts[1]) > now_ms:
+                continue
+            try:
+                os.rename(self.leased_dir / name, self.pending_dir / f"{parts[0]}.json")
+                reclaimed += 1
+            except FileNotFoundError:
+                continue
+        return reclaimed
+
+    def wait_for_work(self) -> bool:
+        """Block until units are pending again (True) or the queue is finished (False)
+
+        Only call this when this node holds no leases. While other nodes hold
+        leases, keep polling so that units of nodes that die are reclaimed.
+        """
+        while True:
+            self.reclaim_expired()
+            if any(name.endswith('.json') for name in os.listdir(self.pending_dir)):
+                return True
+            if (self.directory / '.ready').exists() and not os.listdir(self.leased_dir):
+                return False
+            time.sleep(self.poll_interval)
+
+    def close(self):
+        self._stop.set()
+        if self._heartbeat is not None:
+            self._heartbeat.join()
+            self._heartbeat = None
@@ -5,10 +5,27 @@ Tests CLI, batch processing, and streaming functionality
 
 import pytest
 import json
+import os
+import subprocess
+import sys
 import tempfile
 import shutil
 from pathlib import Path
-from json2toon import TOONEncoder, TokenCounter, process_json_file, process_batch
+from json2toon import TOONEncoder, TokenCounter, process_json_file, process_batch, iter_batch
+
+
+def _run_console_script(*args):
+    """Run the json2toon console script entry point in a subprocess"""
+    import json2toon
+
+    env = dict(os.environ)
+    package_root = str(Path(json2toon.__file__).resolve().parent.parent)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_root, env.get('PYTHONPATH')]))
+    return subprocess.run(
+        [sys.executable, "-c", "import sys; from json2toon.cli import main; sys.exit(main())",
+         *args],
+        capture_output=True, text=True, encoding='utf-8', env=env
+    )
 
 
 class TestTOONEncoder:
@@ -60,6 +77,54 @@ class TestTOONEncoder:
         result = encoder.encode(data)
         assert "    id: 1" in result
 
+    def test_encode_table_from_iterables(self):
+        """Test that tables written from iterables match encode of the list"""
+        import io
+        import sqlite3
+
+        rows = [
+            {"id": i, "name": f"user {i}", "score": i / 2, "active": i % 2 == 0}
+            for i in range(500)
+        ]
+        for encoder in (TOONEncoder(), TOONEncoder(delimiter='\t', indent=4)):
+            out = io.StringIO()
+            assert encoder.encode_table(iter(rows), out=out) == 500
+            assert out.getvalue() == encoder.encode(rows)
+
+            out = io.StringIO()
+            encoder.encode_table((row for row in rows), out=out, length=500, key="users")
+            assert out.getvalue() == encoder.encode({"users": rows})
+
+        out = io.StringIO()
+        TOONEncoder().encode_table(iter([]), out=out, key="users")
+        assert out.getvalue() == TOONEncoder().encode({"users": []})
+
+        # Database cursors: tuples with the column names as fields
+        db = sqlite3.connect(":memory:")
+        db.execute("CREATE TABLE users (id INTEGER, name TEXT, score REAL, active INTEGER)")
+        db.executemany("INSERT INTO users VALUES (?, ?, ?, ?)",
+                       [(r["id"], r["name"], r["score"], r["active"]) for r in rows])
+        cursor = db.execute("SELECT id, name, score FROM users ORDER BY id")
+        out = io.StringIO()
+        TOONEncoder().encode_table(cursor, [c[0] for c in cursor.description], out=out)
+        expected = [{"id": r["id"], "name": r["name"], "score": r["score"]} for r in rows]
+        assert out.getvalue() == TOONEncoder().encode(expected)
+
+        # Given fields select columns of mappings
+        out = io.StringIO()
+        TOONEncoder().encode_table(iter(rows), ["name", "id"], out=out)
+        expected = TOONEncoder().encode([{"name": r["name"], "id": r["id"]} for r in rows])
+        assert out.getvalue() == expected
+
+        with pytest.raises(ValueError, match="Row 1"):
+            TOONEncoder().encode_table(iter([{"a": 1}, {"b": 2}]), out=io.StringIO())
+        with pytest.raises(ValueError, match="nested"):
+            TOONEncoder().encode_table(iter([{"a": [1]}]), out=io.StringIO())
+        with pytest.raises(ValueError, match="fields are required"):
+            TOONEncoder().encode_table(iter([(1, 2)]), out=io.StringIO())
+        with pytest.raises(ValueError, match="Expected 3 rows, got 2"):
+            TOONEncoder().encode_table(iter(rows[:2]), out=io.StringIO(), length=3)
+
 
 class TestTokenCounter:
     """Test token counting functionality"""
@@ -232,6 +297,467 @@ class TestBatchProcessing:
         assert result['successful'] >= 1
         assert result['failed'] >= 1
 
+    def test_batch_memory_budget_streams_oversized(self, multiple_json_files, temp_dir):
+        """Test that files which can never fit the budget are streamed"""
+        pytest.importorskip("ijson")
+        output_dir = temp_dir / "output"
+
+        result = process_batch(
+            multiple_json_files,
+            output_dir=str(output_dir),
+            quiet=True,
+            max_memory=16
+        )
+
+        assert result['successful'] == 5
+        assert result['streamed_count'] == 5
+        assert all(f['route'] == 'stream' for f in result['files'])
+
+    def test_batch_memory_budget_parallel(self, multiple_json_files, temp_dir, monkeypatch):
+        """Test parallel processing under a budget that fits one file at a time"""
+        from json2toon.batch_processor import _MemoryBudget
+
+        output_dir = temp_dir / "output"
+        largest = max(p.stat().st_size for p in multiple_json_files)
+        reservations = []
+        in_flight = []
+        reserve = _MemoryBudget.reserve
+
+        def recording_reserve(budget, estimate):
+            reserve(budget, estimate)
+            reservations.append(estimate)
+            in_flight.append(budget.reserved)
+
+        monkeypatch.setattr(_MemoryBudget, 'reserve', recording_reserve)
+
+        result = process_batch(
+            multiple_json_files,
+            output_dir=str(output_dir),
+            parallel_workers=2,
+            quiet=True,
+            max_memory=largest * 10
+        )
+
+        assert result['successful'] == 5
+        assert result['streamed_count'] == 0
+        assert result['memory_budget'] == largest * 10
+        assert all(f['route'] == 'memory' for f in result['files'])
+        # Each file was admitted only once the previous one released its
+        # reservation, so nothing else was reserved when it was
+        assert len(reservations) == 5
+        assert all(reservations)
+        assert in_flight == reservations
+        assert max(in_flight) <= largest * 10
+
+    def test_batch_unreadable_routed_file_fails_alone(self, multiple_json_files, temp_dir):
+        """Test that a file that cannot be peeked at is reported, not fatal"""
+        corrupt = temp_dir / "corrupt.json.gz"
+        corrupt.write_bytes(b'\x1f\x8bnot really gzip' + b'\x00' * 16)
+
+        for workers in (1, 2):
+            result = process_batch(
+                multiple_json_files + [corrupt],
+                output_dir=str(temp_dir / f"output{workers}"),
+                parallel_workers=workers,
+                quiet=True,
+                stream_threshold=0
+            )
+
+            assert result['successful'] == 5
+            assert result['failed'] == 1
+            assert result['errors'][0]['file'] == str(corrupt)
+
+    def test_batch_routes_large_arrays_to_stream(self, multiple_json_files, temp_dir):
+        """Test that only top-level arrays over the threshold are streamed"""
+        pytest.importorskip("ijson")
+        array_file = temp_dir / "array.json"
+        array_file.write_text('\n  ' + json.dumps([{"id": i} for i in range(10)]))
+
+        result = process_batch(
+            multiple_json_files + [array_file],
+            output_dir=str(temp_dir / "output"),
+            quiet=True,
+            stream_threshold=0
+        )
+
+        routes = {Path(f['input']).name: f['route'] for f in result['files']}
+        assert routes['array.json'] == 'stream'
+        assert routes['file_0.json'] == 'memory'
+        assert result['streamed_count'] == 1
+        assert result['stream_reasons'] == {'large array': 1}
+
+    def test_batch_routed_files_keep_format(self, multiple_json_files, temp_dir):
+        """Test that routing is opt-in and routed files honor the requested format"""
+        pytest.importorskip("ijson")
+        array_file = temp_dir / "array.json"
+        array_file.write_text(json.dumps([{"id": i} for i in range(10)]))
+
+        result = process_batch([array_file], output_dir=str(temp_dir / "default"), quiet=True)
+        assert result['files'][0]['route'] == 'memory'
+
+        result = process_batch(
+            [array_file],
+            output_dir=str(temp_dir / "output"),
+            quiet=True,
+            format_choice='json',
+            force_format=True,
+            stream_threshold=0
+        )
+        record = result['files'][0]
+        assert record['route'] == 'stream'
+        assert record['format'] == 'JSON'
+        assert json.loads(Path(record['output']).read_text()) == json.loads(array_file.read_text())
+
+        # A routed object cannot be streamed as JSON: reported, not written as TOON
+        result = process_batch(
+            multiple_json_files[:1],
+            output_dir=str(temp_dir / "budget"),
+            quiet=True,
+            format_choice='json',
+            force_format=True,
+            max_memory=16
+        )
+        assert result['failed'] == 1
+        assert 'streamed as JSON' in result['errors'][0]['error']
+        assert not list((temp_dir / "budget").glob("*.toon"))
+
+    def test_iter_batch_yields_records(self, multiple_json_files, temp_dir):
+        """Test the generator API with lazy input and running aggregates"""
+        summary = {}
+        invalid_file = temp_dir / "invalid.json"
+        invalid_file.write_text("not valid json {")
+        inputs = (p for p in multiple_json_files + [invalid_file])
+
+        records = list(iter_batch(inputs, output_dir=str(temp_dir / "output"), summary=summary))
+
+        assert len(records) == 6
+        assert sum(r['status'] == 'ok' for r in records) == 5
+        assert records[-1]['status'] == 'error'
+        assert summary['total_files'] == 6
+        assert summary['successful'] == 5
+        assert summary['failed'] == 1
+        assert 'files' not in summary
+
+    def test_batch_report_file(self, multiple_json_files, temp_dir):
+        """Test that records go to the JSONL report instead of memory"""
+        report = temp_dir / "report.jsonl"
+
+        result = process_batch(
+            multiple_json_files,
+            output_dir=str(temp_dir / "output"),
+            quiet=True,
+            report_file=str(report)
+        )
+
+        lines = report.read_text().splitlines()
+        assert len(lines) == 5
+        assert all(json.loads(line)['status'] == 'ok' for line in lines)
+        assert result['files'] == []
+        assert result['successful'] == 5
+
+    def test_batch_journal_resume(self, multiple_json_files, temp_dir):
+        """Test that a rerun with the same journal skips unchanged inputs"""
+        journal = temp_dir / "batch.journal"
+        output_dir = str(temp_dir / "output")
+
+        first = process_batch(
+            multiple_json_files[:3], output_dir=output_dir, quiet=True, journal=str(journal)
+        )
+        assert first['successful'] == 3
+
+        # Simulate a torn write from a crash and a changed input
+        with open(journal, 'a') as f:
+            f.write('{"input": "trunc')
+        multiple_json_files[0].write_text(json.dumps({"id": 99, "items": []}))
+
+        second = process_batch(
+            multiple_json_files, output_dir=output_dir, quiet=True, journal=str(journal)
+        )
+
+        statuses = {Path(f['input']).name: f['status'] for f in second['files']}
+        assert statuses['file_0.json'] == 'ok'
+        assert statuses['file_1.json'] == 'skipped'
+        assert statuses['file_2.json'] == 'skipped'
+        assert statuses['file_4.json'] == 'ok'
+        assert second['skipped'] == 2
+        assert second['successful'] == 5
+        assert second['total_json_tokens'] > 0
+
+        # Other encoder options: nothing counts as done, then all of it does again
+        third = process_batch(
+            multiple_json_files, output_dir=output_dir, quiet=True, journal=str(journal),
+            format_choice="toon", force_format=True
+        )
+        assert third['skipped'] == 0
+        assert third['converted'] == 5
+        assert all(f['output'].endswith('-min.toon') for f in third['files'])
+
+        fourth = process_batch(
+            multiple_json_files, output_dir=output_dir, quiet=True, journal=str(journal),
+            format_choice="toon", force_format=True
+        )
+        assert fourth['skipped'] == 5
+
+        fifth = process_batch(
+            multiple_json_files, output_dir=output_dir, quiet=True, journal=str(journal)
+        )
+        assert fifth['skipped'] == 0
+
+    def test_batch_incremental_manifest(self, multiple_json_files, temp_dir):
+        """Test that unchanged inputs are skipped and stale outputs cleaned"""
+        import os
+
+        manifest = str(temp_dir / "manifest.json")
+        output_dir = str(temp_dir / "output")
+
+        first = process_batch(
+            multiple_json_files, output_dir=output_dir, quiet=True, manifest=manifest
+        )
+        assert first['converted'] == 5
+
+        # Touch without changing content, change one file, delete another
+        os.utime(multiple_json_files[1])
+        multiple_json_files[2].write_text(json.dumps({"id": 2, "changed": True}))
+        removed_output = [
+            f['output'] for f in first['files'] if f['input'].endswith('file_4.json')
+        ][0]
+        multiple_json_files[4].unlink()
+
+        second = process_batch(
+            multiple_json_files[:4], output_dir=output_dir, quiet=True,
+            manifest=manifest, clean=True
+        )
+
+        assert second['converted'] == 1
+        assert second['skipped'] == 3
+        assert second['cleaned'] == 1
+        assert not Path(removed_output).exists()
+
+        # Different encoder options invalidate every entry
+        third = process_batch(
+            multiple_json_files[:4], output_dir=output_dir, quiet=True,
+            manifest=manifest, indent=4
+        )
+        assert third['converted'] == 4
+
+    def test_batch_lease_queue_multiple_nodes(self, temp_dir):
+        """Test that several processes sharing a queue convert every input once"""
+        import multiprocessing
+
+        inputs = []
+        for i in range(12):
+            path = temp_dir / f"item_{i}.json"
+            path.write_text(json.dumps({"id": i}))
+            inputs.append(str(path))
+        queue_dir = str(temp_dir / "queue")
+        output_dir = str(temp_dir / "output")
+
+        nodes = [
+            multiprocessing.Process(target=_queue_node, args=(inputs, output_dir, queue_dir))
+            for _ in range(3)
+        ]
+        for node in nodes:
+            node.start()
+        for node in nodes:
+            node.join(60)
+            assert node.exitcode == 0
+
+        assert len(list(Path(output_dir).iterdir())) == 12
+        assert len(list((Path(queue_dir) / "done").iterdir())) == 4
+        assert not list((Path(queue_dir) / "pending").iterdir())
+        assert not list((Path(queue_dir) / "leased").iterdir())
+
+    def test_batch_lease_queue_relative_inputs(self, multiple_json_files, temp_dir):
+        """Test that "./"-prefixed input strings complete their units"""
+        import multiprocessing
+
+        inputs = [f"./{path.name}" for path in multiple_json_files]
+        queue_dir = str(temp_dir / "queue")
+        node = multiprocessing.Process(
+            target=_relative_queue_node, args=(str(temp_dir), inputs, "output", queue_dir)
+        )
+        node.start()
+        node.join(60)
+        if node.is_alive():
+            node.terminate()
+        assert node.exitcode == 0
+
+        assert len(list((temp_dir / "output").iterdir())) == 5
+        assert len(list((Path(queue_dir) / "done").iterdir())) == 2
+        assert not list((Path(queue_dir) / "leased").iterdir())
+
+    def test_batch_lease_queue_repeated_inputs(self, multiple_json_files, temp_dir):
+        """Test that an input given twice is converted once and its unit completes"""
+        import multiprocessing
+
+        inputs = [str(path) for path in multiple_json_files]
+        # Once within the first unit of three, once across units
+        inputs[1:1] = [inputs[0]]
+        inputs.append(inputs[4])
+        queue_dir = str(temp_dir / "queue")
+        node = multiprocessing.Process(
+            target=_relative_queue_node, args=(str(temp_dir), inputs, "output", queue_dir)
+        )
+        node.start()
+        node.join(60)
+        if node.is_alive():
+            node.terminate()
+        assert node.exitcode == 0
+
+        assert len(list((temp_dir / "output").iterdir())) == 5
+        assert len(list((Path(queue_dir) / "done").iterdir())) == 2
+        assert not list((Path(queue_dir) / "leased").iterdir())
+
+    def test_lease_queue_reclaims_expired(self, multiple_json_files, temp_dir):
+        """Test that units leased by a dead node are converted by another"""
+        from json2toon.work_queue import LeaseQueue
+
+        queue_dir = str(temp_dir / "queue")
+        dead = LeaseQueue(queue_dir, lease_seconds=0.01, node_id="dead")
+        dead.populate(multiple_json_files, unit_size=2)
+        next(iter(dead.claim_paths()))
+        dead.close()
+
+        results = process_batch(
+            [], output_dir=str(temp_dir / "output"), quiet=True,
+            queue_dir=queue_dir, unit_size=2
+        )
+
+        assert results['successful'] == 5
+        assert results['units_completed'] == 3
+        assert not list((Path(queue_dir) / "leased").iterdir())
+
+    @pytest.mark.parametrize(
+        "container", ["out.tar", "out.tar.gz", "out.zip", "out.jsonl", "out.db"]
+    )
+    def test_batch_output_sink(self, multiple_json_files, temp_dir, container, monkeypatch):
+        """Test that all outputs go into one container readable by key"""
+        from json2toon import read_sink_entry
+
+        sink_path = str(temp_dir / container)
+        output_dir = temp_dir / "output"
+        results = process_batch(
+            multiple_json_files, output_dir=str(output_dir), quiet=True,
+            parallel_workers=2, output_sink=sink_path
+        )
+
+        assert results['successful'] == 5
+        assert results['sink_entries'] == 5
+        assert not output_dir.exists()
+        assert all(f['output'] == sink_path for f in results['files'])
+
+        key = str(multiple_json_files[3])
+        format_name, content = read_sink_entry(sink_path, key)
+        assert format_name in ('JSON', 'TOON', 'TOON-COMPACT')
+        assert "3" in content
+        # Keys are looked up as they were stored, whatever the container
+        same_key = f"{multiple_json_files[3].parent}/./{multiple_json_files[3].name}"
+        assert read_sink_entry(sink_path, same_key) == (format_name, content)
+        with pytest.raises(KeyError):
+            read_sink_entry(sink_path, str(temp_dir / "missing.json"))
+
+        completed = _run_console_script("sink-get", sink_path, key)
+        assert completed.returncode == 0, completed.stderr
+        assert completed.stdout == content + "\n"
+
+        # Relative inputs are stored as Path spells them ("./x.json" as "x.json")
+        monkeypatch.chdir(temp_dir)
+        relative_sink = str(temp_dir / f"relative-{container}")
+        process_batch(
+            [f"./{path.name}" for path in multiple_json_files],
+            output_dir=str(output_dir), quiet=True, output_sink=relative_sink
+        )
+        for relative_key in (f"./{multiple_json_files[3].name}", multiple_json_files[3].name):
+            assert read_sink_entry(relative_sink, relative_key)[1] == content
+        completed = _run_console_script(
+            "sink-get", relative_sink, f"./{multiple_json_files[3].name}"
+        )
+        assert completed.returncode == 0, completed.stderr
+        assert _run_console_script("sink-get", sink_path, "missing.json").returncode == 1
+
+    @pytest.mark.parametrize(
+        "container", ["out.tar", "out.tar.gz", "out.zip", "out.jsonl", "out.db"]
+    )
+    def test_output_sink_copies_files_in_blocks(self, temp_dir, container, monkeypatch):
+        """Test that staged outputs are copied into the container block by block"""
+        from json2toon import read_sink_entry
+        from json2toon import output_sinks
+
+        monkeypatch.setattr(output_sinks, '_COPY_BLOCK_SIZE', 7)
+        staged = temp_dir / "staged.toon"
+        text = 'items[2]{name,note}:\n  "a \\"b\\"",ünïcödé ✓\n  c,"tab\there"\r\n' * 5
+        staged.write_text(text, encoding='utf-8', newline='')
+        sink_path = str(temp_dir / container)
+
+        with output_sinks.open_sink(sink_path) as sink:
+            sink.add("small.json", "a: 1", "TOON")
+            sink.add_file("big.json", staged, "TOON-COMPACT")
+            sink.add("after.json", "b: 2", "TOON")
+
+        assert sink.entries_written == 3
+        assert read_sink_entry(sink_path, "big.json") == ("TOON-COMPACT", text)
+        assert read_sink_entry(sink_path, "small.json") == ("TOON", "a: 1")
+        assert read_sink_entry(sink_path, "after.json") == ("TOON", "b: 2")
+
+    def test_output_sink_requires_writers(self):
+        """Test that a sink missing its container writers cannot be created"""
+        from json2toon.output_sinks import OutputSink
+
+        class Incomplete(OutputSink):
+            def _write_entries(self, entries):
+                pass
+
+        with pytest.raises(TypeError):
+            Incomplete("unused.tar")
+
+    @pytest.mark.parametrize("container", ["out.tar", "out.zip", "out.jsonl", "out.db"])
+    def test_batch_output_sink_discarded_on_interrupt(self, multiple_json_files, temp_dir,
+                                                      container):
+        """Test that a batch stopped early publishes nothing"""
+        from json2toon import read_sink_entry
+
+        sink_path = temp_dir / container
+        records = iter_batch(
+            multiple_json_files, output_sink=str(sink_path), summary={}
+        )
+        next(records)
+        next(records)
+        records.close()
+
+        if container == "out.db":
+            with pytest.raises(KeyError):
+                read_sink_entry(str(sink_path), str(multiple_json_files[0]))
+            # Bulks already handed to SQLite are rolled back too
+            from json2toon.output_sinks import open_sink
+            sink = open_sink(str(sink_path), commit_every=1)
+            sink.add("a.json", "a: 1", "TOON")
+            sink.add("b.json", "b: 2", "TOON")
+            sink.abort()
+            with pytest.raises(KeyError):
+                read_sink_entry(str(sink_path), "a.json")
+        else:
+            assert not sink_path.exists()
+        assert not list(temp_dir.glob(".out.*"))
+
+    def test_batch_output_sink_rejects_journal(self, multiple_json_files, temp_dir):
+        with pytest.raises(ValueError):
+            process_batch(
+                multiple_json_files, quiet=True, output_sink=str(temp_dir / "out.zip"),
+                journal=str(temp_dir / "journal.jsonl")
+            )
+
+
+def _queue_node(inputs, output_dir, queue_dir):
+    process_batch(
+        [Path(p) for p in inputs], output_dir=output_dir, quiet=True,
+        queue_dir=queue_dir, unit_size=3
+    )
+
+
+def _relative_queue_node(cwd, inputs, output_dir, queue_dir):
+    os.chdir(cwd)
+    process_batch(inputs, output_dir=output_dir, quiet=True, queue_dir=queue_dir, unit_size=3)
+
 
 class TestStreamProcessing:
     """Test streaming functionality"""
@@ -300,6 +826,527 @@ class TestStreamProcessing:
         
         except ImportError:
             pytest.skip("ijson not installed, skipping streaming tests")
+    
+    @pytest.mark.parametrize("data", [
+        [{"id": i, "value": i * 2.5, "name": f"item_{i}"} for i in range(95)],
+        [{"id": i, "tags": ["a"] if i % 7 == 0 else []} for i in range(95)],
+        [i * 0.5 for i in range(95)],
+        [],
+    ])
+    def test_stream_array_single_header(self, temp_dir, data):
+        """Test that streamed chunks form one document with one header"""
+        pytest.importorskip("ijson")
+        from json2toon import process_stream
+        
+        json_file = temp_dir / "array.json"
+        json_file.write_text(json.dumps(data))
+        
+        result = process_stream(
+            str(json_file), output_dir=str(temp_dir / "output"), chunk_size=20, quiet=True
+        )
+        
+        assert result['items_processed'] == len(data)
+        output = Path(result['output_file']).read_text(encoding="utf-8")
+        assert output == TOONEncoder().encode(data)
+
+    @pytest.mark.parametrize("max_buffered_events", [0, 5, 100000])
+    def test_event_encoder_matches_encoder(self, max_buffered_events):
+        """Test that event-driven encoding equals encoding the loaded document"""
+        ijson = pytest.importorskip("ijson")
+        import io
+        from json2toon.event_encoder import EventTOONEncoder
+        
+        doc = {
+            "meta": {"name": "export", "empty": {}, "tags": ["a", "b"]},
+            "users": [{"id": i, "name": f"u{i}", "ok": i % 2 == 0} for i in range(20)],
+            "events": [
+                {"type": "click", "at": [1, 2]},
+                [],
+                {},
+                [{"x": 1}, {"x": 2}],
+                "raw",
+            ],
+            "matrix": [[i, i + 1] for i in range(5)],
+        }
+        raw = json.dumps(doc).encode("utf-8")
+        for encoder in (TOONEncoder(), TOONEncoder(delimiter="|", indent=4)):
+            event_encoder = EventTOONEncoder(encoder, max_buffered_events)
+            large = event_encoder.scan(ijson.basic_parse(io.BytesIO(raw), use_float=True))
+            pieces = []
+            event_encoder.encode(
+                ijson.basic_parse(io.BytesIO(raw), use_float=True), large, pieces.append
+            )
+            assert "".join(pieces) == encoder.encode(doc)
+
+    def test_stream_object_document(self, temp_dir):
+        """Test that non-array documents are streamed, not loaded"""
+        pytest.importorskip("ijson")
+        from json2toon import process_stream
+        
+        doc = {"rows": [{"id": i, "v": i / 2} for i in range(3000)], "total": 3000}
+        json_file = temp_dir / "doc.json"
+        json_file.write_text(json.dumps(doc))
+        
+        result = process_stream(str(json_file), output_dir=str(temp_dir / "output"), quiet=True)
+        
+        output = Path(result['output_file']).read_text(encoding="utf-8")
+        assert output == TOONEncoder().encode(doc)
+        assert result['estimated_json_tokens'] > result['estimated_toon_tokens']
+        assert not list((temp_dir / "output").glob("*.partial"))
+
+    def test_stream_array_parallel_workers(self, temp_dir):
+        """Test that chunks encoded by a worker pool are written in order"""
+        pytest.importorskip("ijson")
+        from json2toon import process_stream
+        
+        data = [{"id": i, "name": f"item_{i}", "ratio": i / 7} for i in range(500)]
+        json_file = temp_dir / "array.json"
+        json_file.write_text(json.dumps(data))
+        
+        sequential = process_stream(
+            str(json_file), output_dir=str(temp_dir / "seq"), chunk_size=30, quiet=True
+        )
+        parallel = process_stream(
+            str(json_file), output_dir=str(temp_dir / "par"), chunk_size=30, quiet=True,
+            workers=3
+        )
+        
+        output = Path(parallel['output_file']).read_text(encoding="utf-8")
+        assert output == TOONEncoder().encode(data)
+        assert parallel['chunks_processed'] == sequential['chunks_processed'] == 17
+        assert parallel['estimated_toon_tokens'] == sequential['estimated_toon_tokens']
+
+    def test_stream_nested_array_path(self, temp_dir):
+        """Test that a nested array is streamed in place at its path"""
+        pytest.importorskip("ijson")
+        from json2toon import process_stream
+        
+        doc = {
+            "meta": {"source": "api", "page": 1},
+            "data": {"results": [{"id": i, "score": i * 1.5} for i in range(40)], "next": None},
+        }
+        json_file = temp_dir / "export.json"
+        json_file.write_text(json.dumps(doc))
+        
+        result = process_stream(
+            str(json_file), output_dir=str(temp_dir / "output"), quiet=True,
+            stream_path="data.results"
+        )
+        
+        output = Path(result['output_file']).read_text(encoding="utf-8")
+        assert output == TOONEncoder().encode(doc)
+        assert result['largest_array_path'] == "data.results"
+        assert result['items_processed'] == 40
+        
+        with pytest.raises(ValueError, match="data.missing"):
+            process_stream(str(json_file), quiet=True, stream_path="data.missing")
+
+    def test_stream_json_baseline_from_input_bytes(self, temp_dir):
+        """Test that the JSON baseline is the minified input, sampled or skipped"""
+        pytest.importorskip("ijson")
+        from json2toon import process_stream
+        from json2toon.stream_processor import _JsonBaseline
+
+        data = [{"id": i, "note": f"a  \"quoted\"  note {i}", "ok": i % 2 == 0} for i in range(400)]
+        json_file = temp_dir / "array.json"
+        json_file.write_text(json.dumps(data, indent=4), encoding="utf-8")
+        minified = json.dumps(data, separators=(',', ':'))
+
+        # Block boundaries inside strings and escapes don't change the result
+        baseline = _JsonBaseline()
+        raw = json_file.read_bytes()
+        for start in range(0, len(raw), 7):
+            baseline.feed(raw[start:start + 7])
+        assert baseline.total() == TokenCounter.count_tokens(minified)
+
+        results = {
+            mode: process_stream(
+                str(json_file), output_dir=str(temp_dir / mode), chunk_size=50, quiet=True,
+                json_baseline=mode
+            )
+            for mode in ("raw", "sample", "off")
+        }
+        assert results["raw"]['estimated_json_tokens'] == TokenCounter.count_tokens(minified)
+        assert results["sample"]['estimated_json_tokens'] == pytest.approx(
+            results["raw"]['estimated_json_tokens'], rel=0.1
+        )
+        assert results["off"]['estimated_json_tokens'] == 0
+        assert results["off"]['estimated_tokens_saved'] is None
+        assert results["off"]['estimated_savings_percent'] is None
+        assert results["off"]['estimated_toon_tokens'] == results["raw"]['estimated_toon_tokens']
+
+        # Unmeasured savings stay out of batch totals
+        from json2toon.batch_processor import _new_summary, _update_summary
+        summary = _new_summary()
+        for result in (results["raw"], results["off"]):
+            _update_summary(summary, {
+                'status': 'ok', 'route': 'stream', 'route_reason': 'large array',
+                'format': result['format'], 'json_tokens': result['estimated_json_tokens'],
+                'output_tokens': result['estimated_toon_tokens'],
+                'tokens_saved': result['estimated_tokens_saved']
+            })
+        assert summary['total_tokens_saved'] == results["raw"]['estimated_tokens_saved']
+        assert summary['average_savings'] == pytest.approx(
+            results["raw"]['estimated_savings_percent']
+        )
+
+    def test_stream_memory_sampling(self, temp_dir, monkeypatch):
+        """Test that RSS is sampled by default and tracemalloc only on request"""
+        import tracemalloc
+        from json2toon import process_stream, stream_processor
+
+        json_file = temp_dir / "doc.json"
+        json_file.write_text(json.dumps({"rows": [{"id": i} for i in range(100)]}))
+
+        result = process_stream(str(json_file), output_dir=str(temp_dir / "output"), quiet=True)
+        assert 'traced_peak_mb' not in result
+        assert not tracemalloc.is_tracing()
+        assert len(result['memory_timeline']) >= 2
+        assert all(rss_mb > 0 for _, rss_mb in result['memory_timeline'])
+        # Timeline samples are rounded to 0.1 MB
+        sampled_peak_mb = max(rss_mb for _, rss_mb in result['memory_timeline'])
+        assert result['peak_memory_mb'] >= sampled_peak_mb - 0.1
+        assert 0 < result['start_memory_mb'] <= result['peak_memory_mb']
+        assert result['items_per_second'] > 0
+
+        # The peak is this run's, not that of earlier work in the process
+        from json2toon.batch_processor import _peak_rss_bytes
+        spike = bytearray(256 * 1024 * 1024)
+        spike[::4096] = b"x" * len(spike[::4096])
+        del spike
+        process_peak_mb = _peak_rss_bytes() / 1024 / 1024
+        result = process_stream(str(json_file), output_dir=str(temp_dir / "output"), quiet=True)
+        assert result['peak_memory_mb'] < process_peak_mb - 128
+
+        traced = process_stream(
+            str(json_file), output_dir=str(temp_dir / "output"), quiet=True, trace_memory=True
+        )
+        assert traced['traced_peak_mb'] > 0
+        assert not tracemalloc.is_tracing()
+
+        # The timeline stays bounded by thinning out as it fills up
+        monkeypatch.setattr(stream_processor, "_MAX_MEMORY_SAMPLES", 8)
+        sampler = stream_processor._MemorySampler(interval=1.0)
+        for _ in range(50):
+            sampler._sample()
+        assert len(sampler.timeline) < 8
+        assert sampler.interval > 1.0
+
+    def test_stream_resume_after_kill(self, temp_dir):
+        """Test that a run killed mid-stream resumes to the uninterrupted output"""
+        pytest.importorskip("ijson")
+        import os
+        import signal
+        import subprocess
+        import sys
+        import time
+        import json2toon
+        from json2toon import process_stream
+
+        data = [
+            {"id": i, "text": f"say \\\"hi\\\", [{i}], {{x}}", "tags": [i, [i, "a,b"]]}
+            for i in range(300)
+        ]
+        json_file = temp_dir / "array.json"
+        json_file.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        output_dir = temp_dir / "output"
+        checkpoint_file = output_dir / "array-min.toon.partial.checkpoint"
+
+        # Encoding is slowed down so the run can be killed between checkpoints
+        script = (
+            "import sys, time\n"
+            "from json2toon import stream_processor as sp\n"
+            "encode = sp._encode_chunk\n"
+            "sp._encode_chunk = lambda *args: (time.sleep(0.05), encode(*args))[1]\n"
+            "sp.process_stream(sys.argv[1], output_dir=sys.argv[2], chunk_size=10, quiet=True,\n"
+            "                  resume=True, checkpoint_interval=0)\n"
+        )
+        env = dict(os.environ, PYTHONPATH=str(Path(json2toon.__file__).parent.parent))
+        child = subprocess.Popen(
+            [sys.executable, "-c", script, str(json_file), str(output_dir)], env=env
+        )
+        try:
+            deadline = time.monotonic() + 60
+            while time.monotonic() < deadline and child.poll() is None:
+                if checkpoint_file.exists():
+                    if json.loads(checkpoint_file.read_text())['state']['items'] > 20:
+                        break
+                time.sleep(0.02)
+            assert child.poll() is None, "conversion finished before it could be killed"
+            child.send_signal(signal.SIGKILL)
+        finally:
+            child.wait()
+
+        killed_at = json.loads(checkpoint_file.read_text())['state']['items']
+        assert 0 < killed_at < len(data)
+        assert not (output_dir / "array-min.toon").exists()
+
+        result = process_stream(
+            str(json_file), output_dir=str(output_dir), chunk_size=10, quiet=True, resume=True
+        )
+        uninterrupted = process_stream(
+            str(json_file), output_dir=str(temp_dir / "uninterrupted"), chunk_size=10, quiet=True
+        )
+
+        output = Path(result['output_file']).read_text(encoding="utf-8")
+        assert output == Path(uninterrupted['output_file']).read_text(encoding="utf-8")
+        assert output == TOONEncoder().encode(data)
+        assert result['resumed_items'] >= killed_at
+        assert result['items_processed'] == len(data)
+        assert result['estimated_json_tokens'] == uninterrupted['estimated_json_tokens']
+        # Checkpoints end chunks early, which shifts per-chunk rounding
+        assert result['estimated_toon_tokens'] == pytest.approx(
+            uninterrupted['estimated_toon_tokens'], rel=0.01
+        )
+        assert not checkpoint_file.exists()
+        assert not (output_dir / "array-min.toon.partial").exists()
+
+    def test_max_tokens_per_file_parts(self, temp_dir):
+        """Test that outputs are split into self-contained parts within the token budget"""
+        pytest.importorskip("ijson")
+        from json2toon import process_stream
+
+        data = [{"id": i, "name": f"user {i}", "active": i % 3 == 0} for i in range(400)]
+        json_file = temp_dir / "users.json"
+        json_file.write_text(json.dumps(data), encoding="utf-8")
+
+        def check_parts(manifest_path):
+            manifest = json.loads(Path(manifest_path).read_text(encoding="utf-8"))
+            assert manifest['max_tokens'] == 500
+            assert len(manifest['parts']) > 1
+            for part in manifest['parts']:
+                text = (Path(manifest_path).parent / part['file']).read_text(encoding="utf-8")
+                items = data[part['first_item']:part['first_item'] + part['items']]
+                # Every part repeats the table header
+                assert text == TOONEncoder().encode(items)
+                assert part['tokens'] == TokenCounter.count_tokens(text) <= 500
+            assert sum(part['items'] for part in manifest['parts']) == len(data)
+            return manifest
+
+        streamed = process_stream(
+            str(json_file), output_dir=str(temp_dir / "stream"), chunk_size=64, quiet=True,
+            max_tokens_per_file=500
+        )
+        manifest = check_parts(streamed['output_file'])
+        assert streamed['estimated_toon_tokens'] == manifest['total_tokens']
+
+        batch = process_batch(
+            [json_file], output_dir=str(temp_dir / "batch"), quiet=True, max_tokens_per_file=500
+        )
+        record = batch['files'][0]
+        assert record['parts'] == len(check_parts(record['output'])['parts'])
+
+        # Outputs within the budget stay a single file
+        small = process_stream(
+            str(json_file), output_dir=str(temp_dir / "whole"), quiet=True,
+            max_tokens_per_file=10 ** 6
+        )
+        assert Path(small['output_file']).name == "users-min.toon"
+        assert len(small['parts']) == 1
+
+        with pytest.raises(ValueError, match="alone"):
+            process_stream(
+                str(json_file), output_dir=str(temp_dir / "tiny"), quiet=True,
+                max_tokens_per_file=5
+            )
+        assert not list((temp_dir / "tiny").glob("*.toon"))
+
+    def test_stream_format_auto_selection(self, temp_dir, monkeypatch):
+        """Test that streaming picks the format from samples and switches parts on drift"""
+        pytest.importorskip("ijson")
+        from json2toon import process_stream
+        from json2toon.toon_converter import CompactTOONEncoder
+
+        data = [{"id": i, "meta": {"a": {"b": {"c": i}}}} for i in range(200)]
+        json_file = temp_dir / "nested.json"
+        json_file.write_text(json.dumps(data), encoding="utf-8")
+
+        result = process_stream(
+            str(json_file), output_dir=str(temp_dir / "auto"), chunk_size=50, quiet=True,
+            format_choice="auto"
+        )
+        assert result['format'] == "TOON-COMPACT"
+        assert Path(result['output_file']).name == "nested-min-compact.toon"
+        output = Path(result['output_file']).read_text(encoding="utf-8")
+        assert output == CompactTOONEncoder().encode(data)
+        selection = result['format_selection']
+        assert selection['sampled_items'] == 150
+        assert set(selection['sample_tokens']) == {"JSON", "TOON", "TOON-COMPACT"}
+        assert selection['margins_percent']['TOON-COMPACT'] == 0.0
+        assert selection['margins_percent']['TOON'] > 0
+
+        fixed = process_stream(
+            str(json_file), output_dir=str(temp_dir / "json"), quiet=True, format_choice="json"
+        )
+        assert 'format_selection' not in fixed
+        assert Path(fixed['output_file']).read_text(encoding="utf-8") == \
+            json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+        # Numbers read the same in every format, so the short JSON brackets win
+        # the sample; quoting the later strings then costs JSON ~10% (pinned to
+        # the character-based estimate so the margins do not depend on tiktoken)
+        monkeypatch.setattr(TokenCounter, "_use_tiktoken", False)
+        drifting = list(range(40)) + [f"event number {i}" for i in range(60)]
+        json_file = temp_dir / "drift.json"
+        json_file.write_text(json.dumps(drifting), encoding="utf-8")
+
+        result = process_stream(
+            str(json_file), output_dir=str(temp_dir / "drift"), chunk_size=10, quiet=True,
+            format_choice="auto", format_sample_chunks=2, format_recheck_every=2,
+            max_tokens_per_file=10 ** 6
+        )
+        drift = result['format_selection']['drifts'][0]
+        assert result['format'] == drift['from'] == "JSON"
+        assert drift['switched'] and drift['item'] >= 40
+        manifest = json.loads(Path(result['output_file']).read_text(encoding="utf-8"))
+        encoders = {
+            "JSON": lambda items: json.dumps(items, ensure_ascii=False, separators=(',', ':')),
+            "TOON": TOONEncoder().encode,
+            "TOON-COMPACT": CompactTOONEncoder().encode,
+        }
+        assert [part['format'] for part in manifest['parts']] == ["JSON", drift['to']]
+        for part in manifest['parts']:
+            items = drifting[part['first_item']:part['first_item'] + part['items']]
+            text = (Path(result['output_file']).parent / part['file']).read_text(encoding="utf-8")
+            assert text == encoders[part['format']](items)
+
+    @pytest.mark.parametrize("max_tokens_per_file", [None, 4000])
+    def test_stream_progress_status_file(self, temp_dir, capsys, monkeypatch, max_tokens_per_file):
+        """Test that streaming reports rates and ETA and keeps a status file"""
+        pytest.importorskip("ijson")
+        from json2toon import process_stream
+        from json2toon.stream_progress import StreamProgress
+
+        data = [{"id": i, "name": f"user {i}"} for i in range(2000)]
+        json_file = temp_dir / "users.json"
+        json_file.write_text(json.dumps(data), encoding="utf-8")
+        status_file = temp_dir / "status.json"
+        updates = []
+        update = StreamProgress.update
+
+        def record_update(self, items, tokens):
+            updates.append((items, tokens))
+            update(self, items, tokens)
+
+        monkeypatch.setattr(StreamProgress, "update", record_update)
+
+        result = process_stream(
+            str(json_file), output_dir=str(temp_dir / "output"), chunk_size=100, verbose=True,
+            progress_file=str(status_file), progress_interval=0,
+            max_tokens_per_file=max_tokens_per_file
+        )
+
+        assert "ETA" in capsys.readouterr().out
+        # Running totals grow with every chunk, not just in the final update
+        assert len(updates) > 10
+        assert all(b[0] > a[0] and b[1] > a[1] for a, b in zip(updates[:-2], updates[1:-1]))
+        assert updates[-2][1] > result['estimated_toon_tokens'] * 0.9
+        status = json.loads(status_file.read_text(encoding="utf-8"))
+        assert status['state'] == "done"
+        assert status['phase'] == "encode"
+        assert status['bytes_read'] == status['bytes_total'] == json_file.stat().st_size
+        assert status['items'] == status['items_total'] == 2000
+        assert status['tokens'] == result['estimated_toon_tokens']
+        assert status['percent'] == 100.0 and status['eta_seconds'] == 0.0
+
+        broken = temp_dir / "broken.json"
+        broken.write_text('[{"id": 1}, {"id": ', encoding="utf-8")
+        with pytest.raises(Exception):
+            process_stream(str(broken), quiet=True, progress_file=str(status_file))
+        assert json.loads(status_file.read_text(encoding="utf-8"))['state'] == "failed"
+
+    @pytest.mark.parametrize("records", [
+        [{"id": i, "name": f"user {i}", "active": i % 2 == 0} for i in range(300)],
+        [{"id": i} if i != 250 else {"id": i, "tags": ["x", "y"]} for i in range(300)],
+        list(range(300)),
+        [{"b": 1, "a": 2}] + [{"a": i, "b": i} for i in range(299)],
+    ])
+    def test_ndjson_ranges_match_encoder(self, temp_dir, monkeypatch, records):
+        """Test that stitched NDJSON ranges equal encoding the whole array"""
+        from json2toon import stream_processor
+
+        input_file = temp_dir / "events.ndjson"
+        input_file.write_text(
+            "\n".join(json.dumps(r) for r in records) + "\n\n", encoding="utf-8"
+        )
+        monkeypatch.setattr(stream_processor, "_MIN_RANGE_BYTES", 256)
+
+        result = stream_processor.process_ndjson(
+            str(input_file), output_dir=str(temp_dir / "output"), workers=2,
+            chunk_size=50, quiet=True
+        )
+
+        assert result['items_processed'] == 300
+        assert result['chunks_processed'] > 1
+        output = Path(result['output_file']).read_text(encoding="utf-8")
+        assert output == TOONEncoder().encode(records)
+
+    def test_csv_streams_into_table(self, temp_dir):
+        """Test that CSV/TSV rows stream into the table of the equivalent JSON"""
+        import csv
+        import gzip
+        from json2toon import process_csv
+
+        records = [
+            {"id": i, "name": f"user, \"{i}\"", "price": i * 1.5, "active": i % 2 == 0,
+             "zip": f"{i:05d}", "note": "" if i % 3 else "x"}
+            for i in range(300)
+        ]
+        csv_file = temp_dir / "users.csv"
+        with open(csv_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(records[0]))
+            writer.writeheader()
+            writer.writerows(records)
+            f.write("\r\n")
+
+        result = process_csv(str(csv_file), output_dir=str(temp_dir / "typed"), quiet=True)
+        assert result['items_processed'] == 300
+        assert result['estimated_tokens_saved'] is None
+        assert result['column_types'] == {
+            "id": "number", "price": "number", "active": "boolean",
+            "name": "string", "zip": "string", "note": "string"
+        }
+        output = Path(result['output_file'])
+        assert output.name == "users-min.toon"
+        assert output.read_text(encoding="utf-8") == TOONEncoder().encode(records)
+
+        # Without inference the output is that of csv.DictReader rows as JSON
+        with open(csv_file, newline='', encoding='utf-8') as f:
+            as_json = list(csv.DictReader(f))
+        result = process_csv(
+            str(csv_file), output_dir=str(temp_dir / "text"), quiet=True, infer_rows=0
+        )
+        output = Path(result['output_file']).read_text(encoding="utf-8")
+        assert output == TOONEncoder().encode(as_json)
+
+        # TSV (here compressed), with cells that break the sampled type
+        tsv_file = temp_dir / "metrics.tsv.gz"
+        with gzip.open(tsv_file, 'wt', encoding='utf-8') as f:
+            f.write("day\tvalue\n")
+            f.write("".join(f"{d}\t{d * 10}\n" for d in range(5)))
+            f.write("5\tn/a\n6\t\n")
+        result = process_csv(str(tsv_file), output_dir=str(temp_dir / "tsv"), quiet=True,
+                             delimiter="pipe", infer_rows=3)
+        expected = [{"day": d, "value": d * 10} for d in range(5)] + \
+            [{"day": 5, "value": "n/a"}, {"day": 6, "value": None}]
+        assert Path(result['output_file']).read_text(encoding="utf-8") == \
+            TOONEncoder(delimiter='|').encode(expected)
+
+        ragged = temp_dir / "ragged.csv"
+        ragged.write_text("a,b\n1,2\n3\n", encoding="utf-8")
+        with pytest.raises(ValueError, match="Row 1"):
+            process_csv(str(ragged), quiet=True)
+        assert not list(temp_dir.glob("ragged-min.toon*"))
+
+    def test_ndjson_reports_invalid_line(self, temp_dir):
+        from json2toon import process_ndjson
+
+        input_file = temp_dir / "broken.ndjson"
+        input_file.write_text('{"id": 1}\n{"id": \n', encoding="utf-8")
+
+        with pytest.raises(ValueError, match="byte 10"):
+            process_ndjson(str(input_file), workers=1, quiet=True)
+        assert not list(temp_dir.glob("*.part"))
 
 
 class TestCLIIntegration:
@@ -355,6 +1402,305 @@ class TestCLIIntegration:
         assert len(paths) == 1
         assert paths[0].name == "keep.json"
 
+    def test_iter_input_paths_prunes_excluded_dirs(self, temp_dir):
+        """Test recursive discovery with directory pruning"""
+        from json2toon.input_discovery import iter_input_paths
+
+        for sub in ["a", "a/deep", "node_modules", "b"]:
+            (temp_dir / sub).mkdir()
+            (temp_dir / sub / "data.json").write_text('{}')
+        (temp_dir / "b" / "notes.txt").write_text('')
+        (temp_dir / "b" / "tmp_1.json").write_text('{}')
+
+        paths = iter_input_paths(
+            [str(temp_dir)], recursive=True, exclude=["node_modules", "tmp_*"]
+        )
+
+        assert not isinstance(paths, list)
+        found = sorted(str(p.relative_to(temp_dir)) for p in paths)
+        assert found == ["a/data.json", "a/deep/data.json", "b/data.json"]
+
+    def test_shards_partition_inputs(self, temp_dir):
+        """Test that hash shards cover every file exactly once"""
+        from json2toon.input_discovery import iter_input_paths
+
+        for i in range(20):
+            (temp_dir / f"f{i}.json").write_text('{}')
+
+        shards = [
+            {p.name for p in iter_input_paths([str(temp_dir)], shard=(k, 3))}
+            for k in (1, 2, 3)
+        ]
+
+        assert sum(len(s) for s in shards) == 20
+        assert set.union(*shards) == {f"f{i}.json" for i in range(20)}
+
+    def test_listing_shards_balance_size(self, temp_dir):
+        """Test size-balanced assignment from a listing"""
+        from json2toon.input_discovery import iter_listing_shard
+
+        listing = temp_dir / "listing.tsv"
+        listing.write_text("100\ta.json\n60\tb.json\n50\tc.json\n10\td.json\n")
+
+        first = [p.name for p in iter_listing_shard(str(listing), (1, 2))]
+        second = [p.name for p in iter_listing_shard(str(listing), (2, 2))]
+
+        assert first == ["a.json", "d.json"]
+        assert second == ["b.json", "c.json"]
+
+    def test_ndjson_parallel_workers(self, temp_dir, monkeypatch):
+        """Test that --ndjson uses --parallel as given, with 0 meaning one per CPU"""
+        from json2toon import stream_processor
+        from json2toon.cli import main
+
+        input_file = temp_dir / "events.ndjson"
+        input_file.write_text('{"id": 1}\n', encoding="utf-8")
+        seen = []
+
+        def fake_process_ndjson(input_path, **kwargs):
+            seen.append(kwargs['workers'])
+            return {'items_processed': 1}
+
+        monkeypatch.setattr(stream_processor, "process_ndjson", fake_process_ndjson)
+        for extra in ([], ["--parallel", "3"], ["--parallel", "0"]):
+            main([str(input_file), "--ndjson", "-q", *extra])
+
+        assert seen == [1, 3, os.cpu_count() or 1]
+        with pytest.raises(SystemExit):
+            main([str(input_file), "--ndjson", "--parallel", "-1"])
+
+    def test_merge_stats_command(self, temp_dir, capsys):
+        """Test merging per-shard stats files"""
+        from json2toon.cli import main
+
+        for k in (1, 2):
+            (temp_dir / f"s{k}.json").write_text(json.dumps({
+                'shard': f"{k}/2", 'total_files': 3, 'successful': 3, 'failed': 0,
+                'toon_count': 3, 'stream_reasons': {'large array': k},
+                'total_json_tokens': 100, 'total_tokens_saved': 25 * k,
+                'processing_time': float(k), 'files': [], 'errors': [],
+                'output_directory': 'out'
+            }))
+
+        main([
+            "merge-stats", str(temp_dir / "s1.json"), str(temp_dir / "s2.json"),
+            "-q", "-o", str(temp_dir / "merged.json")
+        ])
+        merged = json.loads((temp_dir / "merged.json").read_text())
+
+        assert merged['total_files'] == 6
+        assert merged['stream_reasons'] == {'large array': 3}
+        assert merged['average_savings'] == 37.5
+        assert merged['processing_time'] == 2.0
+        assert merged['shards'] == ["1/2", "2/2"]
+
+        # As the console script runs it: sys.exit(main())
+        completed = _run_console_script(
+            "merge-stats", str(temp_dir / "s1.json"), str(temp_dir / "s2.json")
+        )
+        assert completed.returncode == 0, completed.stderr
+        assert completed.stderr == ""
+        assert "6" in completed.stdout
+
+    def test_archive_members_as_inputs(self, temp_dir):
+        """Test that zip and tar members are converted without extraction"""
+        import tarfile
+        import zipfile
+        from json2toon.input_discovery import iter_input_paths
+
+        zip_path = temp_dir / "bundle.zip"
+        with zipfile.ZipFile(zip_path, 'w') as zf:
+            zf.writestr("day/a.json", json.dumps({"id": 1}))
+            zf.writestr("day/tmp_b.json", json.dumps({"id": 2}))
+            zf.writestr("day/notes.txt", "skip")
+        tar_path = temp_dir / "extra.tar.gz"
+        with tarfile.open(tar_path, 'w:gz') as tf:
+            source = temp_dir / "c.json"
+            source.write_text(json.dumps([{"id": 3, "name": "c"}]))
+            tf.add(source, arcname="c.json")
+            source.unlink()
+
+        members = list(iter_input_paths([str(zip_path), str(tar_path)], exclude=["tmp_*"]))
+        assert [str(m) for m in members] == [
+            f"{zip_path}!/day/a.json",
+            f"{tar_path}!/c.json",
+        ]
+
+        results = process_batch(
+            members, output_dir=str(temp_dir / "output"), parallel_workers=2, quiet=True
+        )
+        assert results['successful'] == 2
+        assert results['failed'] == 0
+        assert not (temp_dir / "day").exists()
+        # Named after the archive and the member's path inside it
+        outputs = sorted(
+            p.relative_to(temp_dir / "output").as_posix().split('-')[0]
+            for p in (temp_dir / "output").rglob("*") if p.is_file()
+        )
+        assert outputs == ['bundle/day/a', 'extra/c']
+
+    def test_archive_member_outputs_do_not_collide(self, temp_dir):
+        """Test that same-named members keep their outputs and clashing archives are reported"""
+        import zipfile
+        from json2toon.input_discovery import iter_input_paths
+
+        for day in (1, 2):
+            with zipfile.ZipFile(temp_dir / f"day{day}.zip", 'w') as zf:
+                zf.writestr("data/users.json", json.dumps({"day": day}))
+                zf.writestr("../../escape.json", json.dumps({"day": day}))
+        (temp_dir / "other").mkdir()
+        with zipfile.ZipFile(temp_dir / "other" / "day1.zip", 'w') as zf:
+            zf.writestr("data/users.json", json.dumps({"day": 0}))
+
+        inputs = [str(temp_dir / "day1.zip"), str(temp_dir / "day2.zip"),
+                  str(temp_dir / "other" / "day1.zip")]
+        results = process_batch(
+            list(iter_input_paths(inputs)), output_dir=str(temp_dir / "output"),
+            format_choice="json", force_format=True, quiet=True
+        )
+
+        assert results['successful'] == 4
+        assert results['failed'] == 1
+        assert results['errors'][0]['file'] == f"{temp_dir / 'other' / 'day1.zip'}!/data/users.json"
+        assert "would overwrite" in results['errors'][0]['error']
+        for day in (1, 2):
+            output = temp_dir / "output" / f"day{day}" / "data" / "users-min.json"
+            assert json.loads(output.read_text()) == {"day": day}
+            assert (temp_dir / "output" / f"day{day}" / "escape-min.json").exists()
+
+    @pytest.mark.parametrize("tracking", ["journal", "manifest", "queue"])
+    def test_archive_members_round_trip(self, temp_dir, tracking):
+        """Test archive members with a journal, a manifest and a work queue"""
+        import tarfile
+        import zipfile
+        from json2toon.input_discovery import iter_input_paths
+
+        def write_zip(path, member, data):
+            with zipfile.ZipFile(path, 'w') as zf:
+                zf.writestr(member, json.dumps(data))
+
+        write_zip(temp_dir / "day1.zip", "data/a.json", {"id": 1})
+        write_zip(temp_dir / "day2.zip", "data/b.json", {"id": 2})
+        source = temp_dir / "c.json"
+        source.write_text(json.dumps({"id": 3}))
+        with tarfile.open(temp_dir / "day3.tar.gz", 'w:gz') as tf:
+            tf.add(source, arcname="c.json")
+        source.unlink()
+        archives = [str(temp_dir / name) for name in ("day1.zip", "day2.zip", "day3.tar.gz")]
+
+        def run():
+            options = {
+                'journal': {'journal': str(temp_dir / "batch.journal")},
+                'manifest': {'manifest': str(temp_dir / "build.manifest")},
+                'queue': {'queue_dir': str(temp_dir / "queue"), 'unit_size': 2},
+            }[tracking]
+            return process_batch(
+                list(iter_input_paths(archives)), output_dir=str(temp_dir / "output"),
+                quiet=True, **options
+            )
+
+        first = run()
+        assert first['successful'] == 3, first['errors']
+        if tracking == 'queue':
+            # Claimed members were looked up again from the unit files
+            assert first['units_completed'] == 2
+            assert len(list((temp_dir / "queue" / "done").iterdir())) == 2
+            return
+
+        assert run()['skipped'] == 3
+        # Same size, new content: only that member is converted again
+        write_zip(temp_dir / "day2.zip", "data/b.json", {"id": 9})
+        third = run()
+        assert third['skipped'] == 2
+        assert third['converted'] == 1
+        assert [Path(f['input']).name for f in third['files'] if f['status'] == 'ok'] == ['b.json']
+
+    @pytest.mark.parametrize("compress", ["gzip", "xz", "zstd"])
+    def test_compressed_inputs_and_outputs(self, temp_dir, compress):
+        """Test that compressed inputs are read transparently and outputs compressed"""
+        import gzip
+        from json2toon.compression import open_input
+        from json2toon.input_discovery import iter_input_paths
+        from json2toon.stream_processor import process_stream
+
+        if compress == "zstd":
+            pytest.importorskip("zstandard")
+        data = {"rows": [{"id": i, "name": f"row {i}"} for i in range(200)]}
+        input_dir = temp_dir / "input"
+        input_dir.mkdir()
+        with gzip.open(input_dir / "export.json.gz", 'wt', encoding='utf-8') as f:
+            json.dump(data, f)
+        # Detected by magic bytes, whatever the name says
+        with gzip.open(input_dir / "mislabeled.json", 'wt', encoding='utf-8') as f:
+            json.dump(data, f)
+
+        inputs = list(iter_input_paths([str(input_dir)]))
+        assert sorted(p.name for p in inputs) == ["export.json.gz", "mislabeled.json"]
+
+        results = process_batch(
+            inputs, output_dir=str(temp_dir / "batch"), format_choice="toon",
+            force_format=True, compress=compress, quiet=True
+        )
+        assert results['successful'] == 2
+        expected = TOONEncoder().encode(data)
+        suffix = {"gzip": ".gz", "xz": ".xz", "zstd": ".zst"}[compress]
+        for name in ("export-min.toon", "mislabeled-min.toon"):
+            with open_input(temp_dir / "batch" / (name + suffix)) as f:
+                assert f.read().decode('utf-8') == expected
+
+        streamed = process_stream(
+            str(input_dir / "export.json.gz"), output_dir=str(temp_dir / "stream"),
+            quiet=True, compress=compress, compress_level=1
+        )
+        assert streamed['output_file'].endswith("export-min.toon" + suffix)
+        with open_input(streamed['output_file']) as f:
+            assert f.read().decode('utf-8') == expected
+
+    def test_mapped_input_text(self, temp_dir):
+        """Test that inputs read whole through a memory map match the file"""
+        import gzip
+        from json2toon.compression import map_input, read_input_text
+        from json2toon.stream_processor import _process_large_object, process_stream
+
+        data = {"rows": [{"id": i, "name": f"ação {i}", "path": "C:\\\\tmp"} for i in range(3000)]}
+        plain = temp_dir / "plain.json"
+        plain.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+        packed = temp_dir / "packed.json.gz"
+        with gzip.open(packed, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        empty = temp_dir / "empty.json"
+        empty.write_bytes(b"")
+
+        assert map_input(packed) is None
+        assert map_input(empty) is None
+        assert read_input_text(plain) == plain.read_text(encoding="utf-8")
+        assert read_input_text(packed) == read_input_text(plain)
+        assert read_input_text(empty) == ""
+
+        # The in-memory fallback measures the same baseline as streaming
+        pytest.importorskip("ijson")
+        streamed = process_stream(str(plain), output_dir=str(temp_dir / "stream"), quiet=True)
+        output_file = temp_dir / "fallback.toon"
+        _, _, json_tokens, _ = _process_large_object(
+            plain, output_file, TOONEncoder(), verbose=False, quiet=True
+        )
+        # Blocks end elsewhere than the parser's reads, which shifts rounding
+        assert json_tokens == pytest.approx(streamed['estimated_json_tokens'], rel=0.01)
+        assert output_file.read_text(encoding="utf-8") == TOONEncoder().encode(data)
+
+    def test_exclude_matcher_follows_path_match(self):
+        """Test that compiled excludes agree with Path.match"""
+        from json2toon.input_discovery import ExcludeMatcher
+
+        patterns = ["exclude_*", "cache/*.json", "/abs/*.json"]
+        paths = [
+            "x/exclude_me.json", "a/cache/x.json", "cache/sub/x.json", "/abs/x.json", "abs/x.json"
+        ]
+        matcher = ExcludeMatcher(patterns)
+        for path in paths:
+            expected = any(Path(path).match(p) for p in patterns)
+            assert matcher.matches(path) == expected
+
 
 class TestEdgeCases:
     """Test edge cases and error handling"""